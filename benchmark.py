@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+翻訳処理全体のベンチマーク
+
+合成したワークブックを translate_excel.main で翻訳し、ローカルのモックサーバー
+（mock_deepl_server.py）に対するスループット・ピークメモリ・処理段階ごとの
+所要時間をJSON形式で出力する。各ケースは独立したプロセスで実行する。
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from openpyxl import Workbook
+
+from mock_deepl_server import MockDeepLServer
+
+WORDS = (
+    "order shipment invoice customer product status pending delivered returned "
+    "warehouse payment refund account address quantity price discount total "
+    "category description available backorder supplier contract review"
+).split()
+
+
+def generate_workbook(path: str, rows: int, duplicate_rate: float, text_length: int,
+                      seed: int = 0) -> None:
+    """
+    ベンチマーク用のワークブックを生成
+
+    Args:
+        path (str): 出力するファイルのパス
+        rows (int): 行数
+        duplicate_rate (float): 重複するセルの割合（0.0〜1.0）
+        text_length (int): 1セルあたりのおおよその文字数
+        seed (int): 乱数のシード
+    """
+    rng = random.Random(seed)
+    unique_count = max(1, int(rows * (1 - duplicate_rate)))
+    word_count = max(1, text_length // 7)
+
+    def make_text(index: int) -> str:
+        words = [rng.choice(WORDS) for _ in range(word_count)]
+        return f"{index} " + " ".join(words)
+
+    texts = [make_text(i) for i in range(unique_count)]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    for row in range(rows):
+        # 先頭は全てユニークな原文、以降は既出の原文を繰り返す
+        text = texts[row] if row < unique_count else texts[rng.randrange(unique_count)]
+        ws.append([text, None])
+    wb.save(path)
+
+
+def run_case(case: Dict) -> Dict:
+    """1ケースを現在のプロセスで実行（--run-caseから呼び出される）"""
+    import translate_excel
+
+    sys.argv = [
+        "translate_excel.py", "--batch",
+        "--input", case['input_path'],
+        "--output", case['output_path'],
+        "--source-cols", "A", "--target-cols", "B",
+        "--row-start", "1", "--row-end", str(case['rows']),
+        "--api-key", "benchmark", "--api-url", case['api_url'],
+        "--workers", str(case['workers']),
+        "--excel-mode", case['excel_mode'],
+        "--no-cache"
+    ]
+    start = time.perf_counter()
+    summaries = translate_excel.main()
+    elapsed = time.perf_counter() - start
+
+    summary = summaries[0]
+    # Linuxのru_maxrssはKB、macOSはバイト単位
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    return {
+        'elapsed': elapsed,
+        'cells_per_sec': summary['cells'] / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb,
+        'cells': summary['cells'],
+        'translatable_cells': summary['translatable_cells'],
+        'unique_texts': summary['unique_texts'],
+        'stages': summary['timings']
+    }
+
+
+def run_case_in_subprocess(case: Dict, workdir: str) -> Dict:
+    """ピークメモリを正しく測るため、ケースごとに新しいプロセスで実行"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+        cwd=workdir, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"ベンチマークの実行に失敗しました: {result.stderr.strip()}")
+    # 翻訳ツールの出力の後に結果のJSONが1行で出力される
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(v.strip()) for v in value.split(',') if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Excel翻訳ツールのベンチマーク')
+    parser.add_argument('--rows', default='10000,100000', help='行数のリスト（デフォルト: 10000,100000）')
+    parser.add_argument('--duplicate-rates', default='0.0,0.9', help='重複率のリスト（デフォルト: 0.0,0.9）')
+    parser.add_argument('--text-lengths', default='40', help='1セルの文字数のリスト（デフォルト: 40）')
+    parser.add_argument('--excel-modes', default='memory', help='Excelモードのリスト（デフォルト: memory）')
+    parser.add_argument('--workers', default='4', help='ワーカー数のリスト（デフォルト: 4）')
+    parser.add_argument('--latency', type=float, default=0.0, help='モックサーバーの応答遅延秒数（デフォルト: 0）')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル（指定しない場合は標準出力）')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    server = MockDeepLServer(latency=args.latency).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="translate_bench_") as workdir:
+            for rows, duplicate_rate, text_length in itertools.product(
+                    parse_list(args.rows, int),
+                    parse_list(args.duplicate_rates, float),
+                    parse_list(args.text_lengths, int)):
+                input_path = os.path.join(workdir, f"bench_{rows}_{duplicate_rate}_{text_length}.xlsx")
+                generate_workbook(input_path, rows, duplicate_rate, text_length)
+
+                for excel_mode, workers in itertools.product(parse_list(args.excel_modes, str),
+                                                             parse_list(args.workers, int)):
+                    case = {
+                        'rows': rows,
+                        'duplicate_rate': duplicate_rate,
+                        'text_length': text_length,
+                        'excel_mode': excel_mode,
+                        'workers': workers,
+                        'input_path': input_path,
+                        'output_path': os.path.join(workdir, "output.xlsx"),
+                        'api_url': server.url
+                    }
+                    print(f"実行中: 行数={rows} 重複率={duplicate_rate} 文字数={text_length} "
+                          f"モード={excel_mode} ワーカー={workers}", file=sys.stderr)
+                    result = run_case_in_subprocess(case, workdir)
+                    for key in ('input_path', 'output_path', 'api_url'):
+                        del case[key]
+                    results.append({**case, **result})
+    finally:
+        server.stop()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mock_latency': args.latency,
+        'results': results
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"ベンチマーク結果を {args.output} に保存しました。", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+起動時間のベンチマーク
+
+translate_excel.py の --help・引数エラー・--dry-run・history サブコマンドなど、翻訳を
+行わない実行を独立したプロセスで繰り返し起動し、所要時間（Python自体の起動時間を
+除いた値）と、読み込まれた重いモジュールをJSON形式で出力する。
+
+--baseline に以前の結果を指定すると、所要時間が許容倍率を超えた場合、または
+読み込まないはずの重いモジュールが読み込まれた場合に終了コード1で終了する。
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Set
+
+TOOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translate_excel.py")
+
+# 翻訳を行わない実行で読み込まれてはならないモジュール
+HEAVY_MODULES = ('openpyxl', 'requests', 'urllib3', 'pyarrow', 'cProfile', 'concurrent.futures.process')
+
+# 基準値と比較する際に、計測の揺らぎとして許容する差（ミリ秒）
+NOISE_MS = 10.0
+
+
+def build_cases(workdir: str) -> Dict[str, List[str]]:
+    """ケース名ごとのコマンドライン引数"""
+    input_path = os.path.join(workdir, "startup.csv")
+    with open(input_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "translated"])
+        writer.writerows([f"Sample text {i}", ""] for i in range(1000))
+    history_file = os.path.join(workdir, "history.jsonl")
+    return {
+        'import': ['-c', f"import sys; sys.path.insert(0, {os.path.dirname(TOOL)!r}); import translate_excel"],
+        'help': [TOOL, '--help'],
+        'invalid_args': [TOOL, '--batch'],
+        'dry_run': [TOOL, '--batch', '--dry-run', '--input', input_path, '--source-cols', 'A',
+                    '--target-cols', 'B', '--row-start', '2', '--row-end', '1001'],
+        'history_stats': [TOOL, 'history', '--history-file', history_file, 'stats'],
+    }
+
+
+def measure(args: List[str], runs: int, cwd: str) -> List[float]:
+    """コマンドを繰り返し起動し、1回ごとの所要時間（ミリ秒）を返す"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def imported_modules(args: List[str], cwd: str) -> Set[str]:
+    """-X importtime の出力から読み込まれたモジュール名を取得"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and line.count('|') == 2:
+            modules.add(line.rsplit('|', 1)[1].strip())
+    return modules
+
+
+def check_regressions(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """基準値と比較して、遅くなったケースと重いモジュールを読み込んだケースを列挙"""
+    problems = []
+    baseline_cases = {case['name']: case for case in baseline.get('results', [])}
+    for case in report['results']:
+        if case['heavy_modules']:
+            problems.append(f"{case['name']}: 重いモジュールが読み込まれています: {', '.join(case['heavy_modules'])}")
+        previous = baseline_cases.get(case['name'])
+        if previous is None:
+            continue
+        limit = previous['overhead_ms'] * tolerance + NOISE_MS
+        if case['overhead_ms'] > limit:
+            problems.append(f"{case['name']}: {case['overhead_ms']:.1f}ms（基準 {previous['overhead_ms']:.1f}ms、"
+                            f"上限 {limit:.1f}ms）")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Excel翻訳ツールの起動時間のベンチマーク')
+    parser.add_argument('--runs', type=int, default=10, help='ケースごとの実行回数（デフォルト: 10）')
+    parser.add_argument('--baseline', help='比較する以前の結果のJSONファイル')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='基準値に対して許容する所要時間の倍率（デフォルト: 1.5）')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル（指定しない場合は標準出力）')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="translate_startup_") as workdir:
+        # Python自体の起動時間（各ケースから差し引く）
+        interpreter_ms = statistics.median(measure(['-c', 'pass'], args.runs, workdir))
+        for name, case_args in build_cases(workdir).items():
+            print(f"実行中: {name}", file=sys.stderr)
+            timings = measure(case_args, args.runs, workdir)
+            median_ms = statistics.median(timings)
+            modules = imported_modules(case_args, workdir)
+            results.append({
+                'name': name,
+                'median_ms': round(median_ms, 1),
+                'min_ms': round(min(timings), 1),
+                'overhead_ms': round(max(0.0, median_ms - interpreter_ms), 1),
+                'heavy_modules': sorted(m for m in HEAVY_MODULES if m in modules)
+            })
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'interpreter_ms': round(interpreter_ms, 1),
+        'results': results
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"ベンチマーク結果を {args.output} に保存しました。", file=sys.stderr)
+    else:
+        print(output)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    problems = check_regressions(report, baseline, args.tolerance)
+    if problems:
+        print("起動時間の劣化を検出しました:", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+翻訳の途中経過（チェックポイント）を管理するモジュール
+"""
+import json
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class Checkpoint:
+    def __init__(self, output_path: str, signature: Dict, interval: int = 500):
+        """
+        チェックポイント管理クラスの初期化
+
+        翻訳済みのセルはJSON Linesファイルに逐次追記され、完了した
+        (シート, 列, 行) の範囲は一定件数ごとに状態ファイルへ書き出される。
+
+        Args:
+            output_path (str): 出力ファイルのパス（チェックポイントはこの隣に作成される）
+            signature (Dict): 再開時に一致を確認する実行条件
+            interval (int): 状態ファイルを書き出すまでのセル数
+        """
+        self.state_file = f"{output_path}.checkpoint.json"
+        self.cells_file = f"{output_path}.checkpoint.jsonl"
+        self.signature = signature
+        self.interval = interval
+
+        self._completed: Dict[Tuple[str, int], Set[int]] = {}
+        self._file = None
+        self._pending = 0
+
+    def exists(self) -> bool:
+        """チェックポイントが存在するかを確認"""
+        return os.path.exists(self.state_file) or os.path.exists(self.cells_file)
+
+    def load(self) -> Dict[Tuple[str, int, int], str]:
+        """
+        チェックポイントを読み込み、翻訳済みのセルを返す
+
+        Returns:
+            Dict[Tuple[str, int, int], str]: (シート名, 行, 翻訳先列) をキーとする翻訳結果
+        """
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('signature') != self.signature:
+                raise Exception("チェックポイントの実行条件が現在の指定と一致しません。"
+                                f"不要な場合は {self.state_file} を削除してください。")
+
+        values: Dict[Tuple[str, int, int], str] = {}
+        if os.path.exists(self.cells_file):
+            with open(self.cells_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断時に書きかけだった行は無視する
+                        continue
+                    values[(record['sheet'], record['row'], record['col'])] = record['value']
+                    self._completed.setdefault((record['sheet'], record['col']), set()).add(record['row'])
+        return values
+
+    def is_completed(self, sheet: str, row: int, col: int) -> bool:
+        """セルが翻訳済みかを確認"""
+        return row in self._completed.get((sheet, col), ())
+
+    def record(self, sheet: str, row: int, col: int, value: str) -> None:
+        """翻訳済みのセルを記録"""
+        if self._file is None:
+            self._file = open(self.cells_file, 'a', encoding='utf-8')
+        record = {'sheet': sheet, 'row': row, 'col': col, 'value': value}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._completed.setdefault((sheet, col), set()).add(row)
+        self._pending += 1
+        if self._pending >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        """翻訳済みのセルと完了範囲をディスクへ書き出す"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        completed: Dict[str, Dict[str, List[List[int]]]] = {}
+        for (sheet, col), rows in self._completed.items():
+            completed.setdefault(sheet, {})[str(col)] = self._merge_ranges(rows)
+        state = {
+            'signature': self.signature,
+            'completed': completed
+        }
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_file, self.state_file)
+        self._pending = 0
+
+    def remove(self) -> None:
+        """完了後にチェックポイントを削除"""
+        self.close()
+        for path in (self.state_file, self.cells_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self) -> None:
+        """チェックポイントファイルを閉じる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _merge_ranges(rows: Set[int]) -> List[List[int]]:
+        """行番号の集合を連続する範囲のリストにまとめる"""
+        ranges: List[List[int]] = []
+        start: Optional[int] = None
+        prev: Optional[int] = None
+        for row in sorted(rows):
+            if prev is not None and row == prev + 1:
+                prev = row
+                continue
+            if start is not None:
+                ranges.append([start, prev])
+            start = prev = row
+        if start is not None:
+            ranges.append([start, prev])
+        return ranges
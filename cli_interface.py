@@ -2,8 +2,56 @@
 対話型CLIインターフェースモジュール
 """
 import os
+import re
+import glob
 import argparse
+from datetime import datetime
 from typing import Dict, List, Tuple, Union, TypedDict, Optional
+from deepl_client import MAX_REQUEST_BYTES
+from excel_handler import EXCEL_MODES, MODE_MEMORY
+from quota_planner import POLICY_REFUSE, QUOTA_POLICIES
+from request_sizer import DEFAULT_REQUEST_BYTES, MIN_REQUEST_BYTES
+from skip_filter import SKIP_RULES
+from tabular_handler import TABULAR_EXTENSIONS
+from translation_history import DEFAULT_HISTORY_FILE, JST
+from utils import excel_column_to_number, number_to_excel_column
+
+def parse_column_spec(spec: str) -> List[int]:
+    """
+    列指定（例: A,B,C-E）を列番号のリストに変換
+
+    Raises:
+        ValueError: 列の指定が無効な場合
+    """
+    cols = []
+    for part in spec.split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            cols.extend(range(excel_column_to_number(start.strip()), excel_column_to_number(end.strip()) + 1))
+        else:
+            cols.append(excel_column_to_number(part.strip()))
+    return cols
+
+
+def parse_target_langs(spec: str) -> List[str]:
+    """
+    翻訳先言語の指定（例: JA,EN-US）を言語コードのリストに変換
+
+    Raises:
+        ValueError: 言語コードが無効な場合・重複している場合
+    """
+    target_langs = [lang.strip().upper() for lang in spec.split(',') if lang.strip()]
+    invalid_langs = [lang for lang in target_langs if not re.fullmatch(r'[A-Z]{2}(-[A-Z]{2,4})?', lang)]
+    if not target_langs or invalid_langs:
+        raise ValueError(f"翻訳先言語の指定が無効です: {spec}")
+    if len(set(target_langs)) != len(target_langs):
+        raise ValueError("翻訳先言語が重複しています")
+    return target_langs
+
+
+# 常駐モードで待ち受けるアドレスのデフォルト（ローカルからのみ接続できる）
+DEFAULT_SERVE_ADDRESS = "127.0.0.1:8780"
+
 
 class TranslationParams(TypedDict):
     batch_mode: bool
@@ -11,8 +59,36 @@ class TranslationParams(TypedDict):
     output_path: str
     source_cols: List[int]
     target_cols: List[int]
+    target_langs: List[str]
     row_range: Tuple[int, int]
+    input_files: List[Tuple[str, str]]  # (入力パス, 出力パス) のリスト
+    sheets: Optional[List[str]]
+    file_workers: int
     api_key: Optional[str]  # Added API key parameter
+    workers: int
+    max_rps: Optional[float]
+    cache_file: Optional[str]
+    cache_max_entries: int
+    excel_mode: str
+    resume: bool
+    checkpoint_interval: int
+    api_url: Optional[str]
+    pool_size: Optional[int]
+    connect_timeout: float
+    read_timeout: float
+    use_gzip: bool
+    request_bytes: int
+    metrics_out: Optional[str]
+    quota_policy: str
+    incremental: bool
+    skip_rules: List[str]
+    skip_patterns: Optional[List[str]]
+    profile_out: Optional[str]
+    dry_run: bool
+    serve: Optional[Tuple[str, int]]  # 常駐モードで待ち受けるアドレス (ホスト, ポート)
+    max_jobs: int
+    max_queued_jobs: int
+    allow_any_output: bool  # 常駐モードで入力ファイルのディレクトリ外への出力を許可する
 
 class CLIInterface:
     def __init__(self):
@@ -39,6 +115,33 @@ class CLIInterface:
         name, ext = os.path.splitext(base_name)
         return os.path.join(dir_name, f"{name}_translated{ext}")
 
+    def _expand_input_files(self, input_arg: str, output_arg: Optional[str]) -> List[Tuple[str, str]]:
+        """
+        入力指定（ファイル・ディレクトリ・globパターン）を (入力パス, 出力パス) のリストに展開
+
+        複数ファイルの場合、出力先にはディレクトリを指定する（省略時は入力ファイルと同じ場所）。
+        """
+        if os.path.isfile(input_arg):
+            return [(input_arg, output_arg or self._generate_default_output_path(input_arg))]
+
+        if os.path.isdir(input_arg):
+            paths = [path for ext in ('.xlsx', '.xlsm') + TABULAR_EXTENSIONS
+                     for path in glob.glob(os.path.join(input_arg, f'*{ext}'))]
+            # 出力済みのファイルは対象外にする
+            paths = [p for p in paths if not os.path.splitext(p)[0].endswith('_translated')]
+        else:
+            paths = glob.glob(input_arg)
+        # Excelの一時ファイル（~$）は対象外にする
+        paths = sorted(p for p in paths if os.path.isfile(p) and not os.path.basename(p).startswith('~$'))
+
+        input_files = []
+        for path in paths:
+            output_path = self._generate_default_output_path(path)
+            if output_arg:
+                output_path = os.path.join(output_arg, os.path.basename(output_path))
+            input_files.append((path, output_path))
+        return input_files
+
     def _parse_column_input(self, prompt: Optional[str] = None) -> List[int]:
         """列指定の解析（アルファベット形式）"""
         while True:
@@ -77,62 +180,193 @@ class CLIInterface:
         """コマンドライン引数の解析"""
         parser = argparse.ArgumentParser(description='Excel翻訳ツール')
         parser.add_argument('--batch', action='store_true', help='バッチモードで実行')
-        parser.add_argument('--input', help='入力Excelファイルのパス')
-        parser.add_argument('--output', help='出力Excelファイルのパス')
+        parser.add_argument('--input', help='入力Excelファイルのパス（CSV/TSV・Parquetも可。ディレクトリまたはglobパターンで複数指定可能）')
+        parser.add_argument('--output', help='出力Excelファイルのパス（複数ファイルの場合は出力ディレクトリ）')
+        parser.add_argument('--sheets', help='翻訳するシート名（カンマ区切り、* で全シート。指定しない場合はアクティブシート）')
+        parser.add_argument('--file-workers', type=int, default=1,
+                            help='複数ファイルを並行に処理するプロセス数（デフォルト: 1）')
         parser.add_argument('--source-cols', help='翻訳元の列（例: A,B,C-E）')
         parser.add_argument('--target-cols', help='翻訳先の列（例: F,G,H-J）')
+        parser.add_argument('--target-langs', default='JA',
+                            help='翻訳先言語（カンマ区切り、例: JA,EN-US,ZH,KO）。複数指定した場合、翻訳先の列は'
+                                 '言語ごとに翻訳元の列と同じ順に並べて指定する（デフォルト: JA）')
         parser.add_argument('--row-start', type=int, help='開始行番号')
         parser.add_argument('--row-end', type=int, help='終了行番号')
-        parser.add_argument('--api-key', help='DeepL APIキー（指定しない場合は環境変数DEEPL_API_KEYを使用）')
+        parser.add_argument('--api-key',
+                            help='DeepL APIキー（カンマ区切りで複数指定すると、文字数上限に達したときに次のAPIキーへ'
+                                 '切り替える。指定しない場合は環境変数DEEPL_API_KEYを使用）')
+        parser.add_argument('--quota-policy', choices=QUOTA_POLICIES, default=POLICY_REFUSE,
+                            help='翻訳に必要な文字数が残りの文字数を超える場合の動作。refuseは翻訳せずに終了、'
+                                 'truncateは先頭の行から収まる範囲のみ翻訳、offは確認しない（デフォルト: refuse）')
+        parser.add_argument('--api-url',
+                            help='DeepL APIのベースURL（例: https://api.deepl.com。指定しない場合はAPIキーからFree版/Pro版を判定）')
+        parser.add_argument('--workers', type=int, default=4, help='同時に送信するリクエスト数（デフォルト: 4）')
+        parser.add_argument('--max-rps', type=float, help='1秒あたりの最大リクエスト数（指定しない場合は無制限）')
+        parser.add_argument('--pool-size', type=int, help='保持するHTTP接続数（デフォルト: --workersと同じ）')
+        parser.add_argument('--connect-timeout', type=float, default=5.0, help='接続タイムアウト秒数（デフォルト: 5）')
+        parser.add_argument('--read-timeout', type=float, default=60.0, help='応答待ちタイムアウト秒数（デフォルト: 60）')
+        parser.add_argument('--gzip', action='store_true', help='大きなリクエスト本文をgzip圧縮して送信')
+        parser.add_argument('--request-bytes', type=int, default=DEFAULT_REQUEST_BYTES,
+                            help='1リクエストあたりの目標の本文サイズ。短いセルはこのサイズまでまとめ、超えるセルは'
+                                 f'文単位に分割して送信する（{MIN_REQUEST_BYTES}～{MAX_REQUEST_BYTES}、'
+                                 f'デフォルト: {DEFAULT_REQUEST_BYTES}）')
+        parser.add_argument('--cache-file', default='translation_cache.db',
+                            help='翻訳キャッシュのファイルパス（デフォルト: translation_cache.db）')
+        parser.add_argument('--no-cache', action='store_true', help='翻訳キャッシュを使用しない')
+        parser.add_argument('--cache-max-entries', type=int, default=1_000_000,
+                            help='翻訳キャッシュの最大エントリー数（デフォルト: 1000000）')
+        parser.add_argument('--excel-mode', choices=EXCEL_MODES, default=MODE_MEMORY,
+                            help='ワークブックの読み書きモード。streamingは大きなファイルを少ないメモリで処理するが、'
+                                 '書式は保持されない。patchは.xlsxの翻訳先のセルだけを書き換えて保存し、'
+                                 '書式やその他の内容を元のまま保持する（デフォルト: memory）')
+        parser.add_argument('--resume', action='store_true', help='チェックポイントから中断した翻訳を再開')
+        parser.add_argument('--incremental', action='store_true',
+                            help='前回の実行から原文が変わったセルのみ翻訳し、それ以外は前回の出力から引き継ぐ')
+        parser.add_argument('--skip-rules', default=','.join(SKIP_RULES),
+                            help='原文のまま出力する翻訳対象外のセルの判定ルール（カンマ区切り、none で無効。'
+                                 f'デフォルト: {",".join(SKIP_RULES)}）')
+        parser.add_argument('--skip-pattern', action='append', dest='skip_patterns', metavar='REGEX',
+                            help='セル全体が一致した場合に翻訳対象外とする正規表現（複数指定可能）')
+        parser.add_argument('--checkpoint-interval', type=int, default=500,
+                            help='チェックポイントを書き出すまでのセル数（デフォルト: 500）')
+        parser.add_argument('--metrics-out',
+                            help='処理段階・API呼び出しの計測結果を書き出すファイル（拡張子が .prom の場合は'
+                                 'Prometheusのtextfile形式、それ以外はJSON形式）')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='翻訳せずに、入力を検証して翻訳対象のセル数・必要な文字数を表示')
+        parser.add_argument('--serve', nargs='?', const=DEFAULT_SERVE_ADDRESS, metavar='[HOST:]PORT',
+                            help='常駐モードで起動し、HTTPでジョブを受け付ける'
+                                 f'（デフォルト: {DEFAULT_SERVE_ADDRESS}）')
+        parser.add_argument('--max-jobs', type=int, default=1,
+                            help='常駐モードで同時に実行するジョブ数（デフォルト: 1）')
+        parser.add_argument('--max-queued-jobs', type=int, default=100,
+                            help='常駐モードで実行待ちにできるジョブ数の上限（デフォルト: 100）')
+        parser.add_argument('--allow-any-output', action='store_true',
+                            help='常駐モードで入力ファイルのディレクトリ外への出力を許可する')
+        parser.add_argument('--profile', nargs='?', const='translate_excel.prof', metavar='PATH',
+                            help='cProfileで実行し、統計をファイルへ保存（デフォルト: translate_excel.prof）')
 
         args = parser.parse_args()
 
+        if args.workers < 1:
+            parser.error("ワーカー数は1以上である必要があります")
+        if args.max_rps is not None and args.max_rps <= 0:
+            parser.error("最大リクエスト数は0より大きい値である必要があります")
+        if args.cache_max_entries < 1:
+            parser.error("キャッシュの最大エントリー数は1以上である必要があります")
+        if args.checkpoint_interval < 1:
+            parser.error("チェックポイントの間隔は1以上である必要があります")
+        if args.pool_size is not None and args.pool_size < 1:
+            parser.error("接続数は1以上である必要があります")
+        if args.connect_timeout <= 0 or args.read_timeout <= 0:
+            parser.error("タイムアウトは0より大きい値である必要があります")
+        if args.file_workers < 1:
+            parser.error("ファイルの並行処理数は1以上である必要があります")
+        try:
+            target_langs = parse_target_langs(args.target_langs)
+        except ValueError as e:
+            parser.error(str(e))
+        if not MIN_REQUEST_BYTES <= args.request_bytes <= MAX_REQUEST_BYTES:
+            parser.error(f"リクエストサイズは{MIN_REQUEST_BYTES}～{MAX_REQUEST_BYTES}バイトである必要があります")
+        if args.max_jobs < 1 or args.max_queued_jobs < 1:
+            parser.error("ジョブ数は1以上である必要があります")
+        serve = None
+        if args.serve:
+            host, _, port = args.serve.rpartition(':')
+            if not port.isdigit() or not 0 < int(port) < 65536:
+                parser.error(f"待ち受けるアドレスの指定が無効です: {args.serve}")
+            serve = (host or DEFAULT_SERVE_ADDRESS.rpartition(':')[0], int(port))
+        skip_rules = [] if args.skip_rules.strip().lower() == 'none' else \
+            [rule.strip() for rule in args.skip_rules.split(',') if rule.strip()]
+        unknown_rules = set(skip_rules) - set(SKIP_RULES)
+        if unknown_rules:
+            parser.error(f"無効な判定ルールです: {', '.join(sorted(unknown_rules))}")
+        for pattern in args.skip_patterns or []:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                parser.error(f"正規表現が無効です: {pattern} ({str(e)})")
+
+        # 対話モード・バッチモード共通のオプション
+        options = {
+            'api_key': args.api_key,
+            'api_url': args.api_url,
+            'sheets': [name.strip() for name in args.sheets.split(',')] if args.sheets else None,
+            'file_workers': args.file_workers,
+            'workers': args.workers,
+            'max_rps': args.max_rps,
+            'cache_file': None if args.no_cache else args.cache_file,
+            'cache_max_entries': args.cache_max_entries,
+            'excel_mode': args.excel_mode,
+            'resume': args.resume,
+            'checkpoint_interval': args.checkpoint_interval,
+            'pool_size': args.pool_size,
+            'connect_timeout': args.connect_timeout,
+            'read_timeout': args.read_timeout,
+            'use_gzip': args.gzip,
+            'request_bytes': args.request_bytes,
+            'target_langs': target_langs,
+            'metrics_out': args.metrics_out,
+            'quota_policy': args.quota_policy,
+            'incremental': args.incremental,
+            'skip_rules': skip_rules,
+            'skip_patterns': args.skip_patterns,
+            'profile_out': args.profile,
+            'dry_run': args.dry_run,
+            'serve': serve,
+            'max_jobs': args.max_jobs,
+            'max_queued_jobs': args.max_queued_jobs,
+            'allow_any_output': args.allow_any_output
+        }
+
+        if serve:
+            # 常駐モードでは入力ファイル・列・行範囲はジョブごとに指定する
+            return {
+                'batch_mode': True,
+                'input_path': "",
+                'output_path': "",
+                'source_cols': [],
+                'target_cols': [],
+                'row_range': (0, 0),
+                'input_files': [],
+                **options
+            }
+
         if args.batch:
             if not all([args.input, args.source_cols, args.target_cols, 
                        args.row_start is not None, args.row_end is not None]):
                 parser.error("バッチモードでは全てのパラメータが必要です")
 
-            if not os.path.exists(args.input):
+            input_files = self._expand_input_files(args.input, args.output)
+            if not input_files:
                 parser.error(f"入力ファイルが見つかりません: {args.input}")
+            if len(input_files) > 1 and args.output:
+                os.makedirs(args.output, exist_ok=True)
 
             # 列の解析
             try:
-                source_cols = []
-                for part in args.source_cols.split(','):
-                    if '-' in part:
-                        start, end = part.split('-')
-                        start_num = excel_column_to_number(start.strip())
-                        end_num = excel_column_to_number(end.strip())
-                        source_cols.extend(range(start_num, end_num + 1))
-                    else:
-                        source_cols.append(excel_column_to_number(part.strip()))
-
-                target_cols = []
-                for part in args.target_cols.split(','):
-                    if '-' in part:
-                        start, end = part.split('-')
-                        start_num = excel_column_to_number(start.strip())
-                        end_num = excel_column_to_number(end.strip())
-                        target_cols.extend(range(start_num, end_num + 1))
-                    else:
-                        target_cols.append(excel_column_to_number(part.strip()))
+                source_cols = parse_column_spec(args.source_cols)
+                target_cols = parse_column_spec(args.target_cols)
             except ValueError as e:
                 parser.error(f"列の指定が無効です: {str(e)}")
 
-            if len(source_cols) != len(target_cols):
-                parser.error("翻訳元と翻訳先の列数が一致しません")
+            if len(source_cols) * len(target_langs) != len(target_cols):
+                parser.error("翻訳先の列数が翻訳元の列数と翻訳先言語の数の積と一致しません")
+            if len(set(target_cols)) != len(target_cols):
+                parser.error("翻訳先の列が重複しています")
 
             if args.row_start > args.row_end:
                 parser.error("開始行は終了行以下である必要があります")
 
             return {
                 'batch_mode': True,
-                'input_path': args.input,
-                'output_path': args.output or self._generate_default_output_path(args.input),
+                'input_path': input_files[0][0],
+                'output_path': input_files[0][1],
                 'source_cols': source_cols,
                 'target_cols': target_cols,
                 'row_range': (args.row_start, args.row_end),
-                'api_key': args.api_key
+                'input_files': input_files,
+                **options
             }
         return {
             'batch_mode': False,
@@ -141,9 +375,66 @@ class CLIInterface:
             'source_cols': [],
             'target_cols': [],
             'row_range': (0, 0),
-            'api_key': args.api_key
+            'input_files': [],
+            **options
         }
 
+    def parse_history_args(self, argv: List[str]) -> Dict:
+        """
+        history サブコマンドの引数の解析
+
+        Args:
+            argv (List[str]): "history" より後ろの引数
+
+        Returns:
+            Dict: サブコマンドの種類（command）と各オプションの値
+        """
+        parser = argparse.ArgumentParser(prog='translate_excel.py history', description='翻訳履歴の検索・書き出し・圧縮')
+        parser.add_argument('--history-file', default=DEFAULT_HISTORY_FILE,
+                            help=f'翻訳履歴のファイルパス（デフォルト: {DEFAULT_HISTORY_FILE}）')
+        subparsers = parser.add_subparsers(dest='command', required=True)
+
+        query_parser = subparsers.add_parser('query', help='条件に一致する翻訳履歴を表示・書き出し')
+        query_parser.add_argument('--file', dest='excel_file', help='Excelファイル名（パスを除く）')
+        query_parser.add_argument('--sheet', dest='sheet_name', help='シート名')
+        query_parser.add_argument('--cell', help='翻訳元または翻訳先のセル（例: B12）')
+        query_parser.add_argument('--text', dest='source_text', help='原文（完全一致）')
+        query_parser.add_argument('--lang', dest='target_lang', help='翻訳先言語')
+        query_parser.add_argument('--since', help='この日時以降（例: 2024-04-01、2024-04-01T09:00。タイムゾーン省略時は日本時間）')
+        query_parser.add_argument('--until', help='この日時より前（--sinceと同じ形式）')
+        query_parser.add_argument('--limit', type=int, default=20,
+                                  help='新しい方から表示する件数（0で全件、デフォルト: 20）')
+        query_parser.add_argument('--format', choices=('text', 'jsonl', 'csv'), default='text',
+                                  help='出力形式（デフォルト: text）')
+        query_parser.add_argument('--output', help='書き出すファイルのパス（指定しない場合は標準出力）')
+
+        compact_parser = subparsers.add_parser('compact', help='保持期間を過ぎた翻訳履歴を削除してファイルを書き直す')
+        compact_parser.add_argument('--older-than', type=float, metavar='DAYS',
+                                    help='この日数より前の翻訳履歴を削除')
+        compact_parser.add_argument('--latest-only', action='store_true',
+                                    help='同じ翻訳先のセル（ファイル・シート・セル・言語）は最新の翻訳履歴のみ残す')
+
+        subparsers.add_parser('stats', help='翻訳履歴の件数・期間を表示')
+
+        args = parser.parse_args(argv)
+        options = vars(args)
+        if args.command == 'query':
+            if args.limit < 0:
+                parser.error("件数は0以上である必要があります")
+            for key in ('since', 'until'):
+                if options[key]:
+                    try:
+                        value = datetime.fromisoformat(options[key])
+                    except ValueError:
+                        parser.error(f"日時の指定が無効です: {options[key]}")
+                    options[key] = value if value.tzinfo is not None else value.replace(tzinfo=JST)
+        elif args.command == 'compact':
+            if args.older_than is None and not args.latest_only:
+                parser.error("--older-than または --latest-only を指定してください")
+            if args.older_than is not None and args.older_than < 0:
+                parser.error("日数は0以上である必要があります")
+        return options
+
     def get_parameters(self) -> TranslationParams:
         """全パラメータの取得"""
         # バッチモードのチェック
@@ -160,19 +451,19 @@ class CLIInterface:
             "翻訳先の列を入力してください（カンマ区切り、範囲指定可能 例: F,G,H-J）: "
         )
 
-        # 翻訳元と翻訳先の列数チェック
-        if len(source_cols) != len(target_cols):
-            raise ValueError("翻訳元と翻訳先の列数が一致しません。")
+        # 翻訳元と翻訳先の列数チェック（翻訳先の列は言語ごとに翻訳元の列と同じ数だけ並べる）
+        if len(source_cols) * len(args['target_langs']) != len(target_cols):
+            raise ValueError("翻訳先の列数が翻訳元の列数と翻訳先言語の数の積と一致しません。")
 
         row_range = self._get_row_range()
+        output_path = self._get_output_path(input_path)
         return {
+            **args,
             'batch_mode': False,
             'input_path': input_path,
-            'output_path': self._get_output_path(input_path),
+            'output_path': output_path,
             'source_cols': source_cols,
             'target_cols': target_cols,
             'row_range': row_range,
-            'api_key': args.get('api_key')
+            'input_files': [(input_path, output_path)]
         }
-
-from utils import excel_column_to_number, number_to_excel_column
\ No newline at end of file
@@ -1,22 +1,114 @@
 """
 DeepL APIクライアントモジュール
 """
+import gzip
+import json
 import os
-import requests
-from time import sleep
-from typing import Optional
+import threading
+from time import perf_counter, sleep
+from typing import Dict, List, Optional
+
+from metrics import Metrics
+from usage_counter import record_usage
+
+# DeepL APIの1リクエストあたりの上限
+MAX_TEXTS_PER_REQUEST = 50
+MAX_REQUEST_BYTES = 128 * 1024
+
+# 全ワーカー共通の待機で調整される429を、1リクエストあたり何回までリトライするか
+MAX_RATE_LIMIT_RETRIES = 10
+
+# この大きさ以上のリクエスト本文はgzip圧縮して送信する
+GZIP_MIN_BYTES = 16 * 1024
+
+# APIのエンドポイント（Free版のAPIキーは ":fx" で終わる）
+FREE_API_URL = "https://api-free.deepl.com"
+PRO_API_URL = "https://api.deepl.com"
+
+
+def resolve_api_url(api_key: str, api_url: Optional[str] = None) -> str:
+    """
+    APIのベースURLを決定
+
+    指定がない場合は環境変数DEEPL_API_URL、それもない場合はAPIキーの種類から
+    Free版/Pro版を判定する。
+    """
+    if not api_url:
+        api_url = os.getenv('DEEPL_API_URL') or (FREE_API_URL if api_key.endswith(':fx') else PRO_API_URL)
+    return api_url.rstrip('/')
+
+
+def translation_endpoint(api_url: str) -> str:
+    """
+    翻訳キャッシュ・翻訳履歴で翻訳結果を区別するための翻訳元の名前
+
+    DeepL APIのFree版・Pro版は同じ翻訳を返すため空文字列（既定）とし、
+    モックサーバーなどそれ以外のURLはベースURLで区別する。
+    """
+    api_url = api_url.rstrip('/')
+    return "" if api_url in (FREE_API_URL, PRO_API_URL) else api_url
+
+
+class BatchRejectedError(Exception):
+    """リクエスト内容が原因でバッチが拒否された場合の例外"""
+
+
+class QuotaExceededError(Exception):
+    """APIキーの文字数上限に達した場合の例外"""
+
 
 class DeepLTranslator:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, rate_limiter=None, cache=None,
+                 pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 use_gzip: bool = False, api_url: Optional[str] = None,
+                 metrics: Optional[Metrics] = None, max_request_bytes: int = MAX_REQUEST_BYTES):
+        """
+        DeepL翻訳クライアントの初期化
+
+        Args:
+            api_key (Optional[str]): DeepL APIキー（指定しない場合は環境変数DEEPL_API_KEYを使用）
+            rate_limiter: 全ワーカーで共有するレート制限（translation_scheduler.RateLimiter）
+            cache: 翻訳メモリ（translation_cache.TranslationCache）
+            pool_size (int): 保持するHTTP接続数（同時に送信するリクエスト数以上を指定）
+            connect_timeout (float): 接続タイムアウト（秒）
+            read_timeout (float): 応答待ちタイムアウト（秒）
+            use_gzip (bool): 大きなリクエスト本文をgzip圧縮して送信するかどうか
+            api_url (Optional[str]): APIのベースURL（指定しない場合は環境変数DEEPL_API_URL、
+                それもない場合はAPIキーの種類からFree版/Pro版を判定）
+            metrics (Optional[Metrics]): API呼び出しの計測値の集計先
+            max_request_bytes (int): 1リクエストに詰め込む本文の最大サイズ（APIの上限以下）
+        """
         self.api_key = api_key or os.getenv('DEEPL_API_KEY')
         if not self.api_key:
             raise ValueError("DeepL APIキーが指定されていません。コマンドライン引数 --api-key または環境変数 DEEPL_API_KEY で指定してください。")
 
-        self.base_url = "https://api-free.deepl.com/v2/translate"
+        self.api_url = resolve_api_url(self.api_key, api_url)
+        self.base_url = f"{self.api_url}/v2/translate"
+        self.usage_url = f"{self.api_url}/v2/usage"
         self.headers = {
             "Authorization": f"DeepL-Auth-Key {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.timeout = (connect_timeout, read_timeout)
+        self.use_gzip = use_gzip
+        self.max_request_bytes = min(max_request_bytes, MAX_REQUEST_BYTES)
+        self.metrics = metrics or Metrics()
+        # このクライアントで翻訳に成功した文字数（文字数上限の消費量）
+        self.characters_billed = 0
+        self._billed_lock = threading.Lock()
+
+        # requestsは読み込みに時間がかかるため、クライアントを作成する時点で読み込む
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        # Keep-Aliveで接続を再利用するセッション（ワーカースレッド間で共有）
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers.update(self.headers)
 
     def test_connection(self) -> bool:
         """API接続のテスト"""
@@ -32,30 +124,174 @@ class DeepLTranslator:
         """テキストを翻訳"""
         if not text:
             return ""
+        return self.translate_batch([text], target_lang=target_lang, max_retries=max_retries)[0]
+
+    def translate_batch(self, texts: List[str], target_lang: str = "JA",
+                        max_retries: int = 3) -> List[Optional[str]]:
+        """
+        複数のテキストをまとめて翻訳
+
+        キャッシュ済みのテキストはAPIに送信しない。残りのテキストはAPIの
+        件数・サイズ上限に収まるようにリクエストへ詰め込まれ、結果は入力と
+        同じ順序で返される。
+
+        Args:
+            texts (List[str]): 翻訳するテキストのリスト
+            target_lang (str): 翻訳先言語
+            max_retries (int): リトライ回数
+
+        Returns:
+            List[Optional[str]]: 翻訳結果のリスト（翻訳できなかった要素はNone）
+        """
+        results: List[Optional[str]] = ["" for _ in texts]
+        indices = [i for i, text in enumerate(texts) if text]
 
-        for attempt in range(max_retries):
+        if self.cache is not None and indices:
+            cached = self.cache.get_many([texts[i] for i in indices], target_lang)
+            for i in indices:
+                if texts[i] in cached:
+                    results[i] = cached[texts[i]]
+            indices = [i for i in indices if texts[i] not in cached]
+
+        for batch in self._pack_batches(indices, texts):
+            self._translate_packed(batch, texts, results, target_lang, max_retries)
+
+        if self.cache is not None and indices:
+            self.cache.put_many(
+                [(texts[i], results[i]) for i in indices if results[i] is not None],
+                target_lang
+            )
+        return results
+
+    def _pack_batches(self, indices: List[int], texts: List[str]) -> List[List[int]]:
+        """テキストを件数・バイト数の上限までリクエスト単位にまとめる"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_bytes = 0
+        for i in indices:
+            # JSONの引用符と区切り文字の分を加算
+            size = len(texts[i].encode('utf-8')) + 4
+            if current and (len(current) >= MAX_TEXTS_PER_REQUEST
+                            or current_bytes + size > self.max_request_bytes):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(i)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _translate_packed(self, batch: List[int], texts: List[str],
+                          results: List[Optional[str]], target_lang: str,
+                          max_retries: int) -> None:
+        """
+        1リクエスト分を翻訳し、テキストが原因で拒否された場合は分割して問題の要素を切り分ける
+
+        リクエスト全体に対するエラー（翻訳先言語が無効など）は分割せずにそのまま送出する。
+        """
+        try:
+            translations = self._request_translations(
+                [texts[i] for i in batch], target_lang, max_retries
+            )
+        except BatchRejectedError as e:
+            if len(batch) == 1:
+                print(f"警告: テキストを翻訳できませんでした: {str(e)}")
+                results[batch[0]] = None
+                return
+            middle = len(batch) // 2
+            self._translate_packed(batch[:middle], texts, results, target_lang, max_retries)
+            self._translate_packed(batch[middle:], texts, results, target_lang, max_retries)
+            return
+
+        for i, translated in zip(batch, translations):
+            results[i] = translated
+
+    def _request_translations(self, texts: List[str], target_lang: str,
+                              max_retries: int) -> List[str]:
+        """
+        翻訳APIを呼び出し、入力順の翻訳結果を返す
+
+        リトライしても翻訳できない場合は、空の結果を返さずに例外を送出する。
+        """
+        import requests
+
+        attempt = 0
+        # 全ワーカー共通の待機で調整される429はリトライ回数に数えず、別の上限で打ち切る
+        rate_limited = 0
+        while attempt < max_retries:
+            if attempt > 0 or rate_limited > 0:
+                self.metrics.increment('api_retries_total')
             try:
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json={
-                        "text": [text],
-                        "target_lang": target_lang
-                    }
-                )
+                generation = None
+                if self.rate_limiter:
+                    wait_start = perf_counter()
+                    generation = self.rate_limiter.acquire()
+                    self.metrics.increment('throttle_wait_seconds_total', perf_counter() - wait_start)
+                body = json.dumps({
+                    "text": texts,
+                    "target_lang": target_lang
+                }, ensure_ascii=False).encode('utf-8')
+                headers = {}
+                if self.use_gzip and len(body) >= GZIP_MIN_BYTES:
+                    body = gzip.compress(body)
+                    headers["Content-Encoding"] = "gzip"
+                self.metrics.increment('api_characters_sent_total', sum(len(text) for text in texts))
+                self.metrics.increment('api_bytes_sent_total', len(body))
+                request_start = perf_counter()
+                try:
+                    response = self.session.post(
+                        self.base_url,
+                        data=body,
+                        headers=headers,
+                        timeout=self.timeout
+                    )
+                except requests.exceptions.RequestException:
+                    self.metrics.increment('api_requests_total', labels={'status': 'error'})
+                    raise
+                status = {'status': str(response.status_code)}
+                self.metrics.observe('api_request_seconds', perf_counter() - request_start, status)
+                self.metrics.increment('api_requests_total', labels=status)
 
                 if response.status_code == 429:  # Rate limit
+                    if self.rate_limiter:
+                        rate_limited += 1
+                        if rate_limited > MAX_RATE_LIMIT_RETRIES:
+                            raise Exception(f"API制限が解除されませんでした（{MAX_RATE_LIMIT_RETRIES}回リトライしました）")
+                        # 全ワーカーが共通で待機するため、ここでは待たない
+                        # （同じ連続429を受信した他のワーカーとは待機時間を共有する）
+                        wait_time = self.rate_limiter.report_rate_limited(generation)
+                        self.metrics.increment('rate_limit_backoff_seconds_total', wait_time)
+                        print(f"API制限に達しました。{wait_time:.0f}秒待機します...")
+                        continue
                     wait_time = 2 ** attempt
+                    self.metrics.increment('rate_limit_backoff_seconds_total', wait_time)
                     print(f"API制限に達しました。{wait_time}秒待機します...")
                     sleep(wait_time)
+                    attempt += 1
                     continue
                 elif response.status_code == 403:
                     raise Exception("APIキーが無効です")
                 elif response.status_code == 456:
-                    raise Exception("文字制限を超えています")
+                    raise QuotaExceededError("文字制限を超えています")
+                elif response.status_code == 413 or (response.status_code == 400
+                                                     and self._is_payload_error(response)):
+                    raise BatchRejectedError(f"リクエストが拒否されました (ステータス: {response.status_code})")
+                elif response.status_code == 400:
+                    # 翻訳先言語・APIキーの形式など、リクエスト全体に対するエラーは分割しても解消しない
+                    raise Exception(f"リクエストが拒否されました (ステータス: 400): {self._error_message(response)}")
 
                 response.raise_for_status()
-                return response.json()["translations"][0]["text"]
+                if self.rate_limiter:
+                    self.rate_limiter.report_success()
+                translations = [t["text"] for t in response.json()["translations"]]
+                if len(translations) != len(texts):
+                    raise BatchRejectedError("翻訳結果の件数が一致しません")
+                characters = sum(len(text) for text in texts)
+                with self._billed_lock:
+                    self.characters_billed += characters
+                record_usage(characters_billed=characters)
+                return translations
 
             except requests.exceptions.RequestException as e:
                 if attempt == max_retries - 1:
@@ -63,5 +299,67 @@ class DeepLTranslator:
                 wait_time = 2 ** attempt
                 print(f"エラーが発生しました。{wait_time}秒後にリトライします...")
                 sleep(wait_time)
+                attempt += 1
+
+        raise Exception(f"API制限が解除されませんでした（{max_retries}回リトライしました）")
+
+    @staticmethod
+    def _error_message(response) -> str:
+        """エラー応答のメッセージ（JSONでない場合は本文）"""
+        try:
+            return str(response.json().get('message', ''))
+        except ValueError:
+            return response.text
+
+    @classmethod
+    def _is_payload_error(cls, response) -> bool:
+        """400の原因が翻訳するテキスト（text）にあるかを判定"""
+        return 'text' in cls._error_message(response).lower()
+
+    def get_usage(self) -> Dict[str, int]:
+        """
+        文字数の使用状況を取得
+
+        Returns:
+            Dict[str, int]: character_count（使用済み文字数）と character_limit（上限文字数）
+        """
+        import requests
+
+        try:
+            response = self.session.get(self.usage_url, timeout=self.timeout)
+            if response.status_code == 403:
+                raise Exception("APIキーが無効です")
+            response.raise_for_status()
+            usage = response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"使用状況の取得に失敗しました: {str(e)}")
+        return {
+            'character_count': int(usage.get('character_count', 0)),
+            'character_limit': int(usage.get('character_limit', 0))
+        }
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """
+        接続プールの統計を取得
+
+        Returns:
+            Dict[str, int]: リクエスト数・新規接続数・再利用された接続数
+        """
+        requests_count = 0
+        new_connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            new_connections += pool.num_connections
+        return {
+            'requests': requests_count,
+            'new_connections': new_connections,
+            'reused_connections': max(0, requests_count - new_connections)
+        }
 
-        return None
\ No newline at end of file
+    def close(self) -> None:
+        """セッションを閉じる"""
+        self.session.close()
@@ -1,23 +1,48 @@
 """
 Excel操作を担当するモジュール
 """
-from openpyxl import load_workbook, Workbook
+from itertools import zip_longest
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from utils import number_to_excel_column
 
+# ワークブックの読み書きモード
+MODE_MEMORY = "memory"
+MODE_STREAMING = "streaming"
+MODE_PATCH = "patch"
+EXCEL_MODES = (MODE_MEMORY, MODE_STREAMING, MODE_PATCH)
+
 class ExcelHandler:
-    def __init__(self, input_path: str, output_path: Optional[str] = None):
+    def __init__(self, input_path: str, output_path: Optional[str] = None, mode: str = MODE_MEMORY):
+        """
+        Excelハンドラーの初期化
+
+        Args:
+            input_path (str): 入力ファイルのパス
+            output_path (Optional[str]): 出力ファイルのパス
+            mode (str): "memory" はワークブック全体を読み込み書式を保持する。
+                "streaming" は読み取り専用で必要な範囲だけを読み込み、
+                書き込み専用ワークブックで出力する（書式は保持されない）。
+                "patch" は読み取り専用で読み込み、保存時は.xlsxのシートXMLの
+                書き込んだセルだけを書き換える（書式やその他の内容は元のまま）。
+        """
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"入力ファイルが見つかりません: {input_path}")
+        if mode not in EXCEL_MODES:
+            raise ValueError(f"無効なモードです: {mode}")
 
         self.input_path = input_path
         self.output_path = output_path or self._generate_output_path()
+        self.mode = mode
 
-        # ワークブックを読み込む
-        self.wb = load_workbook(input_path)
+        # ワークブックを読み込む（openpyxlは読み込みに時間がかかるため、ここで読み込む）
+        from openpyxl import load_workbook
+        self.wb = load_workbook(input_path, read_only=(mode != MODE_MEMORY))
         self.ws = self.wb.active
 
+        # ストリーミング・パッチモードで書き込む値（シートごと、保存時に反映）
+        self._patches: Dict[str, Dict[Tuple[int, int], Any]] = {}
+
     def _generate_output_path(self) -> str:
         """デフォルトの出力パスを生成"""
         dir_name = os.path.dirname(self.input_path)
@@ -33,17 +58,103 @@ class ExcelHandler:
         except Exception as e:
             raise Exception(f"セルの読み取りに失敗しました (行: {row}, 列: {col}): {str(e)}")
 
-    def set_cell_value(self, row: int, col: int, value: str) -> None:
+    def get_column_values(self, cols: List[int], row_start: int, row_end: int,
+                          raw: bool = False) -> Dict[int, List[Any]]:
+        """
+        指定した列・行範囲の値を列ごとのリストとして1回の走査で取得
+
+        Args:
+            cols (List[int]): 列番号のリスト
+            row_start (int): 開始行
+            row_end (int): 終了行
+            raw (bool): Trueの場合は文字列に変換せず、数値・日付などのセルの値をそのまま返す
+
+        Returns:
+            Dict[int, List[Any]]: 列番号ごとの、row_startからrow_endまでの値
+                （空のセルは空文字、rawの場合はNone）
+        """
+        if not cols:
+            return {}
+        min_col = min(cols)
+        max_col = max(cols)
+        total_rows = row_end - row_start + 1
+        try:
+            rows = self.ws.iter_rows(min_row=row_start, max_row=row_end,
+                                     min_col=min_col, max_col=max_col, values_only=True)
+            # 行の並びを列の並びに転置する（読み取り専用モードでは短い行があるため不足分はNone）
+            columns = list(zip_longest(*rows))
+        except Exception as e:
+            raise Exception(f"セルの読み取りに失敗しました (行: {row_start}-{row_end}): {str(e)}")
+
+        result: Dict[int, List[str]] = {}
+        for col in cols:
+            offset = col - min_col
+            values = columns[offset] if offset < len(columns) else ()
+            if raw:
+                column = list(values)
+                column.extend([None] * (total_rows - len(column)))
+            else:
+                column = [str(value) if value is not None else "" for value in values]
+                column.extend([""] * (total_rows - len(column)))
+            result[col] = column
+        return result
+
+    def set_column_values(self, col: int, row_start: int, values: List[Any]) -> None:
+        """
+        1列分の値をまとめて書き込む
+
+        文字列は "=" で始まる場合も数式ではなく文字列として書き込む（全てのモードで共通）。
+
+        Args:
+            col (int): 列番号
+            row_start (int): valuesの先頭に対応する行
+            values (List[Any]): 書き込む値（文字列・数値・日付など、Noneの要素は書き込まない）
+        """
+        if self.mode != MODE_MEMORY:
+            self._patches.setdefault(self.ws.title, {}).update(
+                ((row, col), value) for row, value in enumerate(values, start=row_start) if value is not None
+            )
+            return
+        cell = self.ws.cell
+        try:
+            for row, value in enumerate(values, start=row_start):
+                if value is not None:
+                    self._write_cell(cell(row=row, column=col), value)
+        except Exception as e:
+            raise Exception(f"セルの書き込みに失敗しました (列: {col}): {str(e)}")
+
+    def set_cell_value(self, row: int, col: int, value: Any) -> None:
         """セルに値を設定"""
+        if self.mode != MODE_MEMORY:
+            self._patches.setdefault(self.ws.title, {})[(row, col)] = value
+            return
         try:
-            self.ws.cell(row=row, column=col, value=value)
+            self._write_cell(self.ws.cell(row=row, column=col), value)
         except Exception as e:
             raise Exception(f"セルの書き込みに失敗しました (行: {row}, 列: {col}): {str(e)}")
 
+    @staticmethod
+    def _write_cell(cell, value: Any):
+        """セルに値を書き込む（"=" で始まる文字列は数式として解釈させない）"""
+        cell.value = value
+        if isinstance(value, str) and value.startswith('='):
+            cell.data_type = 's'
+        return cell
+
     def get_sheet_name(self) -> str:
         """現在のシート名を取得"""
         return self.ws.title
 
+    def get_sheet_names(self) -> List[str]:
+        """全てのワークシート名を取得"""
+        return [ws.title for ws in self.wb.worksheets]
+
+    def select_sheet(self, sheet_name: str) -> None:
+        """読み書きの対象シートを切り替え"""
+        if sheet_name not in self.get_sheet_names():
+            raise ValueError(f"シートが見つかりません: {sheet_name}")
+        self.ws = self.wb[sheet_name]
+
     def get_cell_address(self, row: int, col: int) -> str:
         """セルのアドレスを取得 (例: A1, B2)"""
         return f"{number_to_excel_column(col)}{row}"
@@ -51,6 +162,57 @@ class ExcelHandler:
     def save(self) -> None:
         """ワークブックを保存"""
         try:
-            self.wb.save(self.output_path)
+            if self.mode == MODE_STREAMING:
+                self._save_streaming()
+            elif self.mode == MODE_PATCH:
+                from xlsx_patcher import patch_workbook
+                self.wb.close()
+                patch_workbook(self.input_path, self.output_path, self._patches)
+            else:
+                self.wb.save(self.output_path)
         except Exception as e:
-            raise Exception(f"ファイルの保存に失敗しました: {str(e)}")
\ No newline at end of file
+            raise Exception(f"ファイルの保存に失敗しました: {str(e)}")
+
+    def close(self) -> None:
+        """読み込んだワークブックを閉じる（保存せずに破棄する場合）"""
+        self.wb.close()
+
+    def _save_streaming(self) -> None:
+        """読み取り専用ワークブックを1行ずつ書き込み専用ワークブックへ書き出す"""
+        from openpyxl import Workbook
+        active_index = self.wb.worksheets.index(self.wb.active)
+        out_wb = Workbook(write_only=True)
+        for ws in self.wb.worksheets:
+            out_ws = out_wb.create_sheet(title=ws.title)
+            # 行ごとの書き込み値
+            row_patches: Dict[int, Dict[int, Any]] = {}
+            for (row, col), value in self._patches.get(ws.title, {}).items():
+                row_patches.setdefault(row, {})[col] = value
+            last_row = 0
+            for row, values in enumerate(ws.iter_rows(values_only=True), start=1):
+                out_ws.append(self._apply_patches(out_ws, values, row_patches.get(row)))
+                last_row = row
+            # シートの末尾より後ろの行への書き込み
+            for row in sorted(r for r in row_patches if r > last_row):
+                for _ in range(last_row + 1, row):
+                    out_ws.append([])
+                out_ws.append(self._apply_patches(out_ws, (), row_patches[row]))
+                last_row = row
+        out_wb.active = active_index
+        out_wb.save(self.output_path)
+        self.wb.close()
+
+    def _apply_patches(self, out_ws, values: tuple, patches: Optional[Dict[int, Any]]) -> list:
+        """1行分の値に書き込み値を反映"""
+        if not patches:
+            return list(values)
+        row_values = list(values)
+        max_col = max(patches)
+        if len(row_values) < max_col:
+            row_values.extend([None] * (max_col - len(row_values)))
+        for col, value in patches.items():
+            if isinstance(value, str) and value.startswith('='):
+                from openpyxl.cell import WriteOnlyCell
+                value = self._write_cell(WriteOnlyCell(out_ws), value)
+            row_values[col - 1] = value
+        return row_values
@@ -0,0 +1,104 @@
+"""
+翻訳履歴の検索・書き出し・圧縮を行う history サブコマンドのモジュール
+"""
+import csv
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, TextIO
+
+from translation_history import JST, TranslationHistory
+
+# CSV形式で書き出す項目
+CSV_FIELDS = ('timestamp', 'excel_file', 'sheet_name', 'source_cell', 'target_cell',
+              'target_lang', 'source_text', 'translated_text')
+
+
+def _format_text(entry: Dict) -> str:
+    """1エントリーを1行の表示用の文字列に変換"""
+    def one_line(text) -> str:
+        return str(text or "").replace("\r", "\\r").replace("\n", "\\n")
+
+    return (f"{entry.get('timestamp', '')}  {entry.get('excel_file', '')}  {entry.get('sheet_name', '')}  "
+            f"{entry.get('source_cell', '')}→{entry.get('target_cell', '')}  {entry.get('target_lang', 'JA')}  "
+            f"{one_line(entry.get('source_text'))} → {one_line(entry.get('translated_text'))}")
+
+
+def write_entries(entries: Iterator[Dict], output_format: str, stream: TextIO) -> int:
+    """
+    エントリーを指定した形式で書き出す
+
+    Args:
+        entries (Iterator[Dict]): 翻訳履歴のエントリー
+        output_format (str): "text"・"jsonl"・"csv"
+        stream (TextIO): 書き出し先
+
+    Returns:
+        int: 書き出したエントリー数
+    """
+    count = 0
+    if output_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow(entry)
+            count += 1
+        return count
+    for entry in entries:
+        if output_format == 'jsonl':
+            stream.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        else:
+            stream.write(_format_text(entry) + "\n")
+        count += 1
+    return count
+
+
+def run_history_command(options: Dict) -> None:
+    """
+    history サブコマンドを実行
+
+    Args:
+        options (Dict): CLIInterface.parse_history_argsの解析結果
+    """
+    history = TranslationHistory(history_file=options['history_file'])
+    try:
+        if options['command'] == 'query':
+            entries = history.query(
+                excel_file=options['excel_file'],
+                sheet_name=options['sheet_name'],
+                cell=options['cell'],
+                source_text=options['source_text'],
+                target_lang=options['target_lang'],
+                since=options['since'],
+                until=options['until'],
+                limit=options['limit'] or None
+            )
+            if options['output']:
+                # CSVはExcelで開けるようにBOM付きUTF-8で書き出す
+                encoding = 'utf-8-sig' if options['format'] == 'csv' else 'utf-8'
+                with open(options['output'], 'w', encoding=encoding, newline='') as f:
+                    count = write_entries(entries, options['format'], f)
+                print(f"翻訳履歴 {count}件を {options['output']} に書き出しました。")
+            else:
+                count = write_entries(entries, options['format'], sys.stdout)
+                if options['format'] == 'text':
+                    print(f"（{count}件）")
+
+        elif options['command'] == 'compact':
+            before = None
+            if options['older_than'] is not None:
+                before = datetime.now(JST) - timedelta(days=options['older_than'])
+            kept, removed = history.compact(before=before, latest_only=options['latest_only'])
+            print(f"翻訳履歴を圧縮しました: {removed}件を削除、{kept}件を保持")
+
+        elif options['command'] == 'stats':
+            stats = history.index_stats()
+            print(f"翻訳履歴: {history.history_file}")
+            print(f"エントリー数: {stats['entries']}件（ファイル数: {stats['files']}）")
+            print(f"ファイルサイズ: {stats['history_bytes'] / 1024 / 1024:.1f}MB")
+            if stats['entries']:
+                oldest = datetime.fromtimestamp(stats['oldest'], JST).isoformat()
+                newest = datetime.fromtimestamp(stats['newest'], JST).isoformat()
+                print(f"期間: {oldest} ～ {newest}")
+    finally:
+        history.close()
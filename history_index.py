@@ -0,0 +1,324 @@
+"""
+翻訳履歴の索引を管理するモジュール
+
+履歴ファイル（JSON Lines）は追記専用のまま、各エントリーのファイル内の位置と
+検索に使う項目（原文のハッシュ・ファイル名・シート名・セル・翻訳先言語・日時）を
+SQLiteに記録する。索引は検索のたびに、前回から追記された行だけを読み込んで更新する。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 索引を更新する際に1回のトランザクションで登録するエントリー数
+INSERT_BATCH = 10000
+
+_COLUMNS = ("offset, length, timestamp, excel_file, sheet_name, "
+            "source_cell, target_cell, target_lang, source_hash")
+
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_entries_source_hash ON entries (source_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_file ON entries (excel_file, sheet_name, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_sheet ON entries (sheet_name, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_source_cell ON entries (source_cell, excel_file)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_target_cell ON entries (target_cell, excel_file)",
+)
+
+
+def _create_table(name: str) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name} ("
+        "id INTEGER PRIMARY KEY, "
+        "offset INTEGER NOT NULL, "
+        "length INTEGER NOT NULL, "
+        "timestamp REAL NOT NULL, "
+        "excel_file TEXT NOT NULL, "
+        "sheet_name TEXT NOT NULL, "
+        "source_cell TEXT NOT NULL, "
+        "target_cell TEXT NOT NULL, "
+        "target_lang TEXT NOT NULL, "
+        "source_hash INTEGER NOT NULL)"
+    )
+
+
+def text_hash(text: str) -> int:
+    """原文の64ビットハッシュ（SQLiteの整数に収まる符号付き整数）"""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def default_index_file(history_file: str) -> str:
+    """履歴ファイルに対応する索引ファイルのパス"""
+    return os.path.splitext(history_file)[0] + ".index.db"
+
+
+class HistoryIndex:
+    def __init__(self, history_file: str, index_file: Optional[str] = None):
+        """
+        翻訳履歴の索引の初期化
+
+        Args:
+            history_file (str): 翻訳履歴（JSON Lines）のファイルパス
+            index_file (Optional[str]): 索引を保存するSQLiteファイルのパス
+                （省略時は履歴ファイルの拡張子を .index.db に変えたパス）
+        """
+        self.history_file = history_file
+        self.index_file = index_file or default_index_file(history_file)
+        self._conn = sqlite3.connect(self.index_file, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_create_table("entries"))
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def close(self) -> None:
+        """索引ファイルを閉じる"""
+        self._conn.close()
+
+    def _get_meta(self, key: str, default: str = "") -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @staticmethod
+    def _file_id(stat: os.stat_result) -> str:
+        """履歴ファイルが置き換えられたことを検出するための識別子"""
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    @staticmethod
+    def _index_row(entry: Dict, offset: int, length: int) -> Tuple:
+        try:
+            timestamp = datetime.fromisoformat(entry['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            timestamp = 0.0
+        return (offset, length, timestamp,
+                entry.get('excel_file') or "", entry.get('sheet_name') or "",
+                (entry.get('source_cell') or "").upper(), (entry.get('target_cell') or "").upper(),
+                entry.get('target_lang') or "JA", text_hash(entry.get('source_text') or ""))
+
+    def sync(self) -> int:
+        """
+        前回から追記された行を索引に登録
+
+        履歴ファイルが置き換えられた・短くなった場合は索引を作り直す。
+        書きかけの最終行（改行で終わっていない行）は次回に登録する。
+
+        Returns:
+            int: 登録したエントリー数
+        """
+        try:
+            stat = os.stat(self.history_file)
+        except FileNotFoundError:
+            if self._get_meta('indexed_bytes', "0") != "0":
+                self._reset()
+            return 0
+
+        indexed_bytes = int(self._get_meta('indexed_bytes', "0"))
+        if self._get_meta('file_id') != self._file_id(stat) or stat.st_size < indexed_bytes:
+            self._reset()
+            indexed_bytes = 0
+        if stat.st_size == indexed_bytes:
+            return 0
+
+        if indexed_bytes == 0:
+            # 全件を登録する場合は、索引を最後にまとめて作成する方が速い
+            self._drop_indexes()
+        added = 0
+        rows: List[Tuple] = []
+        offset = indexed_bytes
+        with open(self.history_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if isinstance(entry, dict):
+                    rows.append(self._index_row(entry, offset, len(line)))
+                offset += len(line)
+                if len(rows) >= INSERT_BATCH:
+                    added += self._insert(rows, offset, stat)
+                    rows = []
+        added += self._insert(rows, offset, stat)
+        for statement in _INDEXES:
+            self._conn.execute(statement)
+        if indexed_bytes == 0:
+            # 検索時にセル・ファイルなどの索引を選べるよう統計情報を作成する
+            self._conn.execute("ANALYZE")
+        self._conn.commit()
+        return added
+
+    def _insert(self, rows: List[Tuple], indexed_bytes: int, stat: os.stat_result) -> int:
+        """エントリーと索引済みの位置を同じトランザクションで登録"""
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO entries ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._set_meta('indexed_bytes', indexed_bytes)
+            self._set_meta('file_id', self._file_id(stat))
+        return len(rows)
+
+    def _reset(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM meta")
+
+    def _drop_indexes(self) -> None:
+        for statement in _INDEXES:
+            name = statement.split(" ON ")[0].split()[-1]
+            self._conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def _build_filter(self, excel_file: Optional[str] = None, sheet_name: Optional[str] = None,
+                      cell: Optional[str] = None, source_text: Optional[str] = None,
+                      target_lang: Optional[str] = None, since: Optional[float] = None,
+                      until: Optional[float] = None) -> Tuple[str, List]:
+        conditions: List[str] = []
+        args: List = []
+        if source_text is not None:
+            conditions.append("source_hash = ?")
+            args.append(text_hash(source_text))
+        if excel_file:
+            conditions.append("excel_file = ?")
+            args.append(excel_file)
+        if sheet_name:
+            conditions.append("sheet_name = ?")
+            args.append(sheet_name)
+        if cell:
+            conditions.append("(source_cell = ? OR target_cell = ?)")
+            args.extend([cell.upper(), cell.upper()])
+        if target_lang:
+            conditions.append("target_lang = ?")
+            args.append(target_lang.upper())
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            args.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", args
+
+    def query(self, excel_file: Optional[str] = None, sheet_name: Optional[str] = None,
+              cell: Optional[str] = None, source_text: Optional[str] = None,
+              target_lang: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        条件に一致するエントリーを日時の古い順に返す
+
+        Args:
+            excel_file (Optional[str]): ファイル名
+            sheet_name (Optional[str]): シート名
+            cell (Optional[str]): 翻訳元または翻訳先のセル（例: B12）
+            source_text (Optional[str]): 原文（完全一致）
+            target_lang (Optional[str]): 翻訳先言語
+            since (Optional[float]): この日時（UNIX時間）以降
+            until (Optional[float]): この日時（UNIX時間）より前
+            limit (Optional[int]): 新しい方から数えた件数の上限
+
+        Yields:
+            Dict: 翻訳履歴のエントリー
+        """
+        self.sync()
+        where, args = self._build_filter(excel_file, sheet_name, cell, source_text, target_lang, since, until)
+        if limit is not None:
+            # 新しい方からlimit件を取得し、古い順に並べ直す
+            rows = self._conn.execute(
+                f"SELECT offset, length FROM entries{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                args + [limit]
+            ).fetchall()
+            rows.reverse()
+        else:
+            rows = self._conn.execute(f"SELECT offset, length FROM entries{where} ORDER BY timestamp, id", args)
+        with open(self.history_file, 'rb') as f:
+            for offset, length in rows:
+                f.seek(offset)
+                entry = json.loads(f.read(length))
+                # ハッシュが衝突した場合に備えて原文を確認する
+                if source_text is None or entry.get('source_text') == source_text:
+                    yield entry
+
+    def stats(self) -> Dict:
+        """索引の件数・期間・ファイル数"""
+        self.sync()
+        count, oldest, newest, files = self._conn.execute(
+            "SELECT COUNT(*), MIN(timestamp), MAX(timestamp), COUNT(DISTINCT excel_file) FROM entries"
+        ).fetchone()
+        return {
+            'entries': count,
+            'oldest': oldest,
+            'newest': newest,
+            'files': files,
+            'history_bytes': int(self._get_meta('indexed_bytes', "0"))
+        }
+
+    def compact(self, before: Optional[float] = None, latest_only: bool = False) -> Tuple[int, int]:
+        """
+        保持期間を過ぎたエントリーを削除して履歴ファイルを書き直す
+
+        残すエントリーは索引から元の行をそのままコピーするため、JSONの解析は行わない。
+        書き直している間に他のプロセスが追記した行は失われるため、翻訳の実行中には行わないこと。
+
+        Args:
+            before (Optional[float]): この日時（UNIX時間）より前のエントリーを削除
+            latest_only (bool): 同じ翻訳先のセル（ファイル・シート・セル・言語）は最新のエントリーのみ残す
+
+        Returns:
+            Tuple[int, int]: (残したエントリー数, 削除したエントリー数)
+        """
+        self.sync()
+        total = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        conditions = []
+        args: List = []
+        if before is not None:
+            conditions.append("timestamp >= ?")
+            args.append(before)
+        if latest_only:
+            conditions.append("id IN (SELECT MAX(id) FROM entries "
+                              "GROUP BY excel_file, sheet_name, target_cell, target_lang)")
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+        tmp_file = f"{self.history_file}.tmp"
+        kept = 0
+        offset = 0
+        self._conn.execute("DROP TABLE IF EXISTS entries_new")
+        self._conn.execute(_create_table("entries_new"))
+        try:
+            with open(self.history_file, 'rb') as src, open(tmp_file, 'wb') as dst:
+                cursor = self._conn.execute(f"SELECT {_COLUMNS} FROM entries{where} ORDER BY id", args)
+                while True:
+                    rows = cursor.fetchmany(INSERT_BATCH)
+                    if not rows:
+                        break
+                    new_rows = []
+                    for row in rows:
+                        src.seek(row[0])
+                        dst.write(src.read(row[1]))
+                        new_rows.append((offset,) + row[1:])
+                        offset += row[1]
+                    self._conn.executemany(
+                        f"INSERT INTO entries_new ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", new_rows
+                    )
+                    kept += len(rows)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_file, self.history_file)
+        except BaseException:
+            self._conn.rollback()
+            self._conn.execute("DROP TABLE IF EXISTS entries_new")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+        with self._conn:
+            self._conn.execute("DROP TABLE entries")
+            self._conn.execute("ALTER TABLE entries_new RENAME TO entries")
+            for statement in _INDEXES:
+                self._conn.execute(statement)
+            self._conn.execute("ANALYZE")
+            self._set_meta('indexed_bytes', offset)
+            self._set_meta('file_id', self._file_id(os.stat(self.history_file)))
+        self._conn.execute("VACUUM")
+        return kept, total - kept
@@ -0,0 +1,160 @@
+"""
+処理段階・API呼び出しの計測値を集計するモジュール
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 所要時間のヒストグラムのバケット境界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prometheusのメトリクス名の接頭辞
+METRIC_PREFIX = "excel_translator_"
+
+# ラベルは (名前, 値) のタプルとして保持する
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        計測値の集計クラスの初期化
+
+        カウンターとヒストグラムをスレッドセーフに集計し、JSONまたは
+        Prometheusのtextfile形式で書き出す。
+
+        Args:
+            buckets (Tuple[float, ...]): ヒストグラムのバケット境界（秒）
+        """
+        self.buckets = tuple(buckets)
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Optional[Dict[str, str]]) -> Tuple[str, LabelKey]:
+        return name, tuple(sorted((labels or {}).items()))
+
+    def increment(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        """カウンターに加算"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, labels: Optional[Dict[str, str]] = None) -> None:
+        """ヒストグラムに所要時間を記録"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+                self._histograms[key] = histogram
+            histogram['counts'][bisect_left(self.buckets, seconds)] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    @contextmanager
+    def span(self, name: str, labels: Optional[Dict[str, str]] = None) -> Iterator[None]:
+        """with文で囲んだ処理の所要時間をヒストグラムに記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def snapshot(self, reset: bool = False) -> Dict:
+        """
+        現在の集計値を取得
+
+        Args:
+            reset (bool): 取得後に集計値を消去するかどうか
+
+        Returns:
+            Dict: counters と histograms（JSONに変換可能な形式）
+        """
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {'name': name, 'labels': dict(labels), 'buckets': list(self.buckets),
+                 'counts': list(h['counts']), 'sum': h['sum'], 'count': h['count']}
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            if reset:
+                self._counters.clear()
+                self._histograms.clear()
+        return {'counters': counters, 'histograms': histograms}
+
+    def merge(self, snapshot: Dict) -> None:
+        """別のプロセスで集計したsnapshotを加算"""
+        with self._lock:
+            for counter in snapshot.get('counters', []):
+                key = self._key(counter['name'], counter['labels'])
+                self._counters[key] = self._counters.get(key, 0) + counter['value']
+            for h in snapshot.get('histograms', []):
+                if tuple(h['buckets']) != self.buckets:
+                    raise ValueError("ヒストグラムのバケット境界が一致しません")
+                key = self._key(h['name'], h['labels'])
+                histogram = self._histograms.setdefault(
+                    key, {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+                )
+                histogram['counts'] = [a + b for a, b in zip(histogram['counts'], h['counts'])]
+                histogram['sum'] += h['sum']
+                histogram['count'] += h['count']
+
+    def to_prometheus(self) -> str:
+        """Prometheusのtextfile形式に変換"""
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        declared = set()
+
+        def format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+            items = sorted(labels.items()) + ([extra] if extra else [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        for counter in snapshot['counters']:
+            name = METRIC_PREFIX + counter['name']
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            lines.append(f"{name}{format_labels(counter['labels'])} {counter['value']}")
+
+        for h in snapshot['histograms']:
+            name = METRIC_PREFIX + h['name']
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            cumulative = 0
+            for bound, count in zip(list(h['buckets']) + ["+Inf"], h['counts']):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(h['labels'], ('le', str(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{format_labels(h['labels'])} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        集計値をファイルへ書き出す
+
+        拡張子が .prom の場合はPrometheusのtextfile形式、それ以外はJSON形式。
+        node_exporterが書きかけのファイルを読まないよう、一時ファイルから置き換える。
+
+        Args:
+            path (str): 出力先のファイルパス
+        """
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2) + "\n"
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_file, path)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+DeepL APIを模したローカルHTTPサーバー（負荷試験・ベンチマーク用）
+
+/v2/translate と /v2/usage を実装し、応答遅延・429の連続発生・
+456（文字数上限）を再現できる。翻訳結果は "[翻訳先言語] 原文" を返す。
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from deepl_client import MAX_REQUEST_BYTES, MAX_TEXTS_PER_REQUEST
+
+
+class MockDeepLServer:
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 rate_limit_every: int = 0,
+                 rate_limit_burst: int = 1,
+                 character_limit: int = 0,
+                 seed: Optional[int] = None):
+        """
+        モックサーバーの初期化
+
+        Args:
+            host (str): 待ち受けるホスト
+            port (int): 待ち受けるポート（0の場合は空いているポートを使用）
+            latency (float): 1リクエストあたりの応答遅延（秒）
+            latency_jitter (float): 応答遅延に加えるランダムな揺らぎの最大値（秒）
+            rate_limit_every (int): このリクエスト数ごとに429の連続応答を開始（0の場合は無効）
+            rate_limit_burst (int): 429を連続して返すリクエスト数
+            character_limit (int): APIキーごとの翻訳できる文字数の上限（0の場合は無制限）
+            seed (Optional[int]): 応答遅延の揺らぎに使う乱数のシード
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_burst = rate_limit_burst
+        self.character_limit = character_limit
+
+        self.stats = {
+            'requests': 0,
+            'translated_texts': 0,
+            'character_count': 0,
+            'rate_limited': 0,
+            'quota_exceeded': 0
+        }
+        self._burst_remaining = 0
+        # APIキーごとの翻訳済み文字数
+        self._usage_by_key: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """DeepLTranslatorのapi_urlに指定するベースURL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockDeepLServer":
+        """バックグラウンドのスレッドで待ち受けを開始"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """待ち受けを終了"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        """現在のスレッドで待ち受ける"""
+        self._server.serve_forever()
+
+    def _next_status(self, api_key: str, characters: int) -> int:
+        """リクエストに返すステータスコードを決定し、統計を更新"""
+        with self._lock:
+            self.stats['requests'] += 1
+            if self._burst_remaining == 0 and self.rate_limit_every and \
+                    self.stats['requests'] % self.rate_limit_every == 0:
+                self._burst_remaining = self.rate_limit_burst
+            if self._burst_remaining > 0:
+                self._burst_remaining -= 1
+                self.stats['rate_limited'] += 1
+                return 429
+            used = self._usage_by_key.get(api_key, 0)
+            if self.character_limit and used + characters > self.character_limit:
+                self.stats['quota_exceeded'] += 1
+                return 456
+            self._usage_by_key[api_key] = used + characters
+            self.stats['character_count'] += characters
+            return 200
+
+    def _delay(self) -> float:
+        """応答遅延の秒数"""
+        with self._lock:
+            jitter = self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+        return self.latency + jitter
+
+    def _usage(self, api_key: str) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'character_count': self._usage_by_key.get(api_key, 0),
+                'character_limit': self.character_limit or 10 ** 12
+            }
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _api_key(self) -> Optional[str]:
+                authorization = self.headers.get("Authorization", "")
+                if authorization.startswith("DeepL-Auth-Key "):
+                    return authorization[len("DeepL-Auth-Key "):]
+                self._send_json(403, {'message': 'Authorization failed'})
+                return None
+
+            def do_GET(self):
+                if self.path != "/v2/usage":
+                    self._send_json(404, {'message': 'Not found'})
+                    return
+                api_key = self._api_key()
+                if api_key is not None:
+                    self._send_json(200, server._usage(api_key))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if self.path != "/v2/translate":
+                    self._send_json(404, {'message': 'Not found'})
+                    return
+                api_key = self._api_key()
+                if api_key is None:
+                    return
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                if len(body) > MAX_REQUEST_BYTES:
+                    self._send_json(413, {'message': 'Request entity too large'})
+                    return
+                try:
+                    payload = json.loads(body)
+                    texts = payload['text']
+                    target_lang = payload['target_lang']
+                except (ValueError, KeyError):
+                    self._send_json(400, {'message': 'Bad request'})
+                    return
+                if not isinstance(texts, list) or not texts or len(texts) > MAX_TEXTS_PER_REQUEST:
+                    self._send_json(400, {'message': 'Invalid number of texts'})
+                    return
+                if not isinstance(target_lang, str) or not re.fullmatch(r'[A-Z]{2}(-[A-Z]{2,4})?', target_lang):
+                    self._send_json(400, {'message': "Value for 'target_lang' not supported."})
+                    return
+
+                time.sleep(server._delay())
+                status = server._next_status(api_key, sum(len(text) for text in texts))
+                if status == 429:
+                    self._send_json(429, {'message': 'Too many requests'})
+                    return
+                if status == 456:
+                    self._send_json(456, {'message': 'Quota exceeded'})
+                    return
+                with server._lock:
+                    server.stats['translated_texts'] += len(texts)
+                self._send_json(200, {'translations': [
+                    {'detected_source_language': 'EN', 'text': f"[{target_lang}] {text}"}
+                    for text in texts
+                ]})
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='DeepL APIモックサーバー')
+    parser.add_argument('--host', default='127.0.0.1', help='待ち受けるホスト（デフォルト: 127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8080, help='待ち受けるポート（デフォルト: 8080）')
+    parser.add_argument('--latency', type=float, default=0.0, help='応答遅延秒数（デフォルト: 0）')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='応答遅延の揺らぎの最大秒数（デフォルト: 0）')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='このリクエスト数ごとに429の連続応答を開始（デフォルト: 無効）')
+    parser.add_argument('--rate-limit-burst', type=int, default=1, help='429を連続して返すリクエスト数（デフォルト: 1）')
+    parser.add_argument('--character-limit', type=int, default=0, help='APIキーごとの翻訳できる文字数の上限（デフォルト: 無制限）')
+    args = parser.parse_args()
+
+    server = MockDeepLServer(host=args.host, port=args.port, latency=args.latency,
+                             latency_jitter=args.latency_jitter,
+                             rate_limit_every=args.rate_limit_every,
+                             rate_limit_burst=args.rate_limit_burst,
+                             character_limit=args.character_limit)
+    print(f"DeepL APIモックサーバーを起動しました: {server.url}")
+    print(f"例: python translate_excel.py --api-url {server.url} --api-key dummy ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n停止しました。")
+
+
+if __name__ == "__main__":
+    main()
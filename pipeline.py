@@ -0,0 +1,92 @@
+"""
+翻訳結果の書き戻し・履歴の記録を別スレッドで行うパイプラインの段階を定義するモジュール
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from metrics import Metrics
+
+# 段階の間のキューに溜められる項目数の上限
+DEFAULT_QUEUE_SIZE = 256
+
+# キューの終端を表す値
+_END = object()
+
+
+class PipelineStage:
+    def __init__(self, name: str, handler: Callable[[Any], None],
+                 maxsize: int = DEFAULT_QUEUE_SIZE, metrics: Optional[Metrics] = None):
+        """
+        パイプラインの段階の初期化
+
+        項目は有界キューを介して専用のスレッドへ渡され、順番に処理される。
+        キューが一杯の場合、put は空きができるまで待機する（背圧）。
+        キューが制限するのは段階の間で処理待ちの項目数のみで、handlerが
+        処理結果を保持する場合のメモリ使用量は制限しない。
+
+        Args:
+            name (str): 段階の名前（計測値のラベル）
+            handler (Callable[[Any], None]): 項目ごとの処理
+            maxsize (int): キューに溜められる項目数の上限
+            metrics (Optional[Metrics]): キューの待機時間の集計先
+        """
+        self.name = name
+        self.handler = handler
+        self.metrics = metrics or Metrics()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self._error: Optional[BaseException] = None
+        self._failed = False
+        self._thread = threading.Thread(target=self._run, name=f"pipeline-{name}", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "PipelineStage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def put(self, item: Any) -> None:
+        """
+        項目を次の段階へ渡す
+
+        Raises:
+            Exception: 段階の処理中に発生した例外
+        """
+        self._raise_error()
+        start = time.perf_counter()
+        self._queue.put(item)
+        self.metrics.increment('pipeline_backpressure_seconds_total', time.perf_counter() - start,
+                               {'stage': self.name})
+
+    def close(self) -> None:
+        """
+        キューに残っている項目を全て処理してスレッドを終了する
+
+        Raises:
+            Exception: 段階の処理中に発生した例外
+        """
+        if self._thread.is_alive():
+            self._queue.put(_END)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if self._failed:
+                # 失敗後の項目は処理しない（例外は呼び出し元に伝える）
+                continue
+            try:
+                self.handler(item)
+            except BaseException as e:
+                self._error = e
+                self._failed = True
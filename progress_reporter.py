@@ -0,0 +1,125 @@
+"""
+翻訳処理とは別のスレッドで進捗を表示するモジュール
+"""
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, TextIO, Tuple
+
+from utils import format_progress_bar, number_to_excel_column
+
+
+class ProgressReporter:
+    def __init__(self,
+                 total_cells: int,
+                 batch_mode: bool = False,
+                 refresh_interval: float = 0.5,
+                 window: float = 10.0,
+                 stream: Optional[TextIO] = None,
+                 enabled: Optional[bool] = None):
+        """
+        進捗表示の初期化
+
+        翻訳処理のスレッドは処理済みセル数を加算するだけで、表示は一定間隔で
+        専用のスレッドが行う。速度は直近window秒間の移動平均で表示する。
+
+        Args:
+            total_cells (int): 総処理セル数
+            batch_mode (bool): バッチモードの簡略化された表示にするかどうか
+            refresh_interval (float): 表示を更新する間隔（秒）
+            window (float): 速度の移動平均を求める期間（秒）
+            stream (Optional[TextIO]): 出力先（デフォルト: 標準エラー出力）
+            enabled (Optional[bool]): 表示するかどうか（Noneの場合は出力先が端末のときのみ表示）
+        """
+        self.total_cells = total_cells
+        self.batch_mode = batch_mode
+        self.refresh_interval = refresh_interval
+        self.window = window
+        self.stream = stream or sys.stderr
+        if enabled is None:
+            enabled = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.enabled = enabled
+
+        self._processed = 0
+        self._current: Optional[Tuple[int, int]] = None
+        self._samples: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "ProgressReporter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def start(self, processed: int = 0) -> None:
+        """表示のスレッドを開始"""
+        with self._lock:
+            self._processed = processed
+        if not self.enabled:
+            return
+        self._samples.append((time.monotonic(), processed))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def advance(self, cells: int, row: Optional[int] = None, col: Optional[int] = None) -> None:
+        """
+        処理済みセル数を加算
+
+        Args:
+            cells (int): 加算するセル数
+            row (Optional[int]): 直近に処理したセルの行
+            col (Optional[int]): 直近に処理したセルの列
+        """
+        with self._lock:
+            self._processed += cells
+            if row is not None and col is not None:
+                self._current = (row, col)
+
+    def stop(self) -> None:
+        """表示のスレッドを停止し、最終的な進捗を表示"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._render()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self._render()
+
+    def _render(self) -> None:
+        """現在の進捗を1行で表示"""
+        with self._lock:
+            processed = self._processed
+            current = self._current
+        now = time.monotonic()
+
+        # 移動平均の期間より古いサンプルを捨てる（最も古い1件は基準として残す）
+        self._samples.append((now, processed))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+        oldest_time, oldest_processed = self._samples[0]
+        elapsed = now - oldest_time
+        cells_per_sec = (processed - oldest_processed) / elapsed if elapsed > 0 else 0.0
+
+        progress = (processed / self.total_cells) * 100 if self.total_cells else 100.0
+        current_cell = f"{number_to_excel_column(current[1])}{current[0]}" if current else None
+        if self.batch_mode:
+            # バッチモードでは簡略化された進捗表示
+            line = f"進捗: {progress:.1f}% | セル: {current_cell or '-'}"
+        else:
+            # 対話モードでは詳細な進捗表示
+            line = format_progress_bar(
+                progress=progress,
+                current_cell=current_cell,
+                total_cells=self.total_cells,
+                processed_cells=processed,
+                cells_per_sec=cells_per_sec
+            )
+        self.stream.write(f"\r{line}")
+        self.stream.flush()
@@ -0,0 +1,212 @@
+"""
+APIキーの文字数上限を考慮した翻訳計画と複数APIキーへの振り分けを担当するモジュール
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from deepl_client import DeepLTranslator, QuotaExceededError
+from usage_counter import UsageCounter
+
+# 翻訳に必要な文字数が残りの文字数を超える場合の動作
+POLICY_REFUSE = "refuse"      # 翻訳を開始せずに終了する
+POLICY_TRUNCATE = "truncate"  # 残りの文字数に収まる先頭の行までを翻訳する
+POLICY_OFF = "off"            # 事前の確認を行わない
+QUOTA_POLICIES = (POLICY_REFUSE, POLICY_TRUNCATE, POLICY_OFF)
+
+
+class QuotaPlanner:
+    def __init__(self, translators: List[DeepLTranslator]):
+        """
+        文字数の計画クラスの初期化
+
+        /v2/usage で取得した残りの文字数から、取得後に各クライアントが翻訳に
+        成功した文字数を差し引いて、実行中の残りの文字数を追跡する。
+        常駐モードで複数のジョブが同時に実行される場合は、各ジョブが計画した
+        文字数を予約し、まだ消費していない分を他のジョブの残りの文字数から差し引く。
+
+        Args:
+            translators (List[DeepLTranslator]): APIキーごとの翻訳クライアント
+        """
+        self.translators = translators
+        # APIキーごとの (取得時の残り文字数, 取得時の消費済み文字数)
+        self._budgets: Dict[int, Tuple[int, int]] = {}
+        # 実行中の翻訳ごとの (予約した文字数, 翻訳の使用量)
+        self._reservations: List[Tuple[int, UsageCounter]] = []
+        self._lock = threading.Lock()
+        # 残りの文字数の取得から予約までを、同時に実行される翻訳の間で1つずつ行うためのロック
+        self.planning_lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """
+        全てのAPIキーの使用状況を取得
+
+        Returns:
+            bool: 全てのAPIキーの使用状況を取得できたかどうか
+        """
+        budgets = {}
+        for index, translator in enumerate(self.translators):
+            try:
+                usage = translator.get_usage()
+            except Exception as e:
+                print(f"警告: 文字数の使用状況を取得できませんでした: {str(e)}")
+                return False
+            remaining = max(0, usage['character_limit'] - usage['character_count'])
+            budgets[index] = (remaining, translator.characters_billed)
+        with self._lock:
+            self._budgets = budgets
+        return True
+
+    def remaining(self, translator: Optional[DeepLTranslator] = None) -> Optional[int]:
+        """
+        残りの文字数を取得
+
+        全APIキーの合計では、実行中の翻訳が予約してまだ消費していない文字数を差し引く。
+
+        Args:
+            translator (Optional[DeepLTranslator]): 対象のクライアント（Noneの場合は全APIキーの合計）
+
+        Returns:
+            Optional[int]: 残りの文字数（使用状況を取得していない場合はNone）
+        """
+        with self._lock:
+            if not self._budgets:
+                return None
+            total = 0
+            for index, (remaining, billed) in self._budgets.items():
+                current = self.translators[index]
+                if translator is not None and current is not translator:
+                    continue
+                total += max(0, remaining - (current.characters_billed - billed))
+            if translator is None:
+                total -= sum(max(0, reserved - usage.characters_billed) for reserved, usage in self._reservations)
+            return max(0, total)
+
+    def reserve(self, characters: int, usage: UsageCounter) -> None:
+        """
+        翻訳に使用する予定の文字数を予約
+
+        Args:
+            characters (int): 予約する文字数
+            usage (UsageCounter): 予約した翻訳の使用量（消費した分だけ予約が減る）
+        """
+        with self._lock:
+            self._reservations.append((characters, usage))
+
+    def release(self, usage: UsageCounter) -> None:
+        """翻訳の終了時に予約を解除"""
+        with self._lock:
+            self._reservations = [(reserved, current) for reserved, current in self._reservations
+                                  if current is not usage]
+
+    def exhaust(self, translator: DeepLTranslator) -> None:
+        """456を受信したAPIキーの残りの文字数を0にする"""
+        with self._lock:
+            if self._budgets:
+                index = self.translators.index(translator)
+                self._budgets[index] = (0, translator.characters_billed)
+
+    def plan(self, requests: List[Tuple[str, str]], cache=None) -> Tuple[int, List[Tuple[str, str]], int]:
+        """
+        翻訳に必要な文字数を数え、残りの文字数に収まる原文を選ぶ
+
+        キャッシュ済みの原文は文字数を消費しないため常に選ばれる。それ以外の
+        原文は先頭から順に、残りの文字数を超えるまで選ばれる。
+
+        Args:
+            requests (List[Tuple[str, str]]): 送信する順に並べた (翻訳先言語, 原文) のリスト
+            cache: 翻訳メモリ（translation_cache.TranslationCache）
+
+        Returns:
+            Tuple[int, List[Tuple[str, str]], int]: (必要な文字数, 残りの文字数に収まる (翻訳先言語, 原文) のリスト,
+                選んだ原文の翻訳に必要な文字数)
+        """
+        cached = set()
+        if cache is not None:
+            texts_by_lang: Dict[str, List[str]] = {}
+            for target_lang, text in requests:
+                texts_by_lang.setdefault(target_lang, []).append(text)
+            for target_lang, texts in texts_by_lang.items():
+                cached.update((target_lang, text)
+                              for text in cache.get_many(texts, target_lang, record_stats=False))
+        remaining = self.remaining()
+        required = 0
+        selected = []
+        selected_characters = 0
+        overflow = False
+        for request in requests:
+            if request in cached:
+                selected.append(request)
+                continue
+            required += len(request[1])
+            if remaining is not None and required > remaining:
+                overflow = True
+            if not overflow:
+                selected.append(request)
+                selected_characters = required
+        return required, selected, selected_characters
+
+
+class MultiKeyTranslator:
+    """複数のAPIキーに翻訳を振り分ける翻訳バックエンド"""
+
+    def __init__(self, translators: List[DeepLTranslator], planner: QuotaPlanner):
+        """
+        振り分けの初期化
+
+        Args:
+            translators (List[DeepLTranslator]): APIキーごとの翻訳クライアント
+            planner (QuotaPlanner): 残りの文字数を追跡する計画クラス
+        """
+        self.translators = translators
+        self.planner = planner
+        self._exhausted: set = set()
+        self._lock = threading.Lock()
+
+    def _candidates(self) -> List[DeepLTranslator]:
+        """上限に達していないクライアントを残りの文字数が多い順に返す"""
+        with self._lock:
+            available = [t for t in self.translators if id(t) not in self._exhausted]
+        if self.planner.remaining() is None:
+            return available
+        return sorted(available, key=lambda t: self.planner.remaining(t), reverse=True)
+
+    def translate(self, text: str, target_lang: str = "JA", max_retries: int = 3) -> Optional[str]:
+        """テキストを翻訳"""
+        if not text:
+            return ""
+        return self.translate_batch([text], target_lang=target_lang, max_retries=max_retries)[0]
+
+    def translate_batch(self, texts: List[str], target_lang: str = "JA",
+                        max_retries: int = 3) -> List[Optional[str]]:
+        """残りの文字数が最も多いAPIキーで翻訳し、上限に達した場合は次のAPIキーで再送する"""
+        for translator in self._candidates():
+            try:
+                return translator.translate_batch(texts, target_lang=target_lang, max_retries=max_retries)
+            except QuotaExceededError:
+                with self._lock:
+                    self._exhausted.add(id(translator))
+                self.planner.exhaust(translator)
+                print(f"{self.translators.index(translator) + 1}番目のAPIキーが文字数上限に達しました。"
+                      "次のAPIキーに切り替えます。")
+        raise QuotaExceededError("全てのAPIキーが文字数上限に達しました")
+
+    def get_usage(self) -> Dict[str, int]:
+        """全APIキーの使用状況の合計を取得"""
+        usage = {'character_count': 0, 'character_limit': 0}
+        for translator in self.translators:
+            for key, value in translator.get_usage().items():
+                usage[key] += value
+        return usage
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """全APIキーの接続プールの統計の合計を取得"""
+        stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0}
+        for translator in self.translators:
+            for key, value in translator.get_pool_stats().items():
+                stats[key] += value
+        return stats
+
+    def close(self) -> None:
+        """全てのセッションを閉じる"""
+        for translator in self.translators:
+            translator.close()
@@ -0,0 +1,260 @@
+"""
+リクエストの大きさを揃えるため、長いセルを文単位で分割し短いセルをまとめるモジュール
+"""
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from deepl_client import MAX_REQUEST_BYTES, MAX_TEXTS_PER_REQUEST
+from metrics import Metrics
+
+# 1リクエストあたりの目標の本文サイズ
+DEFAULT_REQUEST_BYTES = 32 * 1024
+MIN_REQUEST_BYTES = 1024
+
+# 分割位置の候補（優先度の高い順）：改行、文末、単語の区切り
+_BREAKS = (
+    re.compile(r'\n+'),
+    re.compile(r'(?<=[.!?])[ \t]+|(?<=[。！？])[ \t]*'),
+    re.compile(r'\s+'),
+)
+
+
+def payload_size(text: str) -> int:
+    """リクエスト本文に占めるバイト数（JSONの引用符と区切り文字の分を含む）"""
+    return len(text.encode('utf-8')) + 4
+
+
+def _split_units(text: str, max_bytes: int, level: int = 0) -> Iterator[Tuple[str, str]]:
+    """
+    テキストを上限以下の単位に分割し、(直前の区切り文字, 単位) の列を返す
+
+    区切り文字の候補で順に分割し、それでも上限を超える単位は文字単位で分割する。
+    """
+    if payload_size(text) <= max_bytes:
+        yield '', text
+        return
+    if level == len(_BREAKS):
+        start = 0
+        size = payload_size('')
+        for position, char in enumerate(text):
+            char_size = len(char.encode('utf-8'))
+            if position > start and size + char_size > max_bytes:
+                yield '', text[start:position]
+                start = position
+                size = payload_size('')
+            size += char_size
+        yield '', text[start:]
+        return
+
+    separator = ''
+    position = 0
+    segments = []
+    for match in _BREAKS[level].finditer(text):
+        if match.end() == match.start() and match.start() in (0, len(text)):
+            continue
+        segments.append((separator, text[position:match.start()]))
+        separator = match.group()
+        position = match.end()
+    segments.append((separator, text[position:]))
+
+    pending = ''
+    for separator, segment in segments:
+        pending += separator
+        if not segment:
+            continue
+        for index, (inner_separator, unit) in enumerate(_split_units(segment, max_bytes, level + 1)):
+            yield (pending + inner_separator if index == 0 else inner_separator), unit
+        pending = ''
+    if pending:
+        # 末尾の区切り文字は空の単位として残す
+        yield pending, ''
+
+
+def split_text(text: str, max_bytes: int) -> Tuple[List[str], List[str]]:
+    """
+    テキストを上限以下のチャンクに分割
+
+    文の途中で分割しないよう、改行・文末・単語の区切りの順に分割位置を探し、
+    上限に収まる範囲で隣り合う文を1つのチャンクにまとめる。
+
+    Args:
+        text (str): 分割するテキスト
+        max_bytes (int): 1チャンクあたりの最大バイト数
+
+    Returns:
+        Tuple[List[str], List[str]]: (チャンクのリスト, 区切り文字のリスト)
+            区切り文字は先頭・チャンク間・末尾の分（チャンク数 + 1個）で、
+            `join_chunks(chunks, separators)` で元のテキストに戻る
+    """
+    chunks: List[str] = []
+    separators: List[str] = []
+    current: List[str] = []
+    current_bytes = 0
+    pending = ''
+    for separator, unit in _split_units(text, max_bytes):
+        pending += separator
+        if not unit:
+            continue
+        unit_bytes = len(unit.encode('utf-8'))
+        pending_bytes = len(pending.encode('utf-8'))
+        if not current:
+            separators.append(pending)
+            current = [unit]
+            current_bytes = payload_size(unit)
+        elif current_bytes + pending_bytes + unit_bytes <= max_bytes:
+            current += [pending, unit]
+            current_bytes += pending_bytes + unit_bytes
+        else:
+            chunks.append(''.join(current))
+            separators.append(pending)
+            current = [unit]
+            current_bytes = payload_size(unit)
+        pending = ''
+    if not separators:
+        separators.append('')
+    chunks.append(''.join(current))
+    separators.append(pending)
+    return chunks, separators
+
+
+def join_chunks(chunks: List[str], separators: List[str]) -> str:
+    """分割したチャンク（またはその翻訳）を元の区切り文字で結合"""
+    parts = [separators[0]]
+    for chunk, separator in zip(chunks, separators[1:]):
+        parts.append(chunk)
+        parts.append(separator)
+    return ''.join(parts)
+
+
+def pack_jobs(texts: List[str], max_bytes: int) -> List[List[str]]:
+    """
+    短いテキストを目標サイズまでまとめてリクエスト単位のジョブにする
+
+    目標サイズを超える長いテキストは単独のジョブになり、翻訳時に分割される。
+
+    Args:
+        texts (List[str]): 翻訳するテキストのリスト
+        max_bytes (int): 1リクエストあたりの目標の本文サイズ
+
+    Returns:
+        List[List[str]]: ジョブごとのテキストのリスト
+    """
+    jobs: List[List[str]] = []
+    current: List[str] = []
+    current_bytes = 0
+    for text in texts:
+        size = payload_size(text)
+        if current and (len(current) >= MAX_TEXTS_PER_REQUEST or current_bytes + size > max_bytes):
+            jobs.append(current)
+            current = []
+            current_bytes = 0
+        current.append(text)
+        current_bytes += size
+    if current:
+        jobs.append(current)
+    return jobs
+
+
+class RequestSizer:
+    """目標サイズを超えるテキストを分割して翻訳し、結果を結合する翻訳バックエンド"""
+
+    def __init__(self, translator, cache=None, max_bytes: int = DEFAULT_REQUEST_BYTES,
+                 metrics: Optional[Metrics] = None):
+        """
+        リクエストサイズ調整の初期化
+
+        Args:
+            translator (TranslationBackend): 分割したチャンクを翻訳するバックエンド
+            cache: 翻訳メモリ（分割前のテキストの翻訳を保存する）
+            max_bytes (int): 1リクエストあたりの目標の本文サイズ
+            metrics (Optional[Metrics]): 分割したセル数・チャンク数の集計先
+        """
+        if not MIN_REQUEST_BYTES <= max_bytes <= MAX_REQUEST_BYTES:
+            raise ValueError(f"リクエストサイズは{MIN_REQUEST_BYTES}～{MAX_REQUEST_BYTES}バイトである必要があります")
+        self.translator = translator
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.metrics = metrics or Metrics()
+
+    def translate(self, text: str, target_lang: str = "JA", max_retries: int = 3) -> Optional[str]:
+        """テキストを翻訳"""
+        if not text:
+            return ""
+        return self.translate_batch([text], target_lang=target_lang, max_retries=max_retries)[0]
+
+    def translate_batch(self, texts: List[str], target_lang: str = "JA",
+                        max_retries: int = 3) -> List[Optional[str]]:
+        """
+        複数のテキストをまとめて翻訳
+
+        目標サイズを超えるテキストは文単位のチャンクに分割して他のテキストと一緒に
+        送信し、チャンクの翻訳を元の区切り文字で結合して返す。いずれかのチャンクを
+        翻訳できなかったテキストはNoneになる。
+
+        Args:
+            texts (List[str]): 翻訳するテキストのリスト
+            target_lang (str): 翻訳先言語
+            max_retries (int): リトライ回数
+
+        Returns:
+            List[Optional[str]]: 翻訳結果のリスト（入力と同じ順序）
+        """
+        results: List[Optional[str]] = ["" for _ in texts]
+        long_indices = [i for i, text in enumerate(texts) if payload_size(text) > self.max_bytes]
+
+        # 分割前のテキストの翻訳がキャッシュにあれば分割しない
+        if self.cache is not None and long_indices:
+            cached = self.cache.get_many([texts[i] for i in long_indices], target_lang)
+            for i in long_indices:
+                if texts[i] in cached:
+                    results[i] = cached[texts[i]]
+            long_indices = [i for i in long_indices if texts[i] not in cached]
+
+        # 送信するテキストのリスト（長いテキストはチャンクに置き換える）
+        requests: List[str] = []
+        short_positions: Dict[int, int] = {}
+        split_positions: Dict[int, Tuple[int, List[str], List[str]]] = {}
+        long_set = set(long_indices)
+        for i, text in enumerate(texts):
+            if i in long_set:
+                chunks, separators = split_text(text, self.max_bytes)
+                split_positions[i] = (len(requests), chunks, separators)
+                requests.extend(chunks)
+            elif payload_size(text) <= self.max_bytes:
+                short_positions[i] = len(requests)
+                requests.append(text)
+        if split_positions:
+            self.metrics.increment('cells_chunked_total', len(split_positions))
+            self.metrics.increment('request_chunks_total',
+                                   sum(len(chunks) for _, chunks, _ in split_positions.values()))
+        if not requests:
+            return results
+
+        translations = self.translator.translate_batch(requests, target_lang=target_lang,
+                                                       max_retries=max_retries)
+        for i, position in short_positions.items():
+            results[i] = translations[position]
+        joined = []
+        for i, (position, chunks, separators) in split_positions.items():
+            translated_chunks = translations[position:position + len(chunks)]
+            if any(chunk is None for chunk in translated_chunks):
+                results[i] = None
+                continue
+            results[i] = join_chunks(translated_chunks, separators)
+            joined.append((texts[i], results[i]))
+
+        if self.cache is not None and joined:
+            self.cache.put_many(joined, target_lang)
+        return results
+
+    def get_usage(self) -> Dict[str, int]:
+        """文字数の使用状況を取得"""
+        return self.translator.get_usage()
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """接続プールの統計を取得"""
+        return self.translator.get_pool_stats()
+
+    def close(self) -> None:
+        """バックエンドの接続を解放"""
+        self.translator.close()
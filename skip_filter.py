@@ -0,0 +1,84 @@
+"""
+翻訳の必要がないセル（数値・日付・数式・URL・コード・翻訳先言語の文章）を判定するモジュール
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Pattern
+
+# 判定ルールの名前（この順に判定する）
+RULE_FORMULA = "formula"
+RULE_NUMBER = "number"
+RULE_DATE = "date"
+RULE_URL = "url"
+RULE_EMAIL = "email"
+RULE_CODE = "code"
+RULE_JAPANESE = "japanese"
+RULE_PATTERN = "pattern"
+SKIP_RULES = (RULE_FORMULA, RULE_NUMBER, RULE_DATE, RULE_URL, RULE_EMAIL, RULE_CODE, RULE_JAPANESE)
+
+_RULE_PATTERNS: Dict[str, Pattern] = {
+    # 通貨記号・桁区切り・指数表記・パーセントを含む数値
+    RULE_NUMBER: re.compile(r'[-+]?[¥$€£]?\s?(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|\.\d+)'
+                           r'(?:[eE][-+]?\d+)?\s?%?'),
+    # 日付・時刻（2024-01-31, 2024/1/31 12:00, 12:30:00 など）
+    RULE_DATE: re.compile(r'(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?'
+                          r'|\d{1,2}:\d{2}(?::\d{2})?)'),
+    RULE_URL: re.compile(r'(?:(?:https?|ftp)://|www\.)\S+', re.IGNORECASE),
+    RULE_EMAIL: re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'),
+    # 品番・SKUなど、空白を含まず数字を含む英大文字と記号の並び、または文字を含まない記号の並び
+    RULE_CODE: re.compile(r'(?=[^\s]*\d)[A-Z0-9][A-Z0-9_\-./#:]*|[\W\d_]+'),
+}
+
+# 日本語の判定に使う文字種
+_KANA = re.compile(r'[\u3040-\u30ff\uff66-\uff9f]')
+_JAPANESE_CHARS = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff66-\uff9f]')
+_LATIN_LETTERS = re.compile(r'[A-Za-z]')
+
+
+class SkipFilter:
+    def __init__(self, rules: Iterable[str] = SKIP_RULES, patterns: Optional[List[str]] = None):
+        """
+        翻訳対象外の判定の初期化
+
+        Args:
+            rules (Iterable[str]): 有効にする判定ルール（SKIP_RULESの部分集合）
+            patterns (Optional[List[str]]): 翻訳対象外とする追加の正規表現（セル全体に一致した場合）
+        """
+        self.rules = [rule for rule in SKIP_RULES if rule in set(rules)]
+        unknown = set(rules) - set(SKIP_RULES)
+        if unknown:
+            raise ValueError(f"無効な判定ルールです: {', '.join(sorted(unknown))}")
+        self.patterns = [re.compile(pattern) for pattern in (patterns or [])]
+
+    def classify(self, text: str, target_lang: str = "JA") -> Optional[str]:
+        """
+        翻訳対象外のテキストかを判定
+
+        Args:
+            text (str): 正規化済みのテキスト
+            target_lang (str): 翻訳先言語（日本語の判定は翻訳先が日本語の場合のみ行う）
+
+        Returns:
+            Optional[str]: 一致した判定ルールの名前（翻訳が必要な場合はNone）
+        """
+        for rule in self.rules:
+            if rule == RULE_FORMULA:
+                if text.startswith('='):
+                    return rule
+            elif rule == RULE_JAPANESE:
+                if target_lang.upper().startswith('JA') and self._is_japanese(text):
+                    return rule
+            elif _RULE_PATTERNS[rule].fullmatch(text):
+                return rule
+        for pattern in self.patterns:
+            if pattern.fullmatch(text):
+                return RULE_PATTERN
+        return None
+
+    @staticmethod
+    def _is_japanese(text: str) -> bool:
+        """かなを含み、文字の半分以上が日本語の文字であれば翻訳先言語の文章とみなす"""
+        if not _KANA.search(text):
+            return False
+        japanese = len(_JAPANESE_CHARS.findall(text))
+        latin = len(_LATIN_LETTERS.findall(text))
+        return japanese >= latin
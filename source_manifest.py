@@ -0,0 +1,82 @@
+"""
+差分翻訳のために翻訳元セルの内容のハッシュを管理するモジュール
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+class SourceManifest:
+    def __init__(self, output_path: str, input_path: str, target_langs: Optional[List[str]] = None):
+        """
+        翻訳元セルのハッシュ管理クラスの初期化
+
+        前回の実行で翻訳した (シート, 行, 翻訳元列, 翻訳先列) ごとに、正規化した
+        原文のハッシュを出力ファイルの隣の `{出力ファイル}.manifest.json` に保存する。
+
+        Args:
+            output_path (str): 出力ファイルのパス
+            input_path (str): 入力ファイルのパス（異なる入力のマニフェストは使用しない）
+            target_langs (Optional[List[str]]): 翻訳先言語（言語の割り当てが異なるマニフェストは使用しない）
+        """
+        self.manifest_file = f"{output_path}.manifest.json"
+        self.input_path = os.path.abspath(input_path)
+        self.target_langs = list(target_langs or ["JA"])
+        self._previous: Dict[str, Dict[str, str]] = {}
+        self._current: Dict[str, Dict[str, str]] = {}
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """正規化した原文のハッシュ"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+    @staticmethod
+    def _cell_key(row: int, src_col: int, dest_col: int) -> str:
+        return f"{row},{src_col},{dest_col}"
+
+    def load(self) -> bool:
+        """
+        前回の実行のマニフェストを読み込む
+
+        Returns:
+            bool: 同じ入力ファイルのマニフェストを読み込めたかどうか
+        """
+        if not os.path.exists(self.manifest_file):
+            return False
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print(f"警告: {self.manifest_file} の読み込みに失敗しました。全てのセルを翻訳します。")
+            return False
+        if manifest.get('input_path') != self.input_path:
+            return False
+        if manifest.get('target_langs', ["JA"]) != self.target_langs:
+            return False
+        self._previous = manifest.get('sheets', {})
+        return True
+
+    def has_sheet(self, sheet: str) -> bool:
+        """前回の実行で翻訳したシートかを確認"""
+        return bool(self._previous.get(sheet))
+
+    def is_unchanged(self, sheet: str, row: int, src_col: int, dest_col: int, digest: str) -> bool:
+        """前回の実行から原文が変わっていないかを確認"""
+        return self._previous.get(sheet, {}).get(self._cell_key(row, src_col, dest_col)) == digest
+
+    def record(self, sheet: str, row: int, src_col: int, dest_col: int, digest: str) -> None:
+        """出力ファイルに翻訳が書き込まれたセルを記録"""
+        self._current.setdefault(sheet, {})[self._cell_key(row, src_col, dest_col)] = digest
+
+    def save(self) -> None:
+        """今回の実行のマニフェストを書き出す（出力ファイルの保存後に呼び出す）"""
+        manifest = {
+            'input_path': self.input_path,
+            'target_langs': self.target_langs,
+            'sheets': self._current
+        }
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
@@ -0,0 +1,400 @@
+"""
+CSV/TSV・Parquetファイルの読み書きを担当するモジュール
+
+ExcelHandlerと同じインターフェースで、1行目を先頭行（CSVの見出し行・Parquetの列名）、
+A列を先頭の列としてセルを扱う。ファイルは一定の行数ごとに読み込み、保存時は
+入力を先頭から読みながら書き込んだセルを反映して出力するため、ファイル全体を
+メモリに展開しない。ただし、get_column_values が返す値と保存まで保持する
+書き込んだ値は、選択したセルの数に比例したメモリを使用する。
+"""
+import bisect
+import codecs
+import csv
+import os
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from excel_handler import ExcelHandler, MODE_MEMORY
+from utils import number_to_excel_column
+
+# 対応する拡張子
+CSV_EXTENSIONS = ('.csv',)
+TSV_EXTENSIONS = ('.tsv', '.tab')
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+TABULAR_EXTENSIONS = CSV_EXTENSIONS + TSV_EXTENSIONS + PARQUET_EXTENSIONS
+
+# 一度に読み書きする行数
+CHUNK_ROWS = 10000
+
+# シート名（CSV/TSV・Parquetはシートが1つだけで、入力と出力で同じ名前にする）
+SHEET_NAME = "Sheet1"
+
+# 文字コードの判定に読み込むバイト数
+_SNIFF_BYTES = 64 * 1024
+
+# 長い段落を含むセルを読み込めるようにする
+csv.field_size_limit(2 ** 31 - 1)
+
+
+def is_tabular_file(path: str) -> bool:
+    """CSV/TSV・Parquetファイルかを拡張子で判定"""
+    return os.path.splitext(path)[1].lower() in TABULAR_EXTENSIONS
+
+
+def open_handler(input_path: str, output_path: Optional[str] = None, mode: str = MODE_MEMORY):
+    """
+    ファイルの形式に応じたハンドラーを作成
+
+    Args:
+        input_path (str): 入力ファイルのパス
+        output_path (Optional[str]): 出力ファイルのパス
+        mode (str): Excelファイルの読み書きモード（CSV/TSV・Parquetでは使用しない）
+
+    Returns:
+        ExcelHandler | TabularHandler: ファイルの形式に応じたハンドラー
+    """
+    if is_tabular_file(input_path):
+        return TabularHandler(input_path, output_path)
+    return ExcelHandler(input_path, output_path, mode=mode)
+
+
+def _import_parquet():
+    """pyarrowを読み込む（Parquetファイルを扱う場合のみ必要）"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("Parquetファイルを扱うには pyarrow が必要です（pip install pyarrow）")
+    return pyarrow, pyarrow.parquet
+
+
+def _to_text(value) -> str:
+    return str(value) if value is not None else ""
+
+
+class TabularHandler:
+    def __init__(self, input_path: str, output_path: Optional[str] = None):
+        """
+        CSV/TSV・Parquetハンドラーの初期化
+
+        Args:
+            input_path (str): 入力ファイルのパス
+            output_path (Optional[str]): 出力ファイルのパス
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"入力ファイルが見つかりません: {input_path}")
+        extension = os.path.splitext(input_path)[1].lower()
+        if extension not in TABULAR_EXTENSIONS:
+            raise ValueError(f"対応していないファイル形式です: {input_path}")
+
+        self.input_path = input_path
+        self.output_path = output_path or self._generate_output_path()
+        self.is_parquet = extension in PARQUET_EXTENSIONS
+        self.delimiter = '\t' if extension in TSV_EXTENSIONS else ','
+        self.sheet_name = SHEET_NAME
+
+        if self.is_parquet:
+            _, parquet = _import_parquet()
+            self._parquet_file = parquet.ParquetFile(input_path)
+            self.column_names = list(self._parquet_file.schema_arrow.names)
+        else:
+            self.encoding, self.lineterminator = self._detect_format()
+
+        # 書き込む値（保存時に反映）
+        self._patches: Dict[Tuple[int, int], str] = {}
+        # get_cell_value で最後に読み込んだチャンク（先頭の行番号, 行数, 列番号ごとの値）
+        self._cell_chunk: Optional[Tuple[int, int, Dict[int, List[str]]]] = None
+
+    def _generate_output_path(self) -> str:
+        """デフォルトの出力パスを生成"""
+        dir_name = os.path.dirname(self.input_path)
+        base_name = os.path.basename(self.input_path)
+        name, ext = os.path.splitext(base_name)
+        return os.path.join(dir_name, f"{name}_translated{ext}")
+
+    def _detect_format(self) -> Tuple[str, str]:
+        """CSVの文字コード（UTF-8/BOM付きUTF-8/Shift_JIS）と改行コードを判定"""
+        with open(self.input_path, 'rb') as f:
+            sample = f.read(_SNIFF_BYTES)
+        lineterminator = '\r\n' if b'\r\n' in sample or b'\n' not in sample else '\n'
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig', lineterminator
+        try:
+            # 読み込んだ範囲の末尾で文字が途切れている場合は無視する
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8', lineterminator
+        except UnicodeDecodeError:
+            return 'cp932', lineterminator
+
+    def _iter_chunks(self, cols: List[int], row_start: int = 1) -> Iterator[Tuple[int, List[List[str]]]]:
+        """
+        指定した列の値を一定の行数ごとに読み込む
+
+        Args:
+            cols (List[int]): 列番号のリスト
+            row_start (int): この行より前のチャンクは値を変換せずに読み飛ばす
+
+        Yields:
+            Tuple[int, List[List[str]]]: (チャンクの先頭の行番号, colsの順に並んだ行ごとの値)
+        """
+        if self.is_parquet:
+            yield from self._iter_parquet_chunks(cols, row_start)
+            return
+        with open(self.input_path, 'r', encoding=self.encoding, newline='') as f:
+            reader = csv.reader(f, delimiter=self.delimiter)
+            row = 1
+            while True:
+                chunk = list(islice(reader, CHUNK_ROWS))
+                if not chunk:
+                    return
+                if row + len(chunk) > row_start:
+                    yield row, [[values[col - 1] if col <= len(values) else "" for col in cols]
+                                for values in chunk]
+                row += len(chunk)
+
+    def _iter_parquet_chunks(self, cols: List[int], row_start: int) -> Iterator[Tuple[int, List[List[str]]]]:
+        """Parquetの列名を1行目、レコードを2行目以降として読み込む"""
+        names = [self.column_names[col - 1] if col <= len(self.column_names) else None for col in cols]
+        yield 1, [[name or "" for name in names]]
+        read_columns = list(dict.fromkeys(name for name in names if name is not None))
+        row = 2
+        for batch in self._parquet_file.iter_batches(batch_size=CHUNK_ROWS, columns=read_columns):
+            if row + batch.num_rows > row_start:
+                columns = {name: batch.column(i).to_pylist() for i, name in enumerate(read_columns)}
+                empty = [None] * batch.num_rows
+                values = [columns[name] if name is not None else empty for name in names]
+                yield row, [[_to_text(value) for value in row_values] for row_values in zip(*values)]
+            row += batch.num_rows
+
+    def get_cell_value(self, row: int, col: int) -> str:
+        """
+        セルの値を取得
+
+        セルを含むチャンクを列ごとに保持し、同じチャンクのセルはファイルを
+        読み直さずに返す（多くのセルを読む場合は iter_cell_values を使用する）。
+        """
+        if (row, col) in self._patches:
+            return self._patches[(row, col)]
+        if self._cell_chunk is not None:
+            chunk_start, num_rows, columns = self._cell_chunk
+            if not chunk_start <= row < chunk_start + num_rows:
+                self._cell_chunk = None
+            elif col in columns:
+                return columns[col][row - chunk_start]
+        try:
+            for chunk_start, chunk in self._iter_chunks([col], row):
+                if chunk_start + len(chunk) > row:
+                    break
+            else:
+                # ファイルの末尾より後ろの行
+                return ""
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            raise Exception(f"セルの読み取りに失敗しました (行: {row}): {str(e)}")
+        if self._cell_chunk is None:
+            self._cell_chunk = (chunk_start, len(chunk), {})
+        self._cell_chunk[2][col] = [values[0] for values in chunk]
+        return self._cell_chunk[2][col][row - chunk_start]
+
+    def iter_cell_values(self, cols: List[int], row_start: int, row_end: int) -> Iterator[Tuple[int, List[str]]]:
+        """
+        指定した列・行範囲の値を1回の走査で取得
+
+        Args:
+            cols (List[int]): 列番号のリスト
+            row_start (int): 開始行
+            row_end (int): 終了行
+
+        Yields:
+            Tuple[int, List[str]]: (行番号, colsの順に並んだセルの値)
+        """
+        try:
+            for chunk_start, chunk in self._iter_chunks(cols, row_start):
+                for row, values in enumerate(chunk, start=chunk_start):
+                    if row > row_end:
+                        return
+                    if row >= row_start:
+                        yield row, values
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            raise Exception(f"セルの読み取りに失敗しました (行: {row_start}-{row_end}): {str(e)}")
+
+    def get_column_values(self, cols: List[int], row_start: int, row_end: int,
+                          raw: bool = False) -> Dict[int, List[str]]:
+        """
+        指定した列・行範囲の値を列ごとのリストとして1回の走査で取得
+
+        Args:
+            cols (List[int]): 列番号のリスト
+            row_start (int): 開始行
+            row_end (int): 終了行
+            raw (bool): ExcelHandlerとの互換のための引数（CSV/TSV・Parquetの値は常に文字列）
+
+        Returns:
+            Dict[int, List[str]]: 列番号ごとの、row_startからrow_endまでの値（空のセルは空文字）
+        """
+        total_rows = row_end - row_start + 1
+        result: Dict[int, List[str]] = {col: [] for col in cols}
+        for _, values in self.iter_cell_values(cols, row_start, row_end):
+            for col, value in zip(cols, values):
+                result[col].append(value)
+        for column in result.values():
+            column.extend([""] * (total_rows - len(column)))
+        return result
+
+    def set_column_values(self, col: int, row_start: int, values: List[Optional[str]]) -> None:
+        """
+        1列分の値をまとめて書き込む
+
+        Args:
+            col (int): 列番号
+            row_start (int): valuesの先頭に対応する行
+            values (List[Optional[str]]): 書き込む値（Noneの要素は書き込まない）
+        """
+        self._patches.update(
+            ((row, col), value) for row, value in enumerate(values, start=row_start) if value is not None
+        )
+
+    def set_cell_value(self, row: int, col: int, value: str) -> None:
+        """セルに値を設定"""
+        self._patches[(row, col)] = value
+
+    def get_sheet_name(self) -> str:
+        """現在のシート名を取得"""
+        return self.sheet_name
+
+    def get_sheet_names(self) -> List[str]:
+        """全てのシート名を取得（CSV/TSV・Parquetは1シートのみ）"""
+        return [self.sheet_name]
+
+    def select_sheet(self, sheet_name: str) -> None:
+        """読み書きの対象シートを切り替え"""
+        if sheet_name != self.sheet_name:
+            raise ValueError(f"シートが見つかりません: {sheet_name}")
+
+    def get_cell_address(self, row: int, col: int) -> str:
+        """セルのアドレスを取得 (例: A1, B2)"""
+        return f"{number_to_excel_column(col)}{row}"
+
+    def save(self) -> None:
+        """書き込んだ値を反映して保存（一時ファイルに書き出してから置き換える）"""
+        tmp_path = f"{self.output_path}.tmp"
+        try:
+            if self.is_parquet:
+                self._save_parquet(tmp_path)
+            else:
+                self._save_csv(tmp_path)
+            os.replace(tmp_path, self.output_path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise Exception(f"ファイルの保存に失敗しました: {str(e)}")
+
+    def close(self) -> None:
+        """読み込んだファイルを閉じる（保存せずに破棄する場合）"""
+        if self.is_parquet:
+            self._parquet_file.close()
+
+    def _row_patches(self) -> Dict[int, Dict[int, str]]:
+        row_patches: Dict[int, Dict[int, str]] = {}
+        for (row, col), value in self._patches.items():
+            row_patches.setdefault(row, {})[col] = value
+        return row_patches
+
+    def _save_csv(self, tmp_path: str) -> None:
+        """入力を一定の行数ごとに読みながら書き込んだ値を反映して出力"""
+        row_patches = self._row_patches()
+        # Shift_JISでは翻訳先言語の文字を表せない場合があるため、BOM付きUTF-8で出力する
+        encoding = 'utf-8-sig' if self.encoding == 'cp932' else self.encoding
+        with open(self.input_path, 'r', encoding=self.encoding, newline='') as src, \
+                open(tmp_path, 'w', encoding=encoding, newline='') as dst:
+            reader = csv.reader(src, delimiter=self.delimiter)
+            writer = csv.writer(dst, delimiter=self.delimiter, lineterminator=self.lineterminator)
+            last_row = 0
+            while True:
+                chunk = list(islice(reader, CHUNK_ROWS))
+                if not chunk:
+                    break
+                for offset, values in enumerate(chunk):
+                    patches = row_patches.get(last_row + offset + 1)
+                    if patches:
+                        chunk[offset] = self._apply_patches(values, patches)
+                writer.writerows(chunk)
+                last_row += len(chunk)
+            # ファイルの末尾より後ろの行への書き込み
+            for row in sorted(r for r in row_patches if r > last_row):
+                writer.writerows([[]] * (row - last_row - 1))
+                writer.writerow(self._apply_patches([], row_patches[row]))
+                last_row = row
+
+    def _apply_patches(self, values: List[str], patches: Dict[int, str]) -> List[str]:
+        """1行分の値に書き込み値を反映"""
+        row_values = list(values)
+        max_col = max(patches)
+        if len(row_values) < max_col:
+            row_values.extend([""] * (max_col - len(row_values)))
+        for col, value in patches.items():
+            row_values[col - 1] = value
+        return row_values
+
+    def _save_parquet(self, tmp_path: str) -> None:
+        """
+        レコードを一定の行数ごとに読みながら書き込んだ値を反映して出力
+
+        書き込んだ列は文字列型になり、既存の列より右の列は新しい列として追加される
+        （列名は1行目に書き込んだ値、ない場合は列名のアルファベット）。
+        """
+        pa, pq = _import_parquet()
+        schema = self._parquet_file.schema_arrow
+        # 列ごとの書き込む行（昇順）と値
+        col_patches: Dict[int, Dict[int, str]] = {}
+        for (row, col), value in self._patches.items():
+            col_patches.setdefault(col, {})[row] = value
+        col_rows = {col: sorted(row for row in patches if row >= 2) for col, patches in col_patches.items()}
+
+        total_cols = max([len(self.column_names), *col_patches])
+        fields = []
+        for col in range(1, total_cols + 1):
+            header = col_patches.get(col, {}).get(1)
+            if col <= len(self.column_names):
+                field = schema.field(col - 1)
+                if col in col_patches:
+                    field = pa.field(header or field.name, pa.string())
+                fields.append(field)
+            else:
+                fields.append(pa.field(header or number_to_excel_column(col), pa.string()))
+        # 列の型を変更するため、pandasの型情報は引き継がない
+        metadata = {key: value for key, value in (schema.metadata or {}).items() if key != b'pandas'}
+        out_schema = pa.schema(fields, metadata=metadata or None)
+
+        def build_batch(first_row: int, num_rows: int, source_columns: Optional[list]):
+            arrays = []
+            for col in range(1, total_cols + 1):
+                if source_columns is not None and col <= len(self.column_names):
+                    array = source_columns[col - 1]
+                else:
+                    array = pa.nulls(num_rows, pa.string())
+                rows = col_rows.get(col)
+                if col in col_patches:
+                    array = array.cast(pa.string())
+                if rows:
+                    lo = bisect.bisect_left(rows, first_row)
+                    hi = bisect.bisect_left(rows, first_row + num_rows)
+                    if lo < hi:
+                        values = array.to_pylist()
+                        for row in rows[lo:hi]:
+                            values[row - first_row] = col_patches[col][row]
+                        array = pa.array(values, pa.string())
+                arrays.append(array)
+            return pa.RecordBatch.from_arrays(arrays, schema=out_schema)
+
+        with pq.ParquetWriter(tmp_path, out_schema) as writer:
+            # 2行目以降がレコード
+            row = 2
+            for batch in self._parquet_file.iter_batches(batch_size=CHUNK_ROWS):
+                writer.write_batch(build_batch(row, batch.num_rows, batch.columns))
+                row += batch.num_rows
+            # ファイルの末尾より後ろの行への書き込み
+            last_row = max((rows[-1] for rows in col_rows.values() if rows), default=0)
+            while row <= last_row:
+                num_rows = min(CHUNK_ROWS, last_row - row + 1)
+                writer.write_batch(build_batch(row, num_rows, None))
+                row += num_rows
@@ -0,0 +1,38 @@
+"""
+テスト共通の設定（リポジトリ直下のモジュールを読み込めるようにする）
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from mock_deepl_server import MockDeepLServer  # noqa: E402
+
+
+@pytest.fixture
+def mock_server():
+    """引数を指定してモックのDeepL APIサーバーを起動する関数（起動したサーバーはテストの終了時に停止する）"""
+    servers = []
+
+    def start(**kwargs) -> MockDeepLServer:
+        server = MockDeepLServer(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def run_cli():
+    """translate_excel.py を指定した作業ディレクトリで実行する関数（履歴・キャッシュはそのディレクトリに作成される）"""
+    def run(cwd, *args) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, os.path.join(REPO_DIR, "translate_excel.py"), *map(str, args)],
+                              cwd=cwd, capture_output=True, text=True, timeout=120)
+
+    return run
@@ -0,0 +1,68 @@
+"""
+checkpoint.Checkpoint の保存と読み込みのテスト
+"""
+import pytest
+
+from checkpoint import Checkpoint
+
+SIGNATURE = {'input_path': "input.xlsx", 'source_cols': [1], 'target_cols': [2]}
+
+
+def test_checkpoint_round_trip(tmp_path):
+    output_path = str(tmp_path / "output.xlsx")
+    checkpoint = Checkpoint(output_path, SIGNATURE, interval=2)
+    for row in (2, 3, 4, 7):
+        checkpoint.record("Sheet1", row, 2, f"翻訳 {row}")
+    checkpoint.record("Sheet2", 5, 3, "翻訳")
+    checkpoint.save()
+    checkpoint.close()
+
+    restored = Checkpoint(output_path, SIGNATURE)
+    assert restored.exists()
+    values = restored.load()
+    assert values == {
+        ("Sheet1", 2, 2): "翻訳 2",
+        ("Sheet1", 3, 2): "翻訳 3",
+        ("Sheet1", 4, 2): "翻訳 4",
+        ("Sheet1", 7, 2): "翻訳 7",
+        ("Sheet2", 5, 3): "翻訳",
+    }
+    assert restored.is_completed("Sheet1", 3, 2)
+    assert not restored.is_completed("Sheet1", 5, 2)
+    assert not restored.is_completed("Sheet1", 3, 3)
+
+
+def test_checkpoint_merges_completed_ranges():
+    assert Checkpoint._merge_ranges({1, 2, 3, 5, 7, 8}) == [[1, 3], [5, 5], [7, 8]]
+    assert Checkpoint._merge_ranges(set()) == []
+
+
+def test_checkpoint_ignores_partially_written_line(tmp_path):
+    output_path = str(tmp_path / "output.xlsx")
+    checkpoint = Checkpoint(output_path, SIGNATURE)
+    checkpoint.record("Sheet1", 2, 2, "翻訳")
+    checkpoint.save()
+    checkpoint.close()
+    with open(checkpoint.cells_file, 'a', encoding='utf-8') as f:
+        f.write('{"sheet": "Sheet1", "row": 3')
+
+    assert Checkpoint(output_path, SIGNATURE).load() == {("Sheet1", 2, 2): "翻訳"}
+
+
+def test_checkpoint_rejects_different_signature(tmp_path):
+    output_path = str(tmp_path / "output.xlsx")
+    checkpoint = Checkpoint(output_path, SIGNATURE)
+    checkpoint.record("Sheet1", 2, 2, "翻訳")
+    checkpoint.save()
+    checkpoint.close()
+
+    with pytest.raises(Exception, match="実行条件"):
+        Checkpoint(output_path, {**SIGNATURE, 'target_cols': [3]}).load()
+
+
+def test_checkpoint_remove(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "output.xlsx"), SIGNATURE)
+    checkpoint.record("Sheet1", 2, 2, "翻訳")
+    checkpoint.save()
+    checkpoint.remove()
+    assert not checkpoint.exists()
@@ -0,0 +1,54 @@
+"""
+deepl_client.DeepLTranslator のテスト（モックサーバーを使用）
+"""
+import pytest
+
+from deepl_client import MAX_TEXTS_PER_REQUEST, DeepLTranslator
+
+
+def create_translator(server, **kwargs) -> DeepLTranslator:
+    return DeepLTranslator(api_key="test-key", api_url=server.url, **kwargs)
+
+
+def test_pack_batches_respects_text_count(mock_server):
+    translator = create_translator(mock_server())
+    texts = ["a"] * (MAX_TEXTS_PER_REQUEST * 2 + 1)
+    batches = translator._pack_batches(list(range(len(texts))), texts)
+    assert [len(batch) for batch in batches] == [MAX_TEXTS_PER_REQUEST, MAX_TEXTS_PER_REQUEST, 1]
+    assert [i for batch in batches for i in batch] == list(range(len(texts)))
+
+
+def test_pack_batches_respects_request_bytes(mock_server):
+    translator = create_translator(mock_server(), max_request_bytes=100)
+    # 1件あたり 40バイト + 引用符・区切り文字の4バイト
+    texts = ["x" * 40] * 5
+    batches = translator._pack_batches(list(range(len(texts))), texts)
+    assert batches == [[0, 1], [2, 3], [4]]
+
+
+def test_pack_batches_keeps_oversized_text_alone(mock_server):
+    translator = create_translator(mock_server(), max_request_bytes=100)
+    texts = ["short", "y" * 200, "short"]
+    batches = translator._pack_batches([0, 1, 2], texts)
+    assert batches == [[0], [1], [2]]
+
+
+def test_translate_batch_returns_translations_in_order(mock_server):
+    server = mock_server()
+    translator = create_translator(server)
+    texts = [f"text {i}" for i in range(120)]
+    results = translator.translate_batch(texts, target_lang="DE")
+    assert results == [f"[DE] {text}" for text in texts]
+    assert server.stats['requests'] == 3
+    assert translator.characters_billed == sum(len(text) for text in texts)
+
+
+def test_whole_request_error_is_not_bisected(mock_server, monkeypatch):
+    # 翻訳先言語が無効な400は、テキストを分割して再送せずにすぐ送出する
+    translator = create_translator(mock_server())
+    posts = []
+    post = translator.session.post
+    monkeypatch.setattr(translator.session, 'post', lambda *args, **kwargs: posts.append(1) or post(*args, **kwargs))
+    with pytest.raises(Exception, match="target_lang"):
+        translator.translate_batch([f"text {i}" for i in range(40)], target_lang="invalid")
+    assert len(posts) == 1
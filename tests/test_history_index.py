@@ -0,0 +1,76 @@
+"""
+history_index.HistoryIndex（履歴の索引・検索・圧縮）のテスト
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from translation_history import JST, TranslationHistory
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=JST)
+
+
+def write_history(path, entries) -> None:
+    with open(path, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def entry(i: int, excel_file: str = "a.xlsx", target_cell: Optional[str] = None, target_lang: str = "JA") -> dict:
+    return {
+        'timestamp': (BASE_TIME + timedelta(days=i)).isoformat(),
+        'excel_file': excel_file,
+        'sheet_name': "Sheet1",
+        'source_cell': f"A{i}",
+        'target_cell': target_cell or f"B{i}",
+        'target_lang': target_lang,
+        'source_text': f"text {i}",
+        'translated_text': f"翻訳 {i}",
+    }
+
+
+def test_query_by_fields(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    write_history(history_file, [entry(1), entry(2, excel_file="b.xlsx"), entry(3, target_lang="DE")])
+    history = TranslationHistory(str(history_file))
+
+    assert [e['source_text'] for e in history.query(excel_file="b.xlsx")] == ["text 2"]
+    assert [e['source_text'] for e in history.query(cell="b3")] == ["text 3"]
+    assert [e['source_text'] for e in history.query(source_text="text 1")] == ["text 1"]
+    assert [e['source_text'] for e in history.query(target_lang="de")] == ["text 3"]
+    assert [e['source_text'] for e in history.query(since=BASE_TIME + timedelta(days=2))] == ["text 2", "text 3"]
+    assert [e['source_text'] for e in history.query(limit=2)] == ["text 2", "text 3"]
+    history.close()
+
+
+def test_index_picks_up_appended_and_replaced_files(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    write_history(history_file, [entry(1)])
+    history = TranslationHistory(str(history_file))
+    assert history.index_stats()['entries'] == 1
+
+    # 追記された行だけを登録し、書きかけの行は次回に登録する
+    write_history(history_file, [entry(2)])
+    with open(history_file, 'a', encoding='utf-8') as f:
+        f.write('{"source_text": "partial"')
+    assert history.index_stats()['entries'] == 2
+
+    # 置き換えられたファイルは索引を作り直す
+    replaced = tmp_path / "replaced.jsonl"
+    write_history(replaced, [entry(5)])
+    replaced.replace(history_file)
+    assert [e['source_text'] for e in history.query()] == ["text 5"]
+    history.close()
+
+
+def test_compact_removes_old_and_superseded_entries(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    write_history(history_file, [entry(1), entry(2, target_cell="B9"), entry(3, target_cell="B9"), entry(4)])
+    history = TranslationHistory(str(history_file))
+
+    kept, removed = history.compact(before=BASE_TIME + timedelta(days=2), latest_only=True)
+
+    assert (kept, removed) == (2, 2)
+    assert [e['source_text'] for e in history.iter_entries()] == ["text 3", "text 4"]
+    assert [e['source_text'] for e in history.query(cell="B9")] == ["text 3"]
+    history.close()
@@ -0,0 +1,110 @@
+"""
+pipeline.PipelineStage と、translate_sheet の書き戻し（翻訳結果を完了した時点で書き込む）のテスト
+"""
+import threading
+
+import pytest
+
+from pipeline import PipelineStage
+from translate_excel import translate_sheet
+
+
+def test_items_are_handled_in_order():
+    handled = []
+    with PipelineStage('test', handled.append) as stage:
+        for i in range(100):
+            stage.put(i)
+    assert handled == list(range(100))
+
+
+def test_queue_is_bounded():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(item):
+        started.set()
+        release.wait()
+
+    stage = PipelineStage('test', handler, maxsize=2)
+    stage.put(0)
+    started.wait()
+    stage.put(1)
+    stage.put(2)
+    # キューが一杯の間は put が待機する
+    blocked = threading.Thread(target=stage.put, args=(3,))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join()
+    stage.close()
+
+
+def test_handler_error_is_raised_to_caller():
+    def handler(item):
+        raise ValueError(f"failed {item}")
+
+    stage = PipelineStage('test', handler)
+    stage.put(1)
+    with pytest.raises(ValueError, match="failed 1"):
+        stage.close()
+
+
+class RecordingHandler:
+    """書き込まれた値を記録するハンドラー（translate_sheetが使う分のみ）"""
+
+    input_path = "book.xlsx"
+
+    def __init__(self):
+        self.values = {}
+
+    def get_sheet_name(self):
+        return "Sheet1"
+
+    def set_cell_value(self, row, col, value):
+        self.values[(row, col)] = value
+
+
+class RecordingCheckpoint:
+    def __init__(self):
+        self.records = []
+
+    def record(self, sheet, row, col, value):
+        self.records.append((sheet, row, col, value))
+
+
+class NullHistory:
+    def add_entry(self, **entry):
+        pass
+
+
+class EchoScheduler:
+    """ジョブを順に "[翻訳先言語] 原文" に翻訳するスケジューラ（fail_textは翻訳できなかったものとする）"""
+
+    def __init__(self, fail_text=None):
+        self.fail_text = fail_text
+
+    def run(self, jobs):
+        for key, texts, target_lang in jobs:
+            yield key, [None if text == self.fail_text else f"[{target_lang}] {text}" for text in texts]
+
+
+def test_translate_sheet_writes_results_as_they_complete():
+    handler = RecordingHandler()
+    cells_by_lang = {"JA": {f"text {i}": [(i, 1, 2, f"text {i}"), (i + 100, 1, 2, f"text {i}")]
+                            for i in range(1, 51)}}
+    scheduler = EchoScheduler(fail_text="text 7")
+    checkpoint = RecordingCheckpoint()
+    params = {'row_range': (1, 150), 'target_cols': [2], 'source_cols': [1], 'request_bytes': 64,
+              'batch_mode': True}
+
+    summary = translate_sheet(handler, params, cells_by_lang, scheduler, NullHistory(), checkpoint,
+                              show_progress=False)
+
+    assert handler.values[(1, 2)] == "[JA] text 1"
+    assert handler.values[(150, 2)] == "[JA] text 50"
+    assert (7, 2) not in handler.values
+    assert summary['failed_cells'] == 2
+    assert len(checkpoint.records) == 98
+    # 書き戻した原文はセルの一覧から取り除かれる
+    assert cells_by_lang == {"JA": {}}
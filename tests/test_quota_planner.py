@@ -0,0 +1,94 @@
+"""
+quota_planner（文字数の計画・予約・複数APIキーへの振り分け）のテスト
+"""
+import os
+
+import openpyxl
+import pytest
+
+from deepl_client import DeepLTranslator, QuotaExceededError
+from quota_planner import MultiKeyTranslator, QuotaPlanner
+from usage_counter import UsageCounter
+
+
+def create_translators(server, *api_keys):
+    return [DeepLTranslator(api_key=api_key, api_url=server.url) for api_key in api_keys]
+
+
+def test_remaining_tracks_characters_translated_after_refresh(mock_server):
+    translators = create_translators(mock_server(character_limit=100), "key-1", "key-2")
+    planner = QuotaPlanner(translators)
+    assert planner.remaining() is None
+    assert planner.refresh()
+    assert planner.remaining() == 200
+
+    translators[0].translate_batch(["0123456789"])
+    assert planner.remaining(translators[0]) == 90
+    assert planner.remaining() == 190
+
+
+def test_plan_selects_leading_requests_within_remaining(mock_server):
+    planner = QuotaPlanner(create_translators(mock_server(character_limit=10), "key"))
+    planner.refresh()
+    requests = [("JA", "abcd"), ("JA", "efgh"), ("JA", "ijkl"), ("DE", "mn")]
+
+    required, selected, selected_characters = planner.plan(requests)
+
+    assert required == 14
+    # 収まらない原文より後ろは、短い原文でも選ばない（行の順に揃える）
+    assert selected == [("JA", "abcd"), ("JA", "efgh")]
+    assert selected_characters == 8
+
+
+def test_reservations_are_excluded_until_consumed_or_released(mock_server):
+    translators = create_translators(mock_server(character_limit=100), "key")
+    planner = QuotaPlanner(translators)
+    planner.refresh()
+    usage = UsageCounter()
+    planner.reserve(30, usage)
+    assert planner.remaining() == 70
+
+    # 予約した翻訳が消費した分は、予約から差し引かれて二重に数えない
+    with usage.activate():
+        translators[0].translate_batch(["0123456789"])
+    assert planner.remaining() == 70
+
+    planner.release(usage)
+    assert planner.remaining() == 90
+
+
+def test_multi_key_translator_switches_keys_on_quota(mock_server):
+    server = mock_server(character_limit=25)
+    translators = create_translators(server, "key-1", "key-2")
+    planner = QuotaPlanner(translators)
+    translator = MultiKeyTranslator(translators, planner)
+
+    results = [translator.translate_batch([f"text {i:05d}"])[0] for i in range(4)]
+
+    assert results == [f"[JA] text {i:05d}" for i in range(4)]
+    assert [t.characters_billed for t in translators] == [20, 20]
+    with pytest.raises(QuotaExceededError):
+        translator.translate_batch(["text 00004"])
+
+
+def test_truncated_run_can_be_resumed(mock_server, run_cli, tmp_path):
+    server = mock_server(character_limit=60)
+    workbook = openpyxl.Workbook()
+    for row in range(1, 11):
+        workbook.active.cell(row, 1, f"row text {row:02d}")
+    workbook.save(tmp_path / "input.xlsx")
+    args = ["--batch", "--input", "input.xlsx", "--output", "output.xlsx", "--source-cols", "A",
+            "--target-cols", "B", "--row-start", "1", "--row-end", "10", "--api-url", server.url,
+            "--no-cache", "--quota-policy", "truncate"]
+
+    first = run_cli(tmp_path, *args, "--api-key", "key-1")
+    assert "5セルは翻訳しません" in first.stdout
+    assert os.path.exists(tmp_path / "output.xlsx.checkpoint.jsonl")
+
+    # 文字数の上限が更新された（別のAPIキーに切り替えた）後に、残りのセルだけを翻訳する
+    second = run_cli(tmp_path, *args, "--api-key", "key-2", "--resume")
+    assert second.returncode == 0, second.stdout + second.stderr
+    values = [cell.value for (cell,) in openpyxl.load_workbook(tmp_path / "output.xlsx").active["B1:B10"]]
+    assert values == [f"[JA] row text {row:02d}" for row in range(1, 11)]
+    assert server.stats['character_count'] == 10 * len("row text 01")
+    assert not os.path.exists(tmp_path / "output.xlsx.checkpoint.jsonl")
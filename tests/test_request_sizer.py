@@ -0,0 +1,69 @@
+"""
+request_sizer のテスト（分割・結合・まとめ方と、モックサーバーでの長いセルの翻訳）
+"""
+import pytest
+
+from deepl_client import MAX_TEXTS_PER_REQUEST, DeepLTranslator
+from request_sizer import MIN_REQUEST_BYTES, RequestSizer, join_chunks, pack_jobs, payload_size, split_text
+
+LONG_TEXT = "\n".join(
+    " ".join(f"Sentence {paragraph}-{i} is here." for i in range(30))
+    for paragraph in range(5)
+) + "\n"
+
+
+@pytest.mark.parametrize('text', [
+    "",
+    "short text",
+    LONG_TEXT,
+    "。".join(["日本語の文章です"] * 200) + "。",
+    "x" * 5000,
+    "  leading and trailing separators  \n\n",
+])
+def test_split_text_round_trip(text):
+    chunks, separators = split_text(text, 256)
+    assert len(separators) == len(chunks) + 1
+    assert join_chunks(chunks, separators) == text
+    assert all(payload_size(chunk) <= 256 for chunk in chunks)
+
+
+def test_split_text_prefers_sentence_boundaries():
+    chunks, _ = split_text(LONG_TEXT, 256)
+    assert len(chunks) > 1
+    # 改行・文末で分割し、文の途中では分割しない
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_split_text_keeps_short_text_whole():
+    assert split_text("one sentence. two sentences.", 256) == (["one sentence. two sentences."], ["", ""])
+
+
+def test_pack_jobs_respects_target_size_and_text_count():
+    texts = ["a" * 46] * 10
+    # 1件あたり 46バイト + 4バイト
+    assert [len(job) for job in pack_jobs(texts, 100)] == [2, 2, 2, 2, 2]
+    many = ["a"] * (MAX_TEXTS_PER_REQUEST + 1)
+    assert [len(job) for job in pack_jobs(many, 1024 * 1024)] == [MAX_TEXTS_PER_REQUEST, 1]
+
+
+def test_pack_jobs_keeps_long_text_alone():
+    texts = ["short", "x" * 500, "short"]
+    assert pack_jobs(texts, 100) == [["short"], ["x" * 500], ["short"]]
+
+
+def test_invalid_request_bytes_raises():
+    with pytest.raises(ValueError):
+        RequestSizer(translator=None, max_bytes=MIN_REQUEST_BYTES - 1)
+
+
+def test_long_text_is_split_and_joined(mock_server):
+    server = mock_server()
+    translator = DeepLTranslator(api_key="test-key", api_url=server.url)
+    sizer = RequestSizer(translator, max_bytes=MIN_REQUEST_BYTES)
+    chunks, separators = split_text(LONG_TEXT, MIN_REQUEST_BYTES)
+    assert len(chunks) > 1
+
+    results = sizer.translate_batch(["short", LONG_TEXT], target_lang="DE")
+
+    assert results == ["[DE] short", join_chunks([f"[DE] {chunk}" for chunk in chunks], separators)]
+    assert server.stats['translated_texts'] == len(chunks) + 1
@@ -0,0 +1,88 @@
+"""
+skip_filter.SkipFilter のテストと、翻訳対象外のセルを型を保って出力するテスト
+"""
+import datetime
+
+import openpyxl
+import pytest
+
+from skip_filter import (RULE_CODE, RULE_DATE, RULE_EMAIL, RULE_FORMULA, RULE_JAPANESE, RULE_NUMBER,
+                         RULE_PATTERN, RULE_URL, SkipFilter)
+
+
+@pytest.mark.parametrize('text, rule', [
+    ("=SUM(A1:A3)", RULE_FORMULA),
+    ("1,234.56", RULE_NUMBER),
+    ("-12%", RULE_NUMBER),
+    ("¥1,000", RULE_NUMBER),
+    ("1.5e-3", RULE_NUMBER),
+    ("2024-01-31", RULE_DATE),
+    ("2024/1/31 12:00", RULE_DATE),
+    ("12:30:00", RULE_DATE),
+    ("https://example.com/path?q=1", RULE_URL),
+    ("www.example.com", RULE_URL),
+    ("user.name+tag@example.co.jp", RULE_EMAIL),
+    ("SKU-1234/A", RULE_CODE),
+    ("---", RULE_CODE),
+    ("これは日本語の文章です。", RULE_JAPANESE),
+])
+def test_classify_skips(text, rule):
+    assert SkipFilter().classify(text) == rule
+
+
+@pytest.mark.parametrize('text', [
+    "Hello, world.",
+    "Order 12 items",
+    "ERROR",
+    "Windows 11 のインストール手順 for administrators and power users",
+])
+def test_classify_translates(text):
+    assert SkipFilter().classify(text) is None
+
+
+def test_japanese_is_skipped_only_for_japanese_target():
+    skip_filter = SkipFilter()
+    assert skip_filter.classify("日本語の文章です", target_lang="JA") == RULE_JAPANESE
+    assert skip_filter.classify("日本語の文章です", target_lang="EN-US") is None
+
+
+def test_disabled_rules_are_not_applied():
+    skip_filter = SkipFilter(rules=[RULE_URL])
+    assert skip_filter.classify("12345") is None
+    assert skip_filter.classify("https://example.com") == RULE_URL
+
+
+def test_custom_patterns_match_whole_cell():
+    skip_filter = SkipFilter(rules=[], patterns=[r'TBD|N/A'])
+    assert skip_filter.classify("N/A") == RULE_PATTERN
+    assert skip_filter.classify("N/A for now") is None
+
+
+def test_unknown_rule_raises():
+    with pytest.raises(ValueError):
+        SkipFilter(rules=["number", "unknown"])
+
+
+@pytest.mark.parametrize('excel_mode', ["memory", "streaming", "patch"])
+def test_skipped_cells_keep_their_type(mock_server, run_cli, tmp_path, excel_mode):
+    server = mock_server()
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet["A1"] = "Hello"
+    sheet["A2"] = 42
+    sheet["A3"] = datetime.date(2024, 1, 31)
+    sheet["A4"] = "=SUM(B1:B3)"
+    workbook.save(tmp_path / "input.xlsx")
+
+    result = run_cli(tmp_path, "--batch", "--input", "input.xlsx", "--output", "output.xlsx",
+                     "--source-cols", "A", "--target-cols", "B", "--row-start", 1, "--row-end", 4,
+                     "--api-key", "key", "--api-url", server.url, "--no-cache", "--excel-mode", excel_mode)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    output = openpyxl.load_workbook(tmp_path / "output.xlsx").active
+    assert output["B1"].value == "[JA] Hello"
+    assert output["B2"].value == 42
+    assert output["B3"].value == datetime.datetime(2024, 1, 31)
+    # 数式は翻訳先の列では計算されない文字列として書き込む
+    assert output["B4"].value == "=SUM(B1:B3)"
+    assert output["B4"].data_type == 's'
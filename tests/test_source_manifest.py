@@ -0,0 +1,60 @@
+"""
+source_manifest.SourceManifest の保存と読み込み、差分翻訳（--incremental）のテスト
+"""
+import openpyxl
+import pytest
+
+from source_manifest import SourceManifest
+
+
+def test_source_manifest_round_trip(tmp_path):
+    output_path = str(tmp_path / "output.xlsx")
+    input_path = str(tmp_path / "input.xlsx")
+    digest = SourceManifest.hash_text("Hello")
+    manifest = SourceManifest(output_path, input_path, ["JA", "DE"])
+    manifest.record("Sheet1", 2, 1, 3, digest)
+    manifest.save()
+
+    loaded = SourceManifest(output_path, input_path, ["JA", "DE"])
+    assert loaded.load()
+    assert loaded.has_sheet("Sheet1")
+    assert not loaded.has_sheet("Sheet2")
+    assert loaded.is_unchanged("Sheet1", 2, 1, 3, digest)
+    assert not loaded.is_unchanged("Sheet1", 2, 1, 3, SourceManifest.hash_text("Hello!"))
+    assert not loaded.is_unchanged("Sheet1", 2, 1, 4, digest)
+
+
+@pytest.mark.parametrize('input_name, target_langs', [
+    ("other.xlsx", ["JA", "DE"]),
+    ("input.xlsx", ["DE", "JA"]),
+])
+def test_source_manifest_ignores_different_run(tmp_path, input_name, target_langs):
+    output_path = str(tmp_path / "output.xlsx")
+    manifest = SourceManifest(output_path, str(tmp_path / "input.xlsx"), ["JA", "DE"])
+    manifest.record("Sheet1", 2, 1, 3, SourceManifest.hash_text("Hello"))
+    manifest.save()
+
+    assert not SourceManifest(output_path, str(tmp_path / input_name), target_langs).load()
+
+
+def test_incremental_run_translates_only_changed_cells(mock_server, run_cli, tmp_path):
+    server = mock_server()
+    workbook = openpyxl.Workbook()
+    for row in range(1, 6):
+        workbook.active.cell(row, 1, f"source {row}")
+    workbook.save(tmp_path / "input.xlsx")
+    args = ["--batch", "--input", "input.xlsx", "--output", "output.xlsx", "--source-cols", "A",
+            "--target-cols", "B", "--row-start", 1, "--row-end", 5, "--api-key", "key", "--api-url", server.url,
+            "--no-cache", "--incremental"]
+    assert run_cli(tmp_path, *args).returncode == 0
+    assert server.stats['translated_texts'] == 5
+
+    workbook = openpyxl.load_workbook(tmp_path / "input.xlsx")
+    workbook.active["A3"] = "changed source"
+    workbook.save(tmp_path / "input.xlsx")
+    result = run_cli(tmp_path, *args)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert server.stats['translated_texts'] == 6
+    values = [cell.value for (cell,) in openpyxl.load_workbook(tmp_path / "output.xlsx").active["B1:B5"]]
+    assert values == ["[JA] source 1", "[JA] source 2", "[JA] changed source", "[JA] source 4", "[JA] source 5"]
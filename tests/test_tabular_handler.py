@@ -0,0 +1,102 @@
+"""
+tabular_handler.TabularHandler のテスト（CSV/TSV・Parquetの読み込み、チャンク単位の読み込み、書き込んだ値の保存）
+"""
+import pytest
+
+import tabular_handler
+from tabular_handler import TabularHandler
+
+
+def write_text(path, text: str, encoding: str = "utf-8") -> None:
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write(text)
+
+
+def read_text(path, encoding: str = "utf-8") -> str:
+    with open(path, "r", encoding=encoding, newline="") as f:
+        return f.read()
+
+
+def test_csv_round_trip(tmp_path):
+    input_path = tmp_path / "input.csv"
+    write_text(input_path, "id,text\r\n1,Hello\r\n2,\"Hello, world\"\r\n3\r\n")
+    handler = TabularHandler(str(input_path))
+
+    assert handler.output_path == str(tmp_path / "input_translated.csv")
+    assert handler.get_column_values([2, 1], 1, 5) == {
+        2: ["text", "Hello", "Hello, world", "", ""],
+        1: ["id", "1", "2", "3", ""],
+    }
+    handler.set_column_values(3, 1, ["translation", "こんにちは", None])
+    handler.set_cell_value(6, 2, "末尾より後ろ")
+    handler.save()
+
+    assert read_text(handler.output_path) == (
+        "id,text,translation\r\n1,Hello,こんにちは\r\n2,\"Hello, world\"\r\n3\r\n\r\n,末尾より後ろ\r\n")
+
+
+def test_tsv_and_shift_jis(tmp_path):
+    input_path = tmp_path / "input.tsv"
+    write_text(input_path, "見出し\t訳\nりんご\t\n", encoding="cp932")
+    handler = TabularHandler(str(input_path), str(tmp_path / "output.tsv"))
+
+    assert handler.get_column_values([1], 1, 2) == {1: ["見出し", "りんご"]}
+    handler.set_cell_value(2, 2, "Apfel")
+    handler.save()
+
+    # Shift_JISの入力はBOM付きUTF-8で出力し、改行コードは入力に合わせる
+    assert read_text(tmp_path / "output.tsv", encoding="utf-8-sig") == "見出し\t訳\nりんご\tApfel\n"
+
+
+def test_reads_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(tabular_handler, "CHUNK_ROWS", 3)
+    input_path = tmp_path / "input.csv"
+    write_text(input_path, "".join(f"row {row},{row * 10}\n" for row in range(1, 11)))
+    handler = TabularHandler(str(input_path))
+
+    assert list(handler.iter_cell_values([2, 1], 4, 8)) == [
+        (row, [str(row * 10), f"row {row}"]) for row in range(4, 9)]
+
+    reads = []
+    iter_chunks = handler._iter_chunks
+    monkeypatch.setattr(handler, "_iter_chunks", lambda cols, row_start=1: reads.append(row_start) or
+                        iter_chunks(cols, row_start))
+    # 同じチャンクのセルはファイルを読み直さない
+    assert [handler.get_cell_value(row, 1) for row in range(4, 7)] == ["row 4", "row 5", "row 6"]
+    assert handler.get_cell_value(5, 2) == "50"
+    assert handler.get_cell_value(7, 1) == "row 7"
+    assert handler.get_cell_value(20, 1) == ""
+    assert reads == [4, 5, 7, 20]
+
+    handler.set_cell_value(7, 1, "書き込んだ値")
+    assert handler.get_cell_value(7, 1) == "書き込んだ値"
+
+
+def test_parquet_round_trip(tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(tabular_handler, "CHUNK_ROWS", 2)
+    input_path = str(tmp_path / "input.parquet")
+    output_path = str(tmp_path / "output.parquet")
+    pq.write_table(pa.table({"id": [1, 2, 3], "text": ["Hello", None, "World"]}), input_path)
+    handler = TabularHandler(input_path, output_path)
+
+    assert handler.get_column_values([1, 2], 1, 4) == {
+        1: ["id", "1", "2", "3"],
+        2: ["text", "Hello", "", "World"],
+    }
+    assert handler.get_cell_value(4, 2) == "World"
+    handler.set_column_values(3, 1, ["ja", "こんにちは", None, "世界"])
+    handler.set_cell_value(5, 2, "追加")
+    handler.save()
+
+    table = pq.read_table(output_path)
+    assert table.column_names == ["id", "text", "ja"]
+    # 書き込んでいない列は型を保ち、書き込んだ列は文字列型になる
+    assert table.schema.field("id").type == pa.int64()
+    assert table.schema.field("text").type == pa.string()
+    assert table.to_pydict() == {
+        "id": [1, 2, 3, None],
+        "text": ["Hello", None, "World", "追加"],
+        "ja": ["こんにちは", None, "世界", None],
+    }
@@ -0,0 +1,85 @@
+"""
+translation_cache.TranslationCache のテスト
+"""
+import sqlite3
+
+from translation_cache import TranslationCache
+from usage_counter import UsageCounter
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache_file = str(tmp_path / "cache.db")
+    cache = TranslationCache(cache_file)
+    cache.put_many([("Hello", "こんにちは"), ("World", "世界")], "JA")
+    cache.put("Hello", "Hallo", "DE")
+    cache.close()
+
+    reopened = TranslationCache(cache_file)
+    assert reopened.get_many(["Hello", "World", "Missing"], "JA") == {"Hello": "こんにちは", "World": "世界"}
+    assert reopened.get("Hello", "DE") == "Hallo"
+    assert len(reopened) == 3
+
+
+def test_translations_are_separated_by_endpoint(tmp_path):
+    # モックサーバーに向けた実行の翻訳は、DeepL APIに向けた実行でヒットしない
+    cache_file = str(tmp_path / "cache.db")
+    mock = TranslationCache(cache_file, endpoint="http://127.0.0.1:8080")
+    mock.put("Hello", "[JA] Hello", "JA")
+    mock.close()
+
+    deepl = TranslationCache(cache_file)
+    assert deepl.get("Hello", "JA") is None
+    deepl.put("Hello", "こんにちは", "JA")
+    deepl.close()
+
+    mock = TranslationCache(cache_file, endpoint="http://127.0.0.1:8080")
+    assert mock.get("Hello", "JA") == "[JA] Hello"
+
+
+def test_legacy_table_is_migrated_without_mock_translations(tmp_path):
+    cache_file = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(cache_file)
+    conn.execute("CREATE TABLE translations (source_text TEXT NOT NULL, target_lang TEXT NOT NULL, "
+                 "translated_text TEXT NOT NULL, last_used REAL NOT NULL, "
+                 "PRIMARY KEY (source_text, target_lang))")
+    conn.executemany("INSERT INTO translations VALUES (?, ?, ?, ?)",
+                     [("Hello", "JA", "こんにちは", 1.0), ("World", "JA", "[JA] World", 2.0)])
+    conn.commit()
+    conn.close()
+
+    cache = TranslationCache(cache_file)
+    assert cache.get_many(["Hello", "World"], "JA") == {"Hello": "こんにちは"}
+    assert len(cache) == 1
+
+
+def test_import_history_skips_other_endpoints(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    imported = cache.import_history([
+        {'source_text': "Hello", 'translated_text': "こんにちは", 'target_lang': "JA"},
+        {'source_text': "World", 'translated_text': "[JA] World", 'target_lang': "JA"},
+        {'source_text': "Bye", 'translated_text': "[JA] Bye", 'target_lang': "JA",
+         'endpoint': "http://127.0.0.1:8080"},
+    ])
+    assert imported == 1
+    assert cache.get_many(["Hello", "World", "Bye"], "JA") == {"Hello": "こんにちは"}
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"), max_entries=10, memory_entries=0)
+    for i in range(10):
+        cache.put(f"text {i}", f"翻訳 {i}", "JA")
+    cache.get("text 0", "JA")
+    cache.put("text 10", "翻訳 10", "JA")
+    assert len(cache) <= 10
+    assert cache.get("text 0", "JA") == "翻訳 0"
+    assert cache.get("text 1", "JA") is None
+
+
+def test_hits_and_misses_are_recorded_per_run(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    cache.put("Hello", "こんにちは", "JA")
+    usage = UsageCounter()
+    with usage.activate():
+        cache.get_many(["Hello", "World", "World"], "JA")
+        cache.get_many(["Hello"], "JA", record_stats=False)
+    assert (usage.cache_hits, usage.cache_misses) == (1, 1)
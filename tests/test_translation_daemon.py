@@ -0,0 +1,176 @@
+"""
+translation_daemon の常駐モードのテスト（待ち受けの開始・終了、ジョブの実行、リクエストの認証）
+"""
+import json
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import openpyxl
+import pytest
+
+from cli_interface import CLIInterface
+from metrics import Metrics
+from translation_daemon import TOKEN_ENV, TranslationDaemon, create_server, serve
+
+TOKEN = "test-token"
+
+
+def serve_params(monkeypatch, tmp_path, *args):
+    """常駐モードのコマンドライン引数から実行パラメータを作成（履歴は tmp_path に作成される）"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["translate_excel.py", "--serve", "127.0.0.1:8780", "--no-cache",
+                                      "--api-key", "dummy", *args])
+    return CLIInterface().parse_args()
+
+
+@pytest.fixture
+def job_server(monkeypatch, tmp_path, mock_server):
+    """モックサーバーに向けた翻訳サービスを空いているポートで起動する関数"""
+    servers = []
+
+    def start(*args):
+        monkeypatch.setenv(TOKEN_ENV, TOKEN)
+        params = serve_params(monkeypatch, tmp_path, "--api-url", mock_server().url, *args)
+        params['serve'] = ("127.0.0.1", 0)
+        server = create_server(params)
+        server.translation_daemon.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        server.translation_daemon.shutdown()
+
+
+def request(server, method, path, body=None, headers=None):
+    """翻訳サービスにリクエストを送信し、(ステータス, JSONの本文) を返す"""
+    host, port = server.server_address[:2]
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {TOKEN}", **(headers or {})}
+    req = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                 headers={name: value for name, value in headers.items() if value is not None})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for_job(server, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, job = request(server, "GET", f"/jobs/{job_id}")
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"ジョブが終了しません: {job_id}")
+
+
+def test_reports_bind_error_when_port_is_in_use(monkeypatch, tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        params = serve_params(monkeypatch, tmp_path)
+        params['serve'] = sock.getsockname()
+
+        with pytest.raises(Exception, match="待ち受けできません") as error:
+            serve(params, Metrics())
+        assert isinstance(error.value.__cause__, OSError)
+
+
+def test_shutdown_before_start_does_not_block(monkeypatch, tmp_path, mock_server):
+    params = serve_params(monkeypatch, tmp_path, "--api-url", mock_server().url,
+                          "--max-jobs", "3", "--max-queued-jobs", "1")
+    daemon = TranslationDaemon(params)
+
+    thread = threading.Thread(target=daemon.shutdown, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_runs_submitted_job(job_server, tmp_path):
+    input_path = tmp_path / "input.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active["A1"] = "Hello"
+    workbook.active["A2"] = "World"
+    workbook.save(input_path)
+    server = job_server()
+
+    status, job = request(server, "POST", "/jobs", {
+        "input": str(input_path), "source_cols": "A", "target_cols": "B", "row_start": 1, "row_end": 2})
+    assert status == 202
+    job = wait_for_job(server, job["id"])
+
+    assert job["status"] == "completed", job.get("error")
+    sheet = openpyxl.load_workbook(tmp_path / "input_translated.xlsx").active
+    assert [sheet["B1"].value, sheet["B2"].value] == ["[JA] Hello", "[JA] World"]
+    status, health = request(server, "GET", "/health")
+    assert status == 200
+    assert health["jobs"]["completed"] == 1
+
+
+def create_input(tmp_path):
+    input_path = tmp_path / "input.xlsx"
+    openpyxl.Workbook().save(input_path)
+    return {"input": str(input_path), "source_cols": "A", "target_cols": "B", "row_start": 1, "row_end": 1}
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong-token", TOKEN],
+                         ids=["missing", "wrong-token", "without-scheme"])
+def test_rejects_request_without_token(job_server, tmp_path, authorization):
+    server = job_server()
+
+    status, body = request(server, "POST", "/jobs", create_input(tmp_path), {"Authorization": authorization})
+    assert status == 401
+    assert "error" in body
+    assert request(server, "GET", "/jobs", headers={"Authorization": authorization})[0] == 401
+    assert request(server, "DELETE", "/jobs/1", headers={"Authorization": authorization})[0] == 401
+    assert server.translation_daemon.list_jobs() == []
+
+
+@pytest.mark.parametrize("content_type", [None, "text/plain", "application/x-www-form-urlencoded"])
+def test_rejects_job_without_json_content_type(job_server, tmp_path, content_type):
+    server = job_server()
+
+    status, _ = request(server, "POST", "/jobs", create_input(tmp_path), {"Content-Type": content_type})
+    assert status == 415
+    assert server.translation_daemon.list_jobs() == []
+
+
+def test_rejects_unknown_host_header(job_server, tmp_path):
+    server = job_server()
+    port = server.server_address[1]
+
+    assert request(server, "GET", "/health", headers={"Host": f"evil.example:{port}"})[0] == 403
+    assert request(server, "POST", "/jobs", create_input(tmp_path), {"Host": "evil.example"})[0] == 403
+    assert request(server, "GET", "/health", headers={"Host": f"localhost:{port}"})[0] == 200
+
+
+def test_rejects_output_outside_input_directory(job_server, tmp_path):
+    (tmp_path / "data").mkdir()
+    job = create_input(tmp_path / "data")
+    server = job_server()
+
+    for output in (tmp_path / "output.xlsx", tmp_path / "data" / ".." / "output.xlsx"):
+        status, body = request(server, "POST", "/jobs", {**job, "output": str(output)})
+        assert status == 400
+        assert "--allow-any-output" in body["error"]
+    (tmp_path / "data" / "out").mkdir()
+    assert request(server, "POST", "/jobs", {**job, "output": str(tmp_path / "data" / "out" / "o.xlsx")})[0] == 202
+
+
+def test_allow_any_output(job_server, tmp_path):
+    (tmp_path / "data").mkdir()
+    server = job_server("--allow-any-output")
+
+    status, _ = request(server, "POST", "/jobs", {**create_input(tmp_path / "data"),
+                                                  "output": str(tmp_path / "output.xlsx")})
+    assert status == 202
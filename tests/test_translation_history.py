@@ -0,0 +1,81 @@
+"""
+translation_history.TranslationHistory（JSON Linesの追記・旧形式の移行）のテスト
+"""
+import json
+
+from translation_history import TranslationHistory
+
+
+def add_entries(history: TranslationHistory, count: int, start: int = 0) -> None:
+    for i in range(start, start + count):
+        history.add_entry(f"text {i}", f"翻訳 {i}", "book.xlsx", "Sheet1", f"A{i + 1}", f"B{i + 1}")
+
+
+def test_entries_are_appended_as_json_lines(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    history = TranslationHistory(history_file, sync_every=3)
+    add_entries(history, 5)
+    history.close()
+
+    with open(history_file, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [entry['source_text'] for entry in lines] == [f"text {i}" for i in range(5)]
+    assert lines[0]['target_lang'] == "JA"
+    assert 'endpoint' not in lines[0]
+
+
+def test_reopened_history_keeps_appending(tmp_path):
+    history_file = str(tmp_path / "history.jsonl")
+    history = TranslationHistory(history_file)
+    add_entries(history, 2)
+    history.close()
+    history = TranslationHistory(history_file)
+    add_entries(history, 2, start=2)
+
+    assert [entry['source_text'] for entry in history.iter_entries()] == [f"text {i}" for i in range(4)]
+    assert [entry['source_text'] for entry in history.get_recent_entries(3)] == ["text 1", "text 2", "text 3"]
+    history.close()
+
+
+def test_recent_entries_are_read_from_the_end(tmp_path):
+    history = TranslationHistory(str(tmp_path / "history.jsonl"))
+    add_entries(history, 300)
+    entries = history.get_recent_entries(2)
+    assert [entry['source_text'] for entry in entries] == ["text 298", "text 299"]
+    assert history.get_recent_entries(0) == []
+    history.close()
+
+
+def test_invalid_lines_are_skipped(tmp_path):
+    history_file = tmp_path / "history.jsonl"
+    history_file.write_text('{"source_text": "ok"}\nnot json\n', encoding='utf-8')
+    history = TranslationHistory(str(history_file))
+    assert [entry['source_text'] for entry in history.iter_entries()] == ["ok"]
+
+
+def test_legacy_json_history_is_migrated(tmp_path):
+    legacy_file = tmp_path / "history.json"
+    legacy_file.write_text(json.dumps([{'source_text': "old", 'translated_text': "古い"}]), encoding='utf-8')
+
+    # 旧形式のファイル名を指定しても、JSON配列の後ろには追記しない
+    history = TranslationHistory(str(legacy_file))
+    assert history.history_file == str(tmp_path / "history.jsonl")
+    add_entries(history, 1)
+    history.close()
+
+    assert json.loads(legacy_file.read_text(encoding='utf-8')) == [{'source_text': "old", 'translated_text': "古い"}]
+    assert [entry['source_text'] for entry in history.iter_entries()] == ["old", "text 0"]
+
+
+def test_endpoint_is_recorded_for_non_deepl_backends(tmp_path):
+    history = TranslationHistory(str(tmp_path / "history.jsonl"), endpoint="http://127.0.0.1:8080")
+    add_entries(history, 1)
+    assert next(history.iter_entries())['endpoint'] == "http://127.0.0.1:8080"
+    history.close()
+
+
+def test_clear_history(tmp_path):
+    history = TranslationHistory(str(tmp_path / "history.jsonl"))
+    add_entries(history, 3)
+    history.clear_history()
+    assert list(history.iter_entries()) == []
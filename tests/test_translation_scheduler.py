@@ -0,0 +1,88 @@
+"""
+translation_scheduler のテスト（レート制限と、モックサーバーでの429を受けながらの並行翻訳）
+"""
+import pytest
+
+import translation_scheduler
+from deepl_client import DeepLTranslator
+from translation_scheduler import MAX_BACKOFF_SECONDS, RateLimiter, TranslationScheduler
+
+
+def test_backoff_doubles_for_consecutive_bursts():
+    # 待機後に送信したリクエストが再び429を受けるたびに待機時間が倍になる
+    limiter = RateLimiter()
+    waits = [limiter.report_rate_limited(limiter._generation) for _ in range(3)]
+    assert waits == [1.0, 2.0, 4.0]
+
+
+def test_backoff_is_escalated_once_per_burst():
+    # 同じ世代で送信したリクエストの429は、最初の1件だけが待機時間を延ばす
+    limiter = RateLimiter()
+    generation = limiter._generation
+    assert limiter.report_rate_limited(generation) == 1.0
+    shared = [limiter.report_rate_limited(generation) for _ in range(3)]
+    assert all(0.0 < wait <= 1.0 for wait in shared)
+    assert limiter._generation == generation + 1
+    assert limiter._consecutive_limits == 1
+
+
+def test_success_resets_backoff():
+    limiter = RateLimiter()
+    limiter.report_rate_limited()
+    limiter.report_rate_limited()
+    limiter.report_success()
+    assert limiter.report_rate_limited() == 1.0
+
+
+def test_backoff_is_capped():
+    limiter = RateLimiter()
+    waits = [limiter.report_rate_limited() for _ in range(10)]
+    assert max(waits) == MAX_BACKOFF_SECONDS
+
+
+def test_acquire_waits_until_backoff_ends(monkeypatch):
+    limiter = RateLimiter()
+    sleeps = []
+
+    def sleep(seconds):
+        # 待機が終わったものとして、待機の終了時刻を過去にする
+        sleeps.append(seconds)
+        limiter._blocked_until = 0.0
+
+    monkeypatch.setattr('translation_scheduler.time.sleep', sleep)
+    limiter.report_rate_limited()
+    assert limiter.acquire() == 1
+    assert sleeps == [pytest.approx(1.0, abs=0.1)]
+
+
+def test_rate_limited_requests_under_concurrency_are_all_translated(mock_server, monkeypatch):
+    # 429の連続応答を受けても、リトライ回数を使い切らずに全てのテキストを翻訳する
+    # （待機時間はテストを短くするため上限を下げる）
+    monkeypatch.setattr(translation_scheduler, 'MAX_BACKOFF_SECONDS', 0.05)
+    server = mock_server(latency=0.01, rate_limit_every=8, rate_limit_burst=4)
+    translator = DeepLTranslator(api_key="test-key", api_url=server.url, rate_limiter=RateLimiter())
+    langs = ["DE", "FR"]
+    jobs = [((lang, start), [f"cell {i}" for i in range(start, start + 5)], lang)
+            for lang in langs for start in range(0, 40, 5)]
+
+    results = dict(TranslationScheduler(translator, workers=4).run(jobs))
+
+    assert server.stats['rate_limited'] > 0
+    for (lang, start), texts, _ in jobs:
+        assert results[(lang, start)] == [f"[{lang}] {text}" for text in texts]
+    assert translator.characters_billed == sum(len(text) for _, texts, _ in jobs for text in texts)
+
+
+def test_results_are_returned_for_every_job_key():
+    class EchoTranslator:
+        def translate_batch(self, texts, target_lang="JA", max_retries=3):
+            return [f"{target_lang}:{text}" for text in texts]
+
+    jobs = [(i, [str(i)]) for i in range(20)]
+    results = dict(TranslationScheduler(EchoTranslator(), workers=3).run(jobs, target_lang="FR"))
+    assert results == {i: [f"FR:{i}"] for i in range(20)}
+
+
+def test_invalid_worker_count_raises():
+    with pytest.raises(ValueError):
+        TranslationScheduler(translator=None, workers=0)
@@ -0,0 +1,194 @@
+"""
+xlsx_patcher.patch_workbook のテスト（書き込んだ値と、元の書式・他のシートが保たれること）
+"""
+import datetime
+import io
+import struct
+import zipfile
+
+import openpyxl
+from openpyxl.styles import Font, PatternFill
+
+import xlsx_patcher
+from xlsx_patcher import patch_workbook
+
+
+def create_workbook(path) -> None:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet["A1"] = "Header"
+    sheet["A1"].font = Font(bold=True)
+    sheet["B1"] = "Translation"
+    sheet["B1"].font = Font(bold=True)
+    sheet["B1"].fill = PatternFill("solid", fgColor="FFFF00")
+    for row in range(2, 6):
+        sheet.cell(row, 1, f"Text {row}")
+        sheet.cell(row, 2).font = Font(italic=True, color="FF0000")
+    sheet["C2"] = 42
+    sheet["C3"] = "=C2*2"
+    sheet.column_dimensions["A"].width = 30
+    sheet.merge_cells("D1:E1")
+    other = workbook.create_sheet("Other")
+    other["A1"] = "Untouched"
+    other["A1"].font = Font(underline="single")
+    workbook.save(path)
+
+
+class _UnseekableBuffer(io.BytesIO):
+    """シークできない出力先（zipfileはデータディスクリプターを使用して書き込む）"""
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("seek")
+
+
+def rewrite_archive(path, data_descriptor: bool = False, force_zip64: bool = False) -> None:
+    """全てのメンバーをデータディスクリプター付き、またはZIP64の形式で書き直す"""
+    with zipfile.ZipFile(path) as source:
+        members = [(info, source.read(info)) for info in source.infolist()]
+    buffer = _UnseekableBuffer() if data_descriptor else io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as output:
+        for info, data in members:
+            with output.open(info.filename, "w", force_zip64=force_zip64) as target:
+                target.write(data)
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+
+
+def assert_patched_archive(input_path, output_path) -> None:
+    with zipfile.ZipFile(output_path) as output:
+        assert output.testzip() is None
+    with zipfile.ZipFile(input_path) as source, zipfile.ZipFile(output_path) as output:
+        assert output.read("xl/worksheets/sheet2.xml") == source.read("xl/worksheets/sheet2.xml")
+    workbook = openpyxl.load_workbook(output_path)
+    assert workbook["Data"]["B2"].value == "テキスト"
+    assert workbook["Other"]["A1"].value == "Untouched"
+
+
+def test_patch_preserves_formatting(tmp_path):
+    input_path = str(tmp_path / "input.xlsx")
+    output_path = str(tmp_path / "output.xlsx")
+    create_workbook(input_path)
+
+    patch_workbook(input_path, output_path, {"Data": {
+        (1, 2): "翻訳",
+        (2, 2): "テキスト 2",
+        (3, 2): 3.5,
+        (4, 2): datetime.date(2024, 1, 31),
+        (5, 2): "=not a formula",
+        (8, 1): "新しい行",
+    }})
+
+    workbook = openpyxl.load_workbook(output_path)
+    sheet = workbook["Data"]
+    assert sheet["B1"].value == "翻訳"
+    assert sheet["B2"].value == "テキスト 2"
+    assert sheet["B3"].value == 3.5
+    assert sheet["B4"].value == datetime.datetime(2024, 1, 31)
+    assert sheet["B4"].is_date
+    assert sheet["B5"].value == "=not a formula"
+    assert sheet["B5"].data_type == 's'
+    assert sheet["A8"].value == "新しい行"
+
+    # 書き込んだセル・書き込んでいないセルの書式が保たれる
+    assert sheet["B1"].font.bold
+    assert sheet["B1"].fill.fgColor.rgb == "00FFFF00"
+    assert sheet["B2"].font.italic
+    assert sheet["B2"].font.color.rgb == "00FF0000"
+    assert sheet["A1"].font.bold
+    assert sheet["A2"].value == "Text 2"
+    assert sheet["C2"].value == 42
+    assert sheet["C3"].value == "=C2*2"
+    assert sheet.column_dimensions["A"].width == 30
+    assert "D1:E1" in {str(merged) for merged in sheet.merged_cells.ranges}
+    assert workbook["Other"]["A1"].value == "Untouched"
+    assert workbook["Other"]["A1"].font.underline == "single"
+
+
+def test_untouched_members_are_copied_without_recompression(tmp_path):
+    input_path = str(tmp_path / "input.xlsx")
+    output_path = str(tmp_path / "output.xlsx")
+    create_workbook(input_path)
+
+    patch_workbook(input_path, output_path, {"Data": {(2, 2): "テキスト"}})
+
+    with zipfile.ZipFile(input_path) as source, zipfile.ZipFile(output_path) as output:
+        assert output.testzip() is None
+        untouched = output.getinfo("xl/worksheets/sheet2.xml")
+        original = source.getinfo("xl/worksheets/sheet2.xml")
+        assert (untouched.CRC, untouched.compress_size) == (original.CRC, original.compress_size)
+        assert output.read("xl/worksheets/sheet2.xml") == source.read("xl/worksheets/sheet2.xml")
+
+
+def test_copies_members_with_data_descriptor(tmp_path):
+    input_path = str(tmp_path / "input.xlsx")
+    output_path = str(tmp_path / "output.xlsx")
+    create_workbook(input_path)
+    rewrite_archive(input_path, data_descriptor=True)
+    with zipfile.ZipFile(input_path) as source:
+        assert source.getinfo("xl/worksheets/sheet2.xml").flag_bits & 0x08
+
+    patch_workbook(input_path, output_path, {"Data": {(2, 2): "テキスト"}})
+
+    assert_patched_archive(input_path, output_path)
+    with zipfile.ZipFile(output_path) as output:
+        assert not output.getinfo("xl/worksheets/sheet2.xml").flag_bits & 0x08
+
+
+def test_copies_zip64_members(tmp_path):
+    input_path = str(tmp_path / "input.xlsx")
+    output_path = str(tmp_path / "output.xlsx")
+    create_workbook(input_path)
+    rewrite_archive(input_path, force_zip64=True)
+
+    patch_workbook(input_path, output_path, {"Data": {(2, 2): "テキスト"}})
+
+    assert_patched_archive(input_path, output_path)
+
+
+def test_falls_back_to_recompression(tmp_path, monkeypatch):
+    input_path = str(tmp_path / "input.xlsx")
+    output_path = str(tmp_path / "output.xlsx")
+    create_workbook(input_path)
+    rewrite_archive(input_path, data_descriptor=True)
+    monkeypatch.setattr(xlsx_patcher, "_supports_raw_copy", lambda output: False)
+
+    patch_workbook(input_path, output_path, {"Data": {(2, 2): "テキスト"}})
+
+    assert_patched_archive(input_path, output_path)
+
+
+def test_date_keeps_existing_date_format(tmp_path):
+    input_path = str(tmp_path / "input.xlsx")
+    output_path = str(tmp_path / "output.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet["A1"] = datetime.date(2020, 1, 1)
+    sheet["A1"].number_format = "yyyy/mm/dd"
+    sheet["A1"].font = Font(bold=True)
+    sheet["A2"] = "Text"
+    sheet["A2"].number_format = "@"
+    workbook.save(input_path)
+
+    patch_workbook(input_path, output_path, {"Data": {
+        (1, 1): datetime.date(2024, 1, 31),
+        (2, 1): datetime.datetime(2024, 1, 31, 12, 30),
+    }})
+
+    sheet = openpyxl.load_workbook(output_path)["Data"]
+    # 元のセルの書式が日付の場合は、その書式（表示形式・フォント）を引き継ぐ
+    assert sheet["A1"].value == datetime.datetime(2024, 1, 31)
+    assert sheet["A1"].number_format == "yyyy/mm/dd"
+    assert sheet["A1"].font.bold
+    # 日付以外の書式の場合は、組み込みの日付の書式を使用する
+    assert sheet["A2"].value == datetime.datetime(2024, 1, 31, 12, 30)
+    assert sheet["A2"].is_date
+
+
+def test_strip_zip64_extra_keeps_other_fields():
+    zip64 = struct.pack("<HHQ", 1, 8, 123)
+    timestamp = struct.pack("<HHBI", 0x5455, 5, 1, 0)
+    assert xlsx_patcher._strip_zip64_extra(zip64 + timestamp) == timestamp
+    assert xlsx_patcher._strip_zip64_extra(timestamp + zip64) == timestamp
+    assert xlsx_patcher._strip_zip64_extra(b"") == b""
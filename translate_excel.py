@@ -5,94 +5,914 @@ Excel翻訳ツールのメインスクリプト
 import sys
 import os
 import time
-from cli_interface import CLIInterface
-from excel_handler import ExcelHandler
-from deepl_client import DeepLTranslator
-from translation_history import TranslationHistory
-from utils import format_progress_bar
+import datetime
+from itertools import zip_longest
+from typing import Any, Dict, List, Optional, Tuple
+from checkpoint import Checkpoint
+from cli_interface import CLIInterface, TranslationParams
+from excel_handler import ExcelHandler, MODE_STREAMING
+from deepl_client import DeepLTranslator, resolve_api_url, translation_endpoint
+from metrics import Metrics
+from pipeline import PipelineStage
+from quota_planner import MultiKeyTranslator, POLICY_OFF, POLICY_REFUSE, QuotaPlanner
+from request_sizer import RequestSizer, pack_jobs
+from skip_filter import SkipFilter
+from source_manifest import SourceManifest
+from tabular_handler import open_handler
+from translation_history import DEFAULT_HISTORY_FILE, TranslationHistory
+from translation_backend import TranslationBackend
+from translation_cache import TranslationCache
+from translation_scheduler import RateLimiter, TranslationScheduler
+from usage_counter import UsageCounter
+from progress_reporter import ProgressReporter
+from utils import normalize_text, number_to_excel_column
 
-def main() -> None:
+# 原文のまま出力する際に型を保つ値（それ以外は文字列として書き込む）
+_TYPED_VALUES = (int, float, datetime.date, datetime.time, datetime.timedelta)
+
+# ファイル単位のワーカープロセスで共有するサービス
+_worker_services: Optional[Tuple[Any, ...]] = None
+
+
+def create_services(params: TranslationParams, max_rps: Optional[float] = None) -> Tuple[Any, ...]:
+    """
+    翻訳に必要なサービスを作成
+
+    Args:
+        params (TranslationParams): 実行パラメータ
+        max_rps (Optional[float]): このプロセスに割り当てる1秒あたりの最大リクエスト数
+
+    Returns:
+        Tuple[Any, ...]: (翻訳履歴, 翻訳キャッシュ, 翻訳バックエンド, スケジューラ, 計測値, 文字数の計画)
+    """
+    # 処理段階・API呼び出しの計測値（全サービスで共有）
+    metrics = Metrics()
+
+    # APIキーはカンマ区切りで複数指定でき、文字数上限に達したら次のAPIキーへ切り替える
+    api_keys = [key.strip() for key in (params.get('api_key') or os.getenv('DEEPL_API_KEY') or '').split(',')
+                if key.strip()] or [None]
+    # モックサーバーなどDeepL API以外の翻訳は、キャッシュ・履歴でDeepL APIの翻訳と区別する
+    endpoint = translation_endpoint(resolve_api_url(api_keys[0] or '', params.get('api_url')))
+
+    # 翻訳履歴ハンドラーの初期化
+    history_handler = TranslationHistory(metrics=metrics, endpoint=endpoint)
+
+    # 翻訳キャッシュの初期化（新規作成時は過去の翻訳履歴を取り込む）
+    cache = None
+    if params.get('cache_file'):
+        cache = TranslationCache(cache_file=params['cache_file'],
+                                 max_entries=params['cache_max_entries'],
+                                 endpoint=endpoint)
+        if len(cache) == 0:
+            imported = cache.import_history(history_handler.iter_entries())
+            if imported:
+                print(f"翻訳履歴から{imported}件をキャッシュに取り込みました。")
+
+    # DeepL翻訳クライアントの初期化（APIキーをパラメータから取得）
+    # レート制限は全ワーカーで共有し、429受信時はまとめて待機する
+    rate_limiter = RateLimiter(max_rps=max_rps)
+    # 接続プールは同時に送信するリクエスト数以上を確保する
+    clients = [DeepLTranslator(api_key=api_key,
+                               rate_limiter=rate_limiter, cache=cache,
+                               pool_size=max(params.get('pool_size') or 0, params['workers']),
+                               connect_timeout=params['connect_timeout'],
+                               read_timeout=params['read_timeout'],
+                               use_gzip=params['use_gzip'],
+                               api_url=params.get('api_url'),
+                               metrics=metrics,
+                               max_request_bytes=params['request_bytes'])
+               for api_key in api_keys]
+    planner = QuotaPlanner(clients)
+    # 翻訳処理はTranslationBackendのインターフェースのみに依存する
+    translator: TranslationBackend = clients[0] if len(clients) == 1 else MultiKeyTranslator(clients, planner)
+    # 目標サイズを超えるセルは文単位に分割して送信し、翻訳後に結合する
+    translator = RequestSizer(translator, cache=cache, max_bytes=params['request_bytes'], metrics=metrics)
+    scheduler = TranslationScheduler(translator, workers=params['workers'])
+    return history_handler, cache, translator, scheduler, metrics, planner
+
+
+def get_column_targets(params: TranslationParams) -> List[Tuple[int, int, str]]:
+    """
+    翻訳先列ごとの (翻訳元列, 翻訳先列, 翻訳先言語) の一覧
+
+    翻訳先列は翻訳先言語ごとに、翻訳元列と同じ順に並べて指定する
+    （例: 翻訳元 A-B、翻訳先言語 JA,EN-US の場合、C-D が JA、E-F が EN-US）。
+    """
+    source_cols = params['source_cols']
+    target_langs = params.get('target_langs') or ["JA"]
+    return [(source_cols[i % len(source_cols)], dest_col, target_langs[i // len(source_cols)])
+            for i, dest_col in enumerate(params['target_cols'])]
+
+
+def apply_quota_plan(sheet_cells: Dict[str, Dict[str, Dict[str, List[Tuple[int, int, int, str]]]]],
+                     params: TranslationParams, planner: QuotaPlanner, cache, usage: UsageCounter) -> int:
+    """
+    翻訳に必要な文字数を残りの文字数と比較し、方針に従って翻訳対象を決める
+
+    常駐モードで同時に実行される他のジョブと文字数を取り合わないよう、
+    翻訳する分の文字数を予約する（予約は消費した分だけ減り、translate_fileの終了時に解除される）。
+
+    Args:
+        sheet_cells (Dict): シート名・翻訳先言語ごとの、正規化した原文をキーとするセルの一覧
+            （truncate時は直接削減する）
+        params (TranslationParams): 実行パラメータ
+        planner (QuotaPlanner): 文字数の計画
+        cache: 翻訳キャッシュ
+        usage (UsageCounter): この翻訳の使用量
+
+    Returns:
+        int: 文字数が不足するため翻訳しないセル数
+    """
+    if params['quota_policy'] == POLICY_OFF:
+        return 0
+
+    # キャッシュがある場合、他のシートと同じ原文は2回目以降キャッシュから取得される
+    # 複数の翻訳先言語は行の順に並べ、truncate時に先頭の行の全言語が揃うようにする
+    requests: List[Tuple[str, str]] = []
+    seen = set()
+    for cells_by_lang in sheet_cells.values():
+        # 原文は最初に現れるセルの位置の順に並べる（言語ごとのセルは行の順に収集されている）
+        first_cells: Dict[str, Tuple[int, int]] = {}
+        for cells_by_text in cells_by_lang.values():
+            for text, cells in cells_by_text.items():
+                position = (cells[0][0], cells[0][1])
+                if text not in first_cells or position < first_cells[text]:
+                    first_cells[text] = position
+        for text in sorted(first_cells, key=first_cells.get):
+            for target_lang, cells_by_text in cells_by_lang.items():
+                if text not in cells_by_text:
+                    continue
+                if cache is not None:
+                    if (target_lang, text) in seen:
+                        continue
+                    seen.add((target_lang, text))
+                requests.append((target_lang, text))
+
+    # 残りの文字数の取得から予約までの間に、他のジョブが同じ文字数を計画しないようにする
+    with planner.planning_lock:
+        if not planner.refresh():
+            return 0
+        required, selected, selected_characters = planner.plan(requests, cache)
+        remaining = planner.remaining()
+        planner.reserve(selected_characters, usage)
+    print(f"必要な文字数: {required}文字 / 残りの文字数: {remaining}文字")
+    if len(selected) == len(requests):
+        return 0
+    if params['quota_policy'] == POLICY_REFUSE:
+        raise Exception(f"翻訳に必要な文字数（{required}文字）が残りの文字数（{remaining}文字）を超えています。"
+                        "--quota-policy truncate を指定すると、先頭の行から残りの文字数に収まる範囲を翻訳します。")
+
+    # 行の順に残りの文字数に収まる原文だけを残す
+    selected_requests = set(selected)
+    skipped = 0
+    for cells_by_lang in sheet_cells.values():
+        for target_lang, cells_by_text in cells_by_lang.items():
+            for text in list(cells_by_text):
+                if (target_lang, text) not in selected_requests:
+                    skipped += len(cells_by_text.pop(text))
+    print(f"警告: 残りの文字数が不足しているため、{skipped}セルは翻訳しません。"
+          "文字数の上限が更新された後に --resume を指定して再実行すると、残りのセルを翻訳できます。")
+    return skipped
+
+
+def get_sheet_names(excel_handler: ExcelHandler, params: TranslationParams) -> List[str]:
+    """対象シートの決定（指定がない場合はアクティブシートのみ）"""
+    sheets = params.get('sheets')
+    if not sheets:
+        return [excel_handler.get_sheet_name()]
+    if sheets == ['*']:
+        return excel_handler.get_sheet_names()
+    return sheets
+
+
+def create_checkpoint(input_path: str, output_path: str, sheet_names: List[str],
+                      params: TranslationParams) -> Checkpoint:
+    """実行条件を記録したチェックポイントを作成"""
+    return Checkpoint(
+        output_path=output_path,
+        signature={
+            'input_path': os.path.abspath(input_path),
+            'sheets': sheet_names,
+            'source_cols': params['source_cols'],
+            'target_cols': params['target_cols'],
+            'target_langs': params.get('target_langs') or ["JA"],
+            'row_range': list(params['row_range'])
+        },
+        interval=params['checkpoint_interval']
+    )
+
+
+def translate_file(input_path: str, output_path: str, params: TranslationParams,
+                   services: Tuple[Any, ...], show_progress: bool = True) -> Dict:
+    """
+    1つのワークブックを翻訳して保存
+
+    翻訳クライアント・キャッシュは常駐モードの同時に実行されるジョブと共有されるため、
+    文字数とキャッシュのヒット数はこのファイルの翻訳に紐付けた集計先（UsageCounter）で数える。
+
+    Args:
+        input_path (str): 入力ファイルのパス
+        output_path (str): 出力ファイルのパス
+        params (TranslationParams): 実行パラメータ
+        services (Tuple[Any, ...]): create_servicesで作成したサービス
+        show_progress (bool): 進捗を表示するかどうか
+
+    Returns:
+        Dict: ファイルごとの処理結果の概要
+    """
+    planner = services[5]
+    usage = UsageCounter()
     try:
-        # CLIインターフェースの初期化
-        cli = CLIInterface()
-        params = cli.get_parameters()
+        with usage.activate():
+            return _translate_file(input_path, output_path, params, services, show_progress, usage)
+    finally:
+        planner.release(usage)
+
+
+def _translate_file(input_path: str, output_path: str, params: TranslationParams,
+                    services: Tuple[Any, ...], show_progress: bool, usage: UsageCounter) -> Dict:
+    """translate_fileの本体（使用量はusageに集計される）"""
+    history_handler, cache, _, scheduler, metrics, planner = services
+    start_time = time.time()
+
+    # 処理段階ごとの所要時間（秒）
+    timings = {'load': 0.0, 'extract': 0.0, 'translate': 0.0, 'save': 0.0}
+
+    # ハンドラーの初期化（CSV/TSV・Parquetは拡張子で判定）
+    stage_start = time.perf_counter()
+    excel_handler = open_handler(
+        input_path=input_path,
+        output_path=output_path,
+        mode=params['excel_mode']
+    )
+    timings['load'] = time.perf_counter() - stage_start
+
+    sheet_names = get_sheet_names(excel_handler, params)
+
+    # チェックポイントの初期化（--resume指定時は翻訳済みのセルを復元）
+    checkpoint = create_checkpoint(input_path, output_path, sheet_names, params)
+    restored: Dict[Tuple[str, int, int], str] = {}
+    if params.get('resume') and checkpoint.exists():
+        restored = checkpoint.load()
+        print(f"チェックポイントから{len(restored)}セルを復元しました。")
+    else:
+        if params.get('resume'):
+            print("チェックポイントが見つからないため、最初から翻訳します。")
+        checkpoint.remove()
+
+    # 差分翻訳では、前回の出力から原文が変わっていないセルの翻訳を引き継ぐ
+    manifest: Optional[SourceManifest] = None
+    previous: Dict[str, Dict[Tuple[int, int], str]] = {}
+    if params.get('incremental'):
+        manifest = SourceManifest(output_path, input_path, params.get('target_langs'))
+        if manifest.load() and os.path.exists(output_path):
+            previous = load_previous_translations(output_path, sheet_names, params, manifest)
+
+    # 数値・数式・URLなど翻訳の必要がないセルは原文のまま出力する
+    skip_filter = SkipFilter(params['skip_rules'], params.get('skip_patterns'))
+
+    # 全シートの翻訳対象のセルを先に収集し、必要な文字数を確認してから翻訳する
+    # 翻訳元列は1回だけ読み込み、全ての翻訳先言語で共有する
+    stage_start = time.perf_counter()
+    sheet_cells = {}
+    unchanged_cells = 0
+    skipped_cells: Dict[str, int] = {}
+    for sheet_name in sheet_names:
+        excel_handler.select_sheet(sheet_name)
+        sheet_cells[sheet_name], stats = collect_cells(excel_handler, params, checkpoint, skip_filter,
+                                                       manifest, previous.pop(sheet_name, None))
+        unchanged_cells += stats['unchanged']
+        for rule, count in stats['skipped'].items():
+            skipped_cells[rule] = skipped_cells.get(rule, 0) + count
+    timings['extract'] = time.perf_counter() - stage_start
+    if manifest is not None:
+        print(f"差分翻訳: 原文が変わっていない{unchanged_cells}セルの翻訳を前回の出力から引き継ぎました。")
+    for rule, count in skipped_cells.items():
+        metrics.increment('cells_skipped_total', count, {'rule': rule})
+
+    summary = {
+        'input_path': input_path,
+        'output_path': output_path,
+        'sheets': sheet_names,
+        'target_langs': params.get('target_langs') or ["JA"],
+        'cells': 0,
+        'translatable_cells': 0,
+        'unique_texts': 0,
+        'failed_cells': 0,
+        'unchanged_cells': unchanged_cells,
+        'skipped_cells': skipped_cells,
+        'quota_skipped_cells': apply_quota_plan(sheet_cells, params, planner, cache, usage)
+    }
+    for sheet_name in sheet_names:
+        excel_handler.select_sheet(sheet_name)
+        for (restored_sheet, row, col), value in restored.items():
+            if restored_sheet == sheet_name:
+                excel_handler.set_cell_value(row, col, value)
+
+        sheet_summary = translate_sheet(excel_handler, params, sheet_cells.pop(sheet_name), scheduler,
+                                        history_handler, checkpoint, manifest, show_progress, metrics)
+        for key in ('cells', 'translatable_cells', 'unique_texts', 'failed_cells'):
+            summary[key] += sheet_summary[key]
+        timings['translate'] += sheet_summary['timings']['translate']
+
+    # 保存（保存が完了したらチェックポイントは不要）
+    # 文字数の不足や拒否により翻訳しなかったセルが残る場合は、--resume で残りのセルだけを
+    # 翻訳できるようにチェックポイントを残す
+    stage_start = time.perf_counter()
+    history_handler.flush()
+    checkpoint.save()
+    excel_handler.save()
+    if summary['quota_skipped_cells'] or summary['failed_cells']:
+        checkpoint.close()
+    else:
+        checkpoint.remove()
+    if manifest is not None:
+        manifest.save()
+    timings['save'] = time.perf_counter() - stage_start
+
+    summary['elapsed'] = time.time() - start_time
+    summary['timings'] = timings
+    summary['characters_billed'] = usage.characters_billed
+    metrics.increment('characters_billed_total', summary['characters_billed'])
+    for stage, seconds in timings.items():
+        metrics.observe('stage_seconds', seconds, {'stage': stage})
+    metrics.increment('cells_translated_total', summary['translatable_cells'] - summary['failed_cells'])
+    metrics.increment('cells_failed_total', summary['failed_cells'])
+    if os.path.exists(output_path):
+        metrics.increment('output_bytes_written_total', os.path.getsize(output_path))
+    if cache is not None:
+        summary['cache_hits'] = usage.cache_hits
+        summary['cache_misses'] = usage.cache_misses
+        metrics.increment('cache_hits_total', summary['cache_hits'])
+        metrics.increment('cache_misses_total', summary['cache_misses'])
+    return summary
+
+
+def load_previous_translations(output_path: str, sheet_names: List[str], params: TranslationParams,
+                               manifest: SourceManifest) -> Dict[str, Dict[Tuple[int, int], str]]:
+    """
+    前回の出力ファイルから翻訳先列の値を読み込む
+
+    Args:
+        output_path (str): 前回の出力ファイルのパス
+        sheet_names (List[str]): 対象のシート名
+        params (TranslationParams): 実行パラメータ
+        manifest (SourceManifest): 前回の実行のマニフェスト
+
+    Returns:
+        Dict[str, Dict[Tuple[int, int], str]]: シート名ごとの (行, 翻訳先列) をキーとする翻訳
+    """
+    previous: Dict[str, Dict[Tuple[int, int], str]] = {}
+    # 前回の出力は値だけを読めばよいため、書式を保持せずに読み込む
+    try:
+        handler = open_handler(output_path, mode=MODE_STREAMING)
+    except Exception as e:
+        print(f"警告: 前回の出力ファイルを読み込めませんでした: {str(e)}")
+        return previous
+    row_start, row_end = params['row_range']
+    try:
+        for sheet_name in sheet_names:
+            if not manifest.has_sheet(sheet_name) or sheet_name not in handler.get_sheet_names():
+                continue
+            handler.select_sheet(sheet_name)
+            values_by_cell: Dict[Tuple[int, int], str] = {}
+            columns = handler.get_column_values(params['target_cols'], row_start, row_end)
+            for dest_col, values in columns.items():
+                for row, value in enumerate(values, start=row_start):
+                    if value:
+                        values_by_cell[(row, dest_col)] = value
+            previous[sheet_name] = values_by_cell
+    finally:
+        handler.close()
+    return previous
+
+
+def collect_cells(excel_handler: ExcelHandler, params: TranslationParams, checkpoint: Checkpoint,
+                  skip_filter: Optional[SkipFilter] = None,
+                  manifest: Optional[SourceManifest] = None,
+                  previous: Optional[Dict[Tuple[int, int], str]] = None
+                  ) -> Tuple[Dict[str, Dict[str, List[Tuple[int, int, int, str]]]], Dict]:
+    """
+    選択中のシートから翻訳対象のセルを収集し、翻訳先言語・正規化した原文ごとにまとめる（重複排除）
+
+    Args:
+        excel_handler (ExcelHandler): 翻訳するシートを選択済みのハンドラー
+        params (TranslationParams): 実行パラメータ
+        checkpoint (Checkpoint): チェックポイント（翻訳済みのセルは対象外）
+        skip_filter (Optional[SkipFilter]): 翻訳対象外の判定（対象外のセルは原文のまま出力）
+        manifest (Optional[SourceManifest]): 差分翻訳のマニフェスト
+        previous (Optional[Dict[Tuple[int, int], str]]): 前回の出力の (行, 翻訳先列) ごとの翻訳
+
+    Returns:
+        Tuple[Dict[str, Dict[str, List[Tuple[int, int, int, str]]]], Dict]:
+            翻訳先言語・原文ごとの (行, 翻訳元列, 翻訳先列, 原文) のリストと、
+            前回の翻訳を引き継いだセル数（unchanged）・判定ルールごとの翻訳対象外のセル数（skipped）
+    """
+    sheet_name = excel_handler.get_sheet_name()
+    row_start, row_end = params['row_range']
+    previous = previous or {}
+
+    # 指定列・行範囲は1回の走査で列ごとのリストとしてまとめて読み込み、行の順に処理する
+    column_targets = get_column_targets(params)
+    cells_by_lang: Dict[str, Dict[str, List[Tuple[int, int, int, str]]]] = {
+        target_lang: {} for _, _, target_lang in column_targets
+    }
+    # 翻訳元列ごとに、書き込む全ての翻訳先列（言語ごと）を並べる
+    targets_by_source: Dict[int, List[Tuple[int, str]]] = {}
+    for src_col, dest_col, target_lang in column_targets:
+        targets_by_source.setdefault(src_col, []).append((dest_col, target_lang))
+    source_cols = list(targets_by_source)
+    # 原文のまま出力するセルは数値・日付の型を保つため、文字列に変換せずに読み込む
+    columns = excel_handler.get_column_values(source_cols, row_start, row_end, raw=True)
+    # 前回の翻訳や原文のまま出力する値（翻訳先列ごと、列単位で書き込む）
+    carried: Dict[int, List[Any]] = {}
+    unchanged = 0
+    skipped: Dict[str, int] = {}
+    # 判定は原文・翻訳先言語ごとに1回だけ行う
+    skip_rules: Dict[Tuple[str, str], Optional[str]] = {}
+    rows = zip(*(columns[src_col] for src_col in source_cols))
+    for offset, values in enumerate(rows):
+        row = row_start + offset
+        for src_col, value in zip(source_cols, values):
+            source_text = str(value) if value is not None else ""
+            key = normalize_text(source_text)
+            if not key:
+                continue
+            digest = SourceManifest.hash_text(key) if manifest is not None else None
+            for dest_col, target_lang in targets_by_source[src_col]:
+                if skip_filter is not None:
+                    if (key, target_lang) not in skip_rules:
+                        skip_rules[(key, target_lang)] = skip_filter.classify(key, target_lang)
+                    rule = skip_rules[(key, target_lang)]
+                    if rule is not None:
+                        if dest_col not in carried:
+                            carried[dest_col] = [None] * (row_end - row_start + 1)
+                        carried[dest_col][offset] = value if isinstance(value, _TYPED_VALUES) else source_text
+                        skipped[rule] = skipped.get(rule, 0) + 1
+                        continue
+                if checkpoint.is_completed(sheet_name, row, dest_col):
+                    if manifest is not None:
+                        manifest.record(sheet_name, row, src_col, dest_col, digest)
+                    continue
+                if (row, dest_col) in previous and manifest.is_unchanged(sheet_name, row, src_col, dest_col, digest):
+                    # 原文が変わっていないセルは前回の翻訳をそのまま書き込む
+                    if dest_col not in carried:
+                        carried[dest_col] = [None] * (row_end - row_start + 1)
+                    carried[dest_col][offset] = previous[(row, dest_col)]
+                    manifest.record(sheet_name, row, src_col, dest_col, digest)
+                    unchanged += 1
+                    continue
+                cells_by_lang[target_lang].setdefault(key, []).append((row, src_col, dest_col, source_text))
 
-        # バッチモードの場合は進捗表示を簡略化
-        is_batch_mode = params['batch_mode']
+    for dest_col, values in carried.items():
+        excel_handler.set_column_values(dest_col, row_start, values)
+    return cells_by_lang, {'unchanged': unchanged, 'skipped': skipped}
 
-        # Excelハンドラーの初期化
-        excel_handler = ExcelHandler(
-            input_path=str(params['input_path']),
-            output_path=str(params['output_path'])
-        )
 
-        # DeepL翻訳クライアントの初期化（APIキーをパラメータから取得）
-        translator = DeepLTranslator(api_key=params.get('api_key'))
+def translate_sheet(excel_handler: ExcelHandler, params: TranslationParams,
+                    cells_by_lang: Dict[str, Dict[str, List[Tuple[int, int, int, str]]]],
+                    scheduler: TranslationScheduler, history_handler: TranslationHistory,
+                    checkpoint: Checkpoint, manifest: Optional[SourceManifest] = None,
+                    show_progress: bool = True, metrics: Optional[Metrics] = None) -> Dict:
+    """
+    選択中のシートの収集済みのセルを翻訳
 
-        # 翻訳履歴ハンドラーの初期化
-        history_handler = TranslationHistory()
+    並行に処理するのは翻訳・書き戻し・履歴の記録のみで、抽出（collect_cells）は
+    翻訳の開始前に完了している。翻訳結果はリクエストごとに完了した時点でワークブックへ
+    書き込み、書き込んだ原文はcells_by_langから取り除く（シートの終わりまで保持しない）。
+
+    Args:
+        excel_handler (ExcelHandler): 翻訳するシートを選択済みのハンドラー
+        params (TranslationParams): 実行パラメータ
+        cells_by_lang (Dict[str, Dict[str, List[Tuple[int, int, int, str]]]]): collect_cellsで収集したセル
+            （書き戻した原文は取り除かれる）
+        scheduler (TranslationScheduler): 翻訳スケジューラ
+        history_handler (TranslationHistory): 翻訳履歴
+        checkpoint (Checkpoint): チェックポイント
+        manifest (Optional[SourceManifest]): 差分翻訳のマニフェスト（翻訳したセルを記録）
+        show_progress (bool): 進捗を表示するかどうか（標準エラー出力が端末の場合のみ）
+        metrics (Optional[Metrics]): パイプラインの待機時間の集計先
+
+    Returns:
+        Dict: セル数・翻訳対象セル数・ユニークな原文数・翻訳できなかったセル数・翻訳の所要時間
+    """
+    sheet_name = excel_handler.get_sheet_name()
+    excel_file = os.path.basename(excel_handler.input_path)
+
+    # 翻訳処理の実行
+    row_start, row_end = params['row_range']
+    total_rows = row_end - row_start + 1
+    total_cols = len(params['target_cols'])
+    total_cells = total_rows * total_cols
+
+    translatable_cells = sum(len(cells) for cells_by_text in cells_by_lang.values()
+                             for cells in cells_by_text.values())
+    # セルのアドレスは列名を一度だけ変換して組み立てる
+    column_letters = {col: number_to_excel_column(col)
+                      for col in set(params['source_cols']) | set(params['target_cols'])}
+
+    # 翻訳先言語ごとにユニークな原文のみを目標のリクエストサイズまでまとめてジョブにする
+    # 全ての言語のジョブを交互に並べ、言語をまたいで並行に送信する
+    lang_jobs = [
+        [((target_lang, batch_texts), batch_texts, target_lang)
+         for batch_texts in pack_jobs(list(cells_by_text), params['request_bytes'])]
+        for target_lang, cells_by_text in cells_by_lang.items()
+    ]
+    jobs = [job for group in zip_longest(*lang_jobs) for job in group if job is not None]
+    unique_texts = sum(len(cells_by_text) for cells_by_text in cells_by_lang.values())
+
+    # 翻訳できなかった（リクエストが拒否された）セル数（書き戻しのスレッドのみが更新する）
+    failed = {'cells': 0}
+
+    def write_back(item: Tuple[str, List[str], List[Optional[str]]]) -> None:
+        """翻訳結果を同じ原文の全セルへ書き戻し、チェックポイントに記録する"""
+        target_lang, batch_texts, translations = item
+        entries = []
+        for text, translated in zip(batch_texts, translations):
+            # 書き戻した原文のセルの一覧は不要になるため取り除く
+            # （翻訳のスレッドが参照するのは未送信のリクエストの原文のみ）
+            cells = cells_by_lang[target_lang].pop(text)
+            if translated is None:
+                failed['cells'] += len(cells)
+                continue
+            digest = SourceManifest.hash_text(text) if manifest is not None else None
+            for row, src_col, dest_col, source_text in cells:
+                if manifest is not None:
+                    manifest.record(sheet_name, row, src_col, dest_col, digest)
+                excel_handler.set_cell_value(row, dest_col, translated)
+                checkpoint.record(sheet_name, row, dest_col, translated)
+                entries.append((source_text, translated, src_col, dest_col, row))
+        history_stage.put((target_lang, entries))
+
+    def record_history(item: Tuple[str, List[Tuple[str, str, int, int, int]]]) -> None:
+        """翻訳履歴に追加する"""
+        target_lang, entries = item
+        for source_text, translated, src_col, dest_col, row in entries:
+            history_handler.add_entry(
+                source_text=source_text,
+                translated_text=translated,
+                excel_file=excel_file,
+                sheet_name=sheet_name,
+                source_cell=f"{column_letters[src_col]}{row}",
+                target_cell=f"{column_letters[dest_col]}{row}",
+                target_lang=target_lang
+            )
+
+    # 翻訳 → 書き戻し → 履歴の記録を段階ごとのスレッドで行い、チェックポイントや履歴の
+    # ディスクへの書き込みを待たずに次のリクエストを送信する（キューは有界で、溜まりすぎると待機する）
+    # 翻訳中にワークブックへ書き込むのは書き戻しのスレッドのみで、処理待ちの翻訳結果は
+    # キューの上限までしか溜まらない
+    # 中断された場合はチェックポイントを書き出して再開できるようにする
+    # 進捗は別スレッドが一定間隔で表示する（バッチモードの場合は簡略化）
+    # 空セルと翻訳済みのセル（文字数不足で翻訳しないセルを含む）は処理済みとして数える
+    reporter = ProgressReporter(total_cells, batch_mode=params['batch_mode'],
+                                enabled=None if show_progress else False)
+    reporter.start(processed=total_cells - translatable_cells)
+    history_stage = PipelineStage('history', record_history, metrics=metrics)
+    write_stage = PipelineStage('write_back', write_back, metrics=metrics)
+    stage_start = time.perf_counter()
+    try:
+        for (target_lang, batch_texts), translations in scheduler.run(jobs):
+            cells_by_text = cells_by_lang[target_lang]
+            for text in batch_texts:
+                cells = cells_by_text[text]
+                row, src_col, _, _ = cells[-1]
+                reporter.advance(len(cells), row, src_col)
+            write_stage.put((target_lang, batch_texts, translations))
+        write_stage.close()
+        history_stage.close()
+    except BaseException:
+        reporter.stop()
+        # キューに残っている翻訳結果を記録してからチェックポイントを書き出す
+        for stage in (write_stage, history_stage):
+            try:
+                stage.close()
+            except Exception as e:
+                print(f"警告: 翻訳結果の記録に失敗しました: {str(e)}", file=sys.stderr)
+        checkpoint.save()
+        checkpoint.close()
+        history_handler.flush()
+        # 出力ファイルは保存していないため、翻訳済みのセルはチェックポイントにのみ残る
+        print(f"\n翻訳済みのセルをチェックポイントに保存しました（{checkpoint.cells_file}）。"
+              "--resume を指定して再実行すると続きから再開できます。", file=sys.stderr)
+        raise
+    reporter.stop()
+
+    return {
+        'cells': total_cells,
+        'translatable_cells': translatable_cells,
+        'unique_texts': unique_texts,
+        'failed_cells': failed['cells'],
+        'timings': {'translate': time.perf_counter() - stage_start}
+    }
+
+
+def _init_file_worker(params: TranslationParams, max_rps: Optional[float]) -> None:
+    """ワーカープロセスの初期化（プロセス内の全ファイルでサービスを共有）"""
+    global _worker_services
+    _worker_services = create_services(params, max_rps=max_rps)
+
+
+def _translate_file_in_worker(input_path: str, output_path: str, params: TranslationParams) -> Dict:
+    """ワーカープロセスで1ファイルを翻訳（エラーは概要に記録して返す）"""
+    try:
+        summary = translate_file(input_path, output_path, params, _worker_services, show_progress=False)
+    except Exception as e:
+        summary = {'input_path': input_path, 'output_path': output_path, 'error': str(e)}
+    # 計測値はメインプロセスで合算する
+    summary['metrics'] = _worker_services[4].snapshot(reset=True)
+    return summary
+
+
+def _print_file_summary(summary: Dict) -> None:
+    """ファイルごとの処理結果を1行で表示"""
+    if 'error' in summary:
+        print(f"[失敗] {summary['input_path']}: {summary['error']}")
+        return
+    print(f"[完了] {summary['input_path']} → {summary['output_path']} | "
+          f"シート: {', '.join(summary['sheets'])} | "
+          f"言語: {', '.join(summary['target_langs'])} | "
+          f"翻訳対象: {summary['translatable_cells']}セル（ユニーク {summary['unique_texts']}件） | "
+          + (f"翻訳失敗: {summary['failed_cells']}セル | " if summary.get('failed_cells') else "")
+          + f"{summary['elapsed']:.1f}秒")
+
+
+def run_translation(params: TranslationParams, metrics: Metrics) -> List[Dict]:
+    """
+    全ての入力ファイルを翻訳し、結果の概要を表示
+
+    Args:
+        params (TranslationParams): 実行パラメータ
+        metrics (Metrics): 全プロセスの計測値を合算する集計先
+
+    Returns:
+        List[Dict]: ファイルごとの処理結果の概要
+    """
+    # バッチモードの場合は進捗表示を簡略化
+    is_batch_mode = params['batch_mode']
+    input_files = params['input_files']
+    start_time = time.time()
+
+    if len(input_files) > 1 and params['file_workers'] > 1:
+        # ファイル単位で複数プロセスに分散（レート制限はプロセス数で分割）
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        file_workers = min(params['file_workers'], len(input_files))
+        max_rps = params['max_rps'] / file_workers if params.get('max_rps') else None
+        summaries = []
+        with ProcessPoolExecutor(max_workers=file_workers, initializer=_init_file_worker,
+                                 initargs=(params, max_rps)) as executor:
+            futures = [executor.submit(_translate_file_in_worker, input_path, output_path, params)
+                       for input_path, output_path in input_files]
+            for future in as_completed(futures):
+                summary = future.result()
+                metrics.merge(summary.pop('metrics'))
+                _print_file_summary(summary)
+                summaries.append(summary)
+        history_file = DEFAULT_HISTORY_FILE
+        pool_stats = None
+        remaining_characters = None
+    else:
+        services = create_services(params, max_rps=params.get('max_rps'))
+        history_handler, cache, translator, _, service_metrics, planner = services
+        summaries = []
+        for input_path, output_path in input_files:
+            if len(input_files) == 1:
+                summaries.append(translate_file(input_path, output_path, params, services))
+                continue
+            try:
+                summary = translate_file(input_path, output_path, params, services,
+                                         show_progress=False)
+            except Exception as e:
+                summary = {'input_path': input_path, 'output_path': output_path, 'error': str(e)}
+            _print_file_summary(summary)
+            summaries.append(summary)
+        history_handler.close()
+        history_file = history_handler.history_file
+        if cache is not None:
+            cache.close()
+        # 接続プールの統計はHTTPを使うバックエンドのみ
+        pool_stats = translator.get_pool_stats() if hasattr(translator, 'get_pool_stats') else None
+        remaining_characters = planner.remaining()
+        translator.close()
+        metrics.merge(service_metrics.snapshot())
+
+    print("\n翻訳が完了しました！")
+
+    # 実行時間の表示
+    total_time = time.time() - start_time
+    print(f"処理時間: {total_time:.1f}秒")
+
+    succeeded = [s for s in summaries if 'error' not in s]
+    if len(input_files) > 1:
+        print(f"処理ファイル数: {len(succeeded)}/{len(summaries)}")
+    elif is_batch_mode:
+        # バッチモードでは出力パスを表示
+        print(f"出力ファイル: {summaries[0]['output_path']}")
+
+    # 重複排除の結果を表示
+    translatable_cells = sum(s['translatable_cells'] for s in succeeded)
+    unique_texts = sum(s['unique_texts'] for s in succeeded)
+    if translatable_cells:
+        dedup_ratio = (1 - unique_texts / translatable_cells) * 100
+        print(f"重複排除: 翻訳対象 {translatable_cells}セル → ユニーク {unique_texts}件 "
+              f"(削減率 {dedup_ratio:.1f}%)")
+
+    # 翻訳履歴の保存先を表示
+    print(f"翻訳履歴は {history_file} に保存されました。")
+
+    if params.get('cache_file'):
+        hits = sum(s.get('cache_hits', 0) for s in succeeded)
+        misses = sum(s.get('cache_misses', 0) for s in succeeded)
+        hit_rate = hits / (hits + misses) * 100 if hits + misses else 0.0
+        print(f"キャッシュ: ヒット {hits}件 / ミス {misses}件 (ヒット率 {hit_rate:.1f}%)")
+
+    # 文字数の消費状況を表示
+    characters_billed = sum(s.get('characters_billed', 0) for s in succeeded)
+    print(f"翻訳した文字数: {characters_billed}文字", end='')
+    print(f" / 残りの文字数: {remaining_characters}文字" if remaining_characters is not None else "")
+    # 翻訳対象外として原文のまま出力したセル数を表示
+    skipped_cells: Dict[str, int] = {}
+    for s in succeeded:
+        for rule, count in s.get('skipped_cells', {}).items():
+            skipped_cells[rule] = skipped_cells.get(rule, 0) + count
+    if skipped_cells:
+        details = ", ".join(f"{rule} {count}" for rule, count in sorted(skipped_cells.items()))
+        print(f"翻訳対象外（原文のまま出力）: {sum(skipped_cells.values())}セル ({details})")
+
+    quota_skipped = sum(s.get('quota_skipped_cells', 0) for s in succeeded)
+    if quota_skipped:
+        print(f"文字数の不足により翻訳しなかったセル: {quota_skipped}セル")
+
+    failed_cells = sum(s.get('failed_cells', 0) for s in succeeded)
+    if failed_cells:
+        print(f"警告: {failed_cells}セルを翻訳できませんでした（翻訳先のセルは空のままです）。"
+              "--resume を指定して再実行すると、翻訳できなかったセルのみを翻訳します。")
+
+    if pool_stats is not None:
+        print(f"HTTP接続: リクエスト {pool_stats['requests']}件 / 新規接続 {pool_stats['new_connections']}件 "
+              f"/ 再利用 {pool_stats['reused_connections']}件")
+
+    metrics.increment('run_seconds_total', total_time)
+    return summaries
+
+
+def plan_file(input_path: str, output_path: str, params: TranslationParams) -> Dict:
+    """
+    翻訳せずに、1つのワークブックの翻訳対象のセル数・文字数を数える
+
+    翻訳クライアント・キャッシュ・翻訳履歴は作成せず、APIも呼び出さない。
+    --resume・--incremental 指定時はチェックポイント・前回の出力を読み込んで対象から除く。
+
+    Args:
+        input_path (str): 入力ファイルのパス
+        output_path (str): 出力ファイルのパス
+        params (TranslationParams): 実行パラメータ
+
+    Returns:
+        Dict: ファイルごとの翻訳対象の概要
+    """
+    # 値を読むだけのため、書式を保持せずに読み込む
+    excel_handler = open_handler(input_path, output_path, mode=MODE_STREAMING)
+    try:
+        sheet_names = get_sheet_names(excel_handler, params)
+        checkpoint = create_checkpoint(input_path, output_path, sheet_names, params)
+        restored_cells = 0
+        if params.get('resume') and checkpoint.exists():
+            restored_cells = len(checkpoint.load())
+
+        manifest: Optional[SourceManifest] = None
+        previous: Dict[str, Dict[Tuple[int, int], str]] = {}
+        if params.get('incremental'):
+            manifest = SourceManifest(output_path, input_path, params.get('target_langs'))
+            if manifest.load() and os.path.exists(output_path):
+                previous = load_previous_translations(output_path, sheet_names, params, manifest)
+        skip_filter = SkipFilter(params['skip_rules'], params.get('skip_patterns'))
 
-        # 翻訳処理の実行
         row_start, row_end = params['row_range']
-        total_rows = row_end - row_start + 1
-        total_cols = len(params['source_cols'])
-        processed = 0
-        total_cells = total_rows * total_cols
-        start_time = time.time()
-
-        for src_col, dest_col in zip(params['source_cols'], params['target_cols']):
-            for row in range(row_start, row_end + 1):
-                # 進捗表示の更新
-                processed += 1
-                progress = (processed / total_cells) * 100
-                current_cell = excel_handler.get_cell_address(row, src_col)
-
-                if is_batch_mode:
-                    # バッチモードでは簡略化された進捗表示
-                    print(f"\r進捗: {progress:.1f}% | セル: {current_cell}", end='', file=sys.stderr)
-                else:
-                    # 対話モードでは詳細な進捗表示
-                    progress_bar = format_progress_bar(
-                        progress=progress,
-                        current_cell=current_cell,
-                        start_time=start_time,
-                        total_cells=total_cells,
-                        processed_cells=processed
-                    )
-                    print(f"\r{progress_bar}", end='', file=sys.stderr)
-
-                # セルの翻訳
-                source_text = excel_handler.get_cell_value(row, src_col)
-                if source_text:
-                    translated = translator.translate(source_text)
-                    if translated is not None:
-                        # 翻訳結果をセルに設定
-                        excel_handler.set_cell_value(row, dest_col, translated)
-
-                        # 翻訳履歴に追加
-                        history_handler.add_entry(
-                            source_text=source_text,
-                            translated_text=translated,
-                            excel_file=os.path.basename(params['input_path']),
-                            sheet_name=excel_handler.get_sheet_name(),
-                            source_cell=excel_handler.get_cell_address(row, src_col),
-                            target_cell=excel_handler.get_cell_address(row, dest_col)
-                        )
-
-        # 保存
-        excel_handler.save()
-        print("\n翻訳が完了しました！")
-
-        # 実行時間の表示
-        total_time = time.time() - start_time
-        print(f"処理時間: {total_time:.1f}秒")
-
-        if is_batch_mode:
-            # バッチモードでは出力パスを表示
-            print(f"出力ファイル: {params['output_path']}")
-
-        # 翻訳履歴の保存先を表示
-        print(f"翻訳履歴は {history_handler.history_file} に保存されました。")
+        summary = {
+            'input_path': input_path,
+            'output_path': output_path,
+            'sheets': sheet_names,
+            'target_langs': params.get('target_langs') or ["JA"],
+            'cells': (row_end - row_start + 1) * len(params['target_cols']) * len(sheet_names),
+            'translatable_cells': 0,
+            'unique_texts': 0,
+            'characters': {},
+            'restored_cells': restored_cells,
+            'unchanged_cells': 0,
+            'skipped_cells': {}
+        }
+        for sheet_name in sheet_names:
+            excel_handler.select_sheet(sheet_name)
+            cells_by_lang, stats = collect_cells(excel_handler, params, checkpoint, skip_filter,
+                                                 manifest, previous.pop(sheet_name, None))
+            summary['unchanged_cells'] += stats['unchanged']
+            for rule, count in stats['skipped'].items():
+                summary['skipped_cells'][rule] = summary['skipped_cells'].get(rule, 0) + count
+            # 翻訳先言語ごとにユニークな原文の文字数を数える（キャッシュによる削減は考慮しない）
+            for target_lang, cells_by_text in cells_by_lang.items():
+                summary['translatable_cells'] += sum(len(cells) for cells in cells_by_text.values())
+                summary['unique_texts'] += len(cells_by_text)
+                summary['characters'][target_lang] = (summary['characters'].get(target_lang, 0)
+                                                      + sum(len(text) for text in cells_by_text))
+    finally:
+        excel_handler.close()
+    return summary
+
+
+def run_dry_run(params: TranslationParams) -> List[Dict]:
+    """
+    全ての入力ファイルの翻訳対象を数えて表示（翻訳・保存は行わない）
+
+    Args:
+        params (TranslationParams): 実行パラメータ
+
+    Returns:
+        List[Dict]: ファイルごとの翻訳対象の概要
+    """
+    summaries = []
+    for input_path, output_path in params['input_files']:
+        try:
+            summary = plan_file(input_path, output_path, params)
+        except Exception as e:
+            summary = {'input_path': input_path, 'output_path': output_path, 'error': str(e)}
+            print(f"[失敗] {input_path}: {summary['error']}")
+            summaries.append(summary)
+            continue
+        characters = ", ".join(f"{lang} {count}" for lang, count in summary['characters'].items())
+        print(f"[確認] {input_path} → {output_path} | "
+              f"シート: {', '.join(summary['sheets'])} | "
+              f"翻訳対象: {summary['translatable_cells']}セル（ユニーク {summary['unique_texts']}件） | "
+              f"文字数: {sum(summary['characters'].values())}文字 ({characters})")
+        summaries.append(summary)
+
+    succeeded = [s for s in summaries if 'error' not in s]
+    print("\n確認のみ（--dry-run）: 翻訳・保存は行いませんでした。")
+    print(f"対象ファイル数: {len(succeeded)}/{len(summaries)}")
+    print(f"翻訳対象: {sum(s['translatable_cells'] for s in succeeded)}セル"
+          f"（ユニーク {sum(s['unique_texts'] for s in succeeded)}件）")
+    print(f"翻訳に必要な文字数（キャッシュによる削減を含まない）: "
+          f"{sum(sum(s['characters'].values()) for s in succeeded)}文字")
+    restored = sum(s['restored_cells'] for s in succeeded)
+    if restored:
+        print(f"チェックポイントから復元するセル: {restored}セル")
+    if params.get('incremental'):
+        print(f"差分翻訳で前回の出力から引き継ぐセル: {sum(s['unchanged_cells'] for s in succeeded)}セル")
+    skipped = sum(sum(s['skipped_cells'].values()) for s in succeeded)
+    if skipped:
+        print(f"翻訳対象外（原文のまま出力）: {skipped}セル")
+    return summaries
+
+
+def main() -> List[Dict]:
+    """
+    翻訳ツールのエントリーポイント
+
+    Returns:
+        List[Dict]: ファイルごとの処理結果の概要
+    """
+    try:
+        # CLIインターフェースの初期化
+        cli = CLIInterface()
+        if sys.argv[1:2] == ['history']:
+            # 翻訳履歴の検索・書き出し・圧縮
+            from history_command import run_history_command
+            run_history_command(cli.parse_history_args(sys.argv[2:]))
+            return []
+        params = cli.get_parameters()
+        metrics = Metrics()
+
+        if params.get('serve'):
+            # 常駐モード（ジョブはHTTPで受け付ける）
+            from translation_daemon import serve
+            serve(params, metrics)
+            summaries = []
+        elif params.get('dry_run'):
+            # 翻訳対象のセル数・文字数の確認のみ（翻訳クライアントは作成しない）
+            summaries = run_dry_run(params)
+        elif params.get('profile_out'):
+            # cProfileで実行し、統計をファイルへ保存して上位の関数を表示
+            import cProfile
+            import pstats
+            # （--file-workers指定時のワーカープロセスは対象外）
+            profiler = cProfile.Profile()
+            try:
+                summaries = profiler.runcall(run_translation, params, metrics)
+            finally:
+                profiler.dump_stats(params['profile_out'])
+                print(f"\nプロファイル結果を {params['profile_out']} に保存しました（累積時間の上位20件）:")
+                pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(20)
+        else:
+            summaries = run_translation(params, metrics)
+
+        if params.get('metrics_out'):
+            metrics.write(params['metrics_out'])
+            print(f"計測結果を {params['metrics_out']} に保存しました。")
+
+        # 翻訳できなかったセルがある場合も失敗として終了する
+        if any('error' in s or s.get('failed_cells') for s in summaries):
+            sys.exit(1)
+        return summaries
 
     except KeyboardInterrupt:
         print("\n処理が中断されました。")
@@ -102,4 +922,4 @@ def main() -> None:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,25 @@
+"""
+翻訳バックエンドのインターフェース定義モジュール
+"""
+from typing import Dict, List, Optional, Protocol
+
+
+class TranslationBackend(Protocol):
+    """翻訳処理が依存する翻訳バックエンドのインターフェース"""
+
+    def translate(self, text: str, target_lang: str = "JA", max_retries: int = 3) -> Optional[str]:
+        """テキストを翻訳"""
+        ...
+
+    def translate_batch(self, texts: List[str], target_lang: str = "JA",
+                        max_retries: int = 3) -> List[Optional[str]]:
+        """複数のテキストをまとめて翻訳（結果は入力と同じ順序）"""
+        ...
+
+    def get_usage(self) -> Dict[str, int]:
+        """文字数の使用状況（character_count / character_limit）を取得"""
+        ...
+
+    def close(self) -> None:
+        """バックエンドが保持する接続などを解放"""
+        ...
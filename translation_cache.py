@@ -0,0 +1,231 @@
+"""
+翻訳メモリ（キャッシュ）を管理するモジュール
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from usage_counter import record_usage
+
+_CREATE_TABLE = (
+    "CREATE TABLE translations ("
+    "source_text TEXT NOT NULL, "
+    "target_lang TEXT NOT NULL, "
+    "endpoint TEXT NOT NULL DEFAULT '', "
+    "translated_text TEXT NOT NULL, "
+    "last_used REAL NOT NULL, "
+    "PRIMARY KEY (source_text, target_lang, endpoint))"
+)
+
+
+def is_mock_translation(source_text: str, translated_text: str, target_lang: str) -> bool:
+    """モックサーバー（mock_deepl_server.py）が返す "[翻訳先言語] 原文" 形式の翻訳かを判定"""
+    return translated_text == f"[{target_lang}] {source_text}"
+
+
+class TranslationCache:
+    """(原文, 翻訳先言語, 翻訳元) をキーとするSQLite永続キャッシュ（メモリ上のLRU付き）"""
+
+    def __init__(self,
+                 cache_file: str = "translation_cache.db",
+                 max_entries: int = 1_000_000,
+                 memory_entries: int = 10_000,
+                 endpoint: str = ""):
+        """
+        翻訳キャッシュの初期化
+
+        翻訳はAPIのベースURLごとに区別して保存し、モックサーバーなどに向けた実行の
+        翻訳を、DeepL APIに向けた実行でキャッシュから返さないようにする。
+
+        Args:
+            cache_file (str): キャッシュを保存するSQLiteファイルのパス
+            max_entries (int): 永続キャッシュに保持する最大エントリー数
+            memory_entries (int): メモリ上のLRUに保持する最大エントリー数
+            endpoint (str): 翻訳元の名前（deepl_client.translation_endpoint、DeepL APIの場合は空文字列）
+        """
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.endpoint = endpoint
+
+        self._lru: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # スケジューラのワーカースレッドから共有して使用する
+        # ファイル単位のワーカープロセスからも同じファイルを共有するため、WALモードで開く
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_CREATE_TABLE.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS"))
+        self._migrate()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def _migrate(self) -> None:
+        """翻訳元の列がない旧形式のテーブルを移行"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(translations)")]
+        if 'endpoint' in columns:
+            return
+        # 旧形式では翻訳元を区別していなかったため、DeepL APIの翻訳として移行する
+        # ただし、モックサーバーに向けた実行で保存された翻訳は移行しない
+        self._conn.execute("ALTER TABLE translations RENAME TO translations_old")
+        self._conn.execute(_CREATE_TABLE)
+        self._conn.execute(
+            "INSERT INTO translations (source_text, target_lang, endpoint, translated_text, last_used) "
+            "SELECT source_text, target_lang, '', translated_text, last_used FROM translations_old "
+            "WHERE translated_text != '[' || target_lang || '] ' || source_text"
+        )
+        self._conn.execute("DROP TABLE translations_old")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_many(self, texts: Iterable[str], target_lang: str,
+                 record_stats: bool = True) -> Dict[str, str]:
+        """
+        キャッシュ済みの翻訳をまとめて取得
+
+        Args:
+            texts (Iterable[str]): 原文のリスト
+            target_lang (str): 翻訳先言語
+            record_stats (bool): 実行中の翻訳のヒット数・ミス数（usage_counter）に計上するかどうか
+
+        Returns:
+            Dict[str, str]: 原文をキーとするキャッシュ済みの翻訳
+        """
+        found: Dict[str, str] = {}
+        unique_texts = list(dict.fromkeys(texts))
+        with self._lock:
+            missing: List[str] = []
+            for text in unique_texts:
+                key = (text, target_lang)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[text] = self._lru[key]
+                else:
+                    missing.append(text)
+
+            now = time.time()
+            updated = False
+            # SQLiteの変数上限を超えないよう分割して問い合わせる
+            for offset in range(0, len(missing), 500):
+                chunk = missing[offset:offset + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT source_text, translated_text FROM translations "
+                    f"WHERE target_lang = ? AND endpoint = ? AND source_text IN ({placeholders})",
+                    [target_lang, self.endpoint, *chunk]
+                ).fetchall()
+                for source_text, translated_text in rows:
+                    found[source_text] = translated_text
+                    self._remember((source_text, target_lang), translated_text)
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE translations SET last_used = ? "
+                        "WHERE source_text = ? AND target_lang = ? AND endpoint = ?",
+                        [(now, source_text, target_lang, self.endpoint) for source_text, _ in rows]
+                    )
+                    updated = True
+            if updated:
+                self._conn.commit()
+        if record_stats:
+            # 実行中の翻訳（常駐モードのジョブ）ごとのヒット数・ミス数
+            record_usage(cache_hits=len(found), cache_misses=len(unique_texts) - len(found))
+        return found
+
+    def get(self, text: str, target_lang: str) -> Optional[str]:
+        """キャッシュ済みの翻訳を取得"""
+        return self.get_many([text], target_lang).get(text)
+
+    def put_many(self, pairs: Iterable[Tuple[str, str]], target_lang: str) -> None:
+        """
+        翻訳結果をまとめて保存
+
+        Args:
+            pairs (Iterable[Tuple[str, str]]): (原文, 翻訳文) のリスト
+            target_lang (str): 翻訳先言語
+        """
+        now = time.time()
+        rows = [(source, translated, target_lang, self.endpoint, now) for source, translated in pairs
+                if source and translated is not None]
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO translations "
+                "(source_text, translated_text, target_lang, endpoint, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._size += self._conn.total_changes - before
+            self._conn.executemany(
+                "UPDATE translations SET translated_text = ?, last_used = ? "
+                "WHERE source_text = ? AND target_lang = ? AND endpoint = ?",
+                [(translated, now, source, lang, endpoint) for source, translated, lang, endpoint, _ in rows]
+            )
+            for source, translated, lang, _, _ in rows:
+                self._remember((source, lang), translated)
+            self._evict()
+            self._conn.commit()
+
+    def put(self, text: str, translated: str, target_lang: str) -> None:
+        """翻訳結果を保存"""
+        self.put_many([(text, translated)], target_lang)
+
+    def import_history(self, entries: Iterable[Dict], target_lang: str = "JA") -> int:
+        """
+        翻訳履歴からキャッシュを作成
+
+        このキャッシュと同じ翻訳元で翻訳したエントリーのみ取り込む（翻訳元を記録していない
+        旧形式のエントリーはDeepL APIの翻訳とみなし、モックサーバーの翻訳は除く）。
+
+        Args:
+            entries (Iterable[Dict]): TranslationHistoryのエントリー
+            target_lang (str): 翻訳先言語が記録されていないエントリーの翻訳先言語
+
+        Returns:
+            int: 取り込んだエントリー数
+        """
+        pairs_by_lang: Dict[str, List[Tuple[str, str]]] = {}
+        for entry in entries:
+            if not entry.get('source_text') or entry.get('translated_text') is None:
+                continue
+            if entry.get('endpoint', "") != self.endpoint:
+                continue
+            lang = entry.get('target_lang') or target_lang
+            if 'endpoint' not in entry and is_mock_translation(entry['source_text'], entry['translated_text'], lang):
+                continue
+            pairs_by_lang.setdefault(lang, []).append((entry['source_text'], entry['translated_text']))
+        for lang, pairs in pairs_by_lang.items():
+            self.put_many(pairs, lang)
+        return sum(len(pairs) for pairs in pairs_by_lang.values())
+
+    def close(self) -> None:
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, key: Tuple[str, str], value: str) -> None:
+        """メモリ上のLRUに追加"""
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def _evict(self) -> None:
+        """最大エントリー数を超えた分を最終使用日時の古い順に削除"""
+        if self._size <= self.max_entries:
+            return
+        # 削除のたびに発生しないよう、上限の1割分の余裕を空ける
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM translations WHERE rowid IN ("
+            "SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        self._lru.clear()
@@ -0,0 +1,509 @@
+"""
+翻訳サービスを常駐させ、ローカルのHTTP APIでジョブを受け付けるモジュール
+
+翻訳クライアント（接続プール）・翻訳キャッシュ・翻訳履歴は起動時に1回だけ作成し、
+全てのジョブで共有する。ジョブは有界のキューに入り、--max-jobs 個のスレッドが順に実行する。
+
+全てのリクエストは、Hostヘッダーがローカルまたは待ち受けるホストで、Authorizationヘッダーに
+起動時の認証トークン（環境変数 TRANSLATION_SERVICE_TOKEN、ない場合は起動時に生成）を
+Bearerで指定している必要がある。POSTの本文は Content-Type: application/json に限る。
+
+API:
+    POST   /jobs       ジョブを投入（本文はJSON、202で受付・キューが一杯の場合は503）
+    GET    /jobs       全ジョブの状態
+    GET    /jobs/<id>  ジョブの状態・処理結果・セル数/秒
+    DELETE /jobs/<id>  実行待ちのジョブを取り消す
+    GET    /metrics    計測値（Prometheusのtext形式）
+    GET    /health     実行待ち・実行中のジョブ数
+"""
+import hmac
+import itertools
+import json
+import os
+import queue
+import secrets
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from cli_interface import TranslationParams, parse_column_spec, parse_target_langs
+from excel_handler import EXCEL_MODES
+from metrics import Metrics
+from quota_planner import QUOTA_POLICIES
+from translate_excel import create_services, translate_file
+
+# ジョブの状態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# 状態を保持する終了済みのジョブ数の上限（超えた場合は古いものから削除）
+MAX_FINISHED_JOBS = 1000
+
+# ジョブの本文の最大サイズ（バイト）
+MAX_REQUEST_BODY = 1024 * 1024
+
+# 認証トークンを指定する環境変数
+TOKEN_ENV = "TRANSLATION_SERVICE_TOKEN"
+
+# 待ち受けるホスト以外に許可するHostヘッダーのホスト名
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+class JobQueueFullError(Exception):
+    """実行待ちのジョブ数が上限に達している場合の例外"""
+
+
+class TranslationJob:
+    def __init__(self, job_id: str, params: TranslationParams):
+        """
+        翻訳ジョブの初期化
+
+        Args:
+            job_id (str): ジョブID
+            params (TranslationParams): ジョブの実行パラメータ
+        """
+        self.id = job_id
+        self.params = params
+        self.status = JOB_QUEUED
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.summary: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """APIの応答に含めるジョブの状態"""
+        result: Dict[str, Any] = {
+            'id': self.id,
+            'status': self.status,
+            'input_path': self.params['input_path'],
+            'output_path': self.params['output_path'],
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.started_at is not None:
+            result['elapsed'] = (self.finished_at or time.time()) - self.started_at
+        if self.summary is not None:
+            result['summary'] = self.summary
+            elapsed = self.summary['elapsed']
+            result['cells_per_second'] = self.summary['translatable_cells'] / elapsed if elapsed > 0 else 0.0
+        if self.error is not None:
+            result['error'] = self.error
+        return result
+
+
+class TranslationDaemon:
+    def __init__(self, params: TranslationParams):
+        """
+        常駐翻訳サービスの初期化
+
+        Args:
+            params (TranslationParams): サービス共通の実行パラメータ（ジョブで指定しない項目の既定値）
+        """
+        self.params = params
+        self.services = create_services(params, max_rps=params.get('max_rps'))
+        self.metrics: Metrics = self.services[4]
+        self._queue: "queue.Queue[Optional[TranslationJob]]" = queue.Queue(maxsize=params['max_queued_jobs'])
+        self._jobs: Dict[str, TranslationJob] = {}
+        self._active_outputs = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._run_jobs, name=f"job-worker-{i}", daemon=True)
+                         for i in range(params['max_jobs'])]
+        self._started = False
+
+    def start(self) -> None:
+        """ジョブを実行するスレッドを開始"""
+        for worker in self._workers:
+            worker.start()
+        self._started = True
+
+    def build_job_params(self, request: Dict[str, Any]) -> TranslationParams:
+        """
+        ジョブの指定をサービス共通のパラメータに重ねて実行パラメータを作成
+
+        Args:
+            request (Dict[str, Any]): input・source_cols・target_cols・row_start・row_end（必須）と
+                output・sheets・target_langs・excel_mode・quota_policy・resume・incremental（省略可能）
+
+        Raises:
+            ValueError: 指定が無効な場合
+        """
+        if not isinstance(request, dict):
+            raise ValueError("ジョブの指定はJSONオブジェクトである必要があります")
+        missing = [key for key in ('input', 'source_cols', 'target_cols', 'row_start', 'row_end')
+                   if request.get(key) in (None, '')]
+        if missing:
+            raise ValueError(f"ジョブの指定に必要な項目がありません: {', '.join(missing)}")
+
+        input_path = os.path.abspath(str(request['input']))
+        if not os.path.isfile(input_path):
+            raise ValueError(f"入力ファイルが見つかりません: {request['input']}")
+        if request.get('output'):
+            output_path = os.path.abspath(str(request['output']))
+        else:
+            name, ext = os.path.splitext(input_path)
+            output_path = f"{name}_translated{ext}"
+        if not self.params.get('allow_any_output') and not self._is_within_input_dir(input_path, output_path):
+            raise ValueError("出力ファイルは入力ファイルと同じディレクトリ（またはその下）に指定してください"
+                             "（--allow-any-output で制限を解除できます）")
+
+        target_langs = self.params['target_langs']
+        if request.get('target_langs'):
+            langs = request['target_langs']
+            target_langs = parse_target_langs(','.join(langs) if isinstance(langs, list) else str(langs))
+        try:
+            source_cols = parse_column_spec(str(request['source_cols']))
+            target_cols = parse_column_spec(str(request['target_cols']))
+        except ValueError as e:
+            raise ValueError(f"列の指定が無効です: {str(e)}")
+        if len(source_cols) * len(target_langs) != len(target_cols):
+            raise ValueError("翻訳先の列数が翻訳元の列数と翻訳先言語の数の積と一致しません")
+        if len(set(target_cols)) != len(target_cols):
+            raise ValueError("翻訳先の列が重複しています")
+
+        try:
+            row_start, row_end = int(request['row_start']), int(request['row_end'])
+        except (TypeError, ValueError):
+            raise ValueError("行番号は整数である必要があります")
+        if not 1 <= row_start <= row_end:
+            raise ValueError("開始行は1以上かつ終了行以下である必要があります")
+
+        sheets = request.get('sheets', self.params.get('sheets'))
+        if isinstance(sheets, str):
+            sheets = [name.strip() for name in sheets.split(',')]
+        excel_mode = request.get('excel_mode', self.params['excel_mode'])
+        if excel_mode not in EXCEL_MODES:
+            raise ValueError(f"無効なモードです: {excel_mode}")
+        quota_policy = request.get('quota_policy', self.params['quota_policy'])
+        if quota_policy not in QUOTA_POLICIES:
+            raise ValueError(f"無効な方針です: {quota_policy}")
+
+        return {
+            **self.params,
+            'input_path': input_path,
+            'output_path': output_path,
+            'input_files': [(input_path, output_path)],
+            'source_cols': source_cols,
+            'target_cols': target_cols,
+            'target_langs': target_langs,
+            'row_range': (row_start, row_end),
+            'sheets': sheets or None,
+            'excel_mode': excel_mode,
+            'quota_policy': quota_policy,
+            'resume': bool(request.get('resume', self.params['resume'])),
+            'incremental': bool(request.get('incremental', self.params['incremental']))
+        }
+
+    @staticmethod
+    def _is_within_input_dir(input_path: str, output_path: str) -> bool:
+        """出力ファイルが入力ファイルのディレクトリ（またはその下）にあるか（シンボリックリンクは解決する）"""
+        input_dir = os.path.dirname(os.path.realpath(input_path))
+        output_dir = os.path.dirname(os.path.realpath(output_path))
+        try:
+            return os.path.commonpath([input_dir, output_dir]) == input_dir
+        except ValueError:
+            # ドライブが異なる場合
+            return False
+
+    def submit(self, request: Dict[str, Any]) -> TranslationJob:
+        """
+        ジョブを実行待ちのキューに追加
+
+        Raises:
+            ValueError: 指定が無効な場合・同じ出力ファイルのジョブが実行待ちまたは実行中の場合
+            JobQueueFullError: 実行待ちのジョブ数が上限に達している場合
+        """
+        params = self.build_job_params(request)
+        with self._lock:
+            if params['output_path'] in self._active_outputs:
+                raise ValueError(f"同じ出力ファイルのジョブが実行待ちまたは実行中です: {params['output_path']}")
+            # キューへの追加はこのロックを保持して行うため、確認後に一杯になることはない
+            if self._queue.full():
+                raise JobQueueFullError(f"実行待ちのジョブ数が上限（{self._queue.maxsize}件）に達しています")
+            job = TranslationJob(str(next(self._ids)), params)
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._active_outputs.add(params['output_path'])
+        self.metrics.increment('jobs_submitted_total')
+        return job
+
+    def cancel(self, job_id: str) -> TranslationJob:
+        """
+        実行待ちのジョブを取り消す
+
+        Raises:
+            KeyError: ジョブが見つからない場合
+            ValueError: ジョブが実行待ちでない場合
+        """
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status != JOB_QUEUED:
+                raise ValueError(f"実行待ちでないジョブは取り消せません（状態: {job.status}）")
+            # キューからは実行スレッドが取り出した時点で読み飛ばす
+            self._finish(job, JOB_CANCELLED)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[TranslationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[TranslationJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブ数"""
+        with self._lock:
+            result = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)}
+            for job in self._jobs.values():
+                result[job.status] += 1
+            return result
+
+    def shutdown(self) -> None:
+        """実行待ちのジョブを取り消し、実行中のジョブの完了を待ってサービスを閉じる"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == JOB_QUEUED:
+                    self._finish(job, JOB_CANCELLED)
+        # 実行待ちのジョブは取り消し済みのため、空きができ次第終了の合図を入れられる
+        # （スレッドを開始していない場合は、キューから取り出されないため入れない）
+        if self._started:
+            for _ in self._workers:
+                self._queue.put(None)
+            for worker in self._workers:
+                worker.join()
+
+        history_handler, cache, translator, _, _, _ = self.services
+        history_handler.close()
+        if cache is not None:
+            cache.close()
+        translator.close()
+
+    def _finish(self, job: TranslationJob, status: str) -> None:
+        """ジョブを終了済みにする（ロックを保持して呼び出す）"""
+        job.status = status
+        job.finished_at = time.time()
+        self._active_outputs.discard(job.params['output_path'])
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for old_job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[old_job.id]
+
+    def _run_jobs(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+
+            params = job.params
+            try:
+                summary = translate_file(params['input_path'], params['output_path'], params, self.services,
+                                         show_progress=False)
+                error = None
+            except Exception as e:
+                summary, error = None, str(e)
+
+            with self._lock:
+                job.summary = summary
+                job.error = error
+                self._finish(job, JOB_COMPLETED if error is None else JOB_FAILED)
+            self.metrics.increment('jobs_total', 1, {'status': job.status})
+            self.metrics.observe('job_seconds', job.finished_at - job.started_at)
+            self._print_job(job)
+
+    def _print_job(self, job: TranslationJob) -> None:
+        """ジョブの処理結果を1行で表示"""
+        info = job.to_dict()
+        if job.error is not None:
+            print(f"[失敗] ジョブ {job.id}: {job.params['input_path']}: {job.error}", flush=True)
+            return
+        print(f"[完了] ジョブ {job.id}: {job.params['input_path']} → {job.params['output_path']} | "
+              f"翻訳対象: {job.summary['translatable_cells']}セル（ユニーク {job.summary['unique_texts']}件） | "
+              f"{info['elapsed']:.1f}秒（{info['cells_per_second']:.0f}セル/秒）", flush=True)
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """ジョブAPIのリクエストを処理するハンドラー"""
+
+    server_version = "ExcelTranslator"
+
+    @property
+    def translation_daemon(self) -> TranslationDaemon:
+        return self.server.translation_daemon
+
+    def log_message(self, format: str, *args) -> None:
+        # リクエストごとのログは出力しない（ジョブの処理結果のみ表示する）
+        pass
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {'error': message})
+
+    def _authorize(self) -> bool:
+        """Hostヘッダーと認証トークンを確認（拒否した場合は応答を送信してFalseを返す）"""
+        # 他のサイトのページからDNSの再束縛で送られたリクエストを拒否する
+        host = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        if host not in self.server.allowed_hosts:
+            self._send_error(403, "Hostヘッダーが許可されていません")
+            return False
+        authorization = self.headers.get('Authorization', '')
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else ''
+        if not hmac.compare_digest(token.encode('utf-8'), self.server.token.encode('utf-8')):
+            self._send_json(401, {'error': "認証トークンが無効です"}, {'WWW-Authenticate': 'Bearer'})
+            return False
+        return True
+
+    def _job_id(self) -> Optional[str]:
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        return parts[1] if len(parts) == 2 and parts[0] == 'jobs' else None
+
+    def do_GET(self) -> None:
+        if not self._authorize():
+            return
+        path = self.path.split('?', 1)[0].rstrip('/')
+        daemon = self.translation_daemon
+        if path == '/jobs':
+            self._send_json(200, {'jobs': [job.to_dict() for job in daemon.list_jobs()]})
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok', 'jobs': daemon.counts()})
+        elif path == '/metrics':
+            payload = daemon.metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        else:
+            job_id = self._job_id()
+            job = daemon.get_job(job_id) if job_id else None
+            if job is None:
+                self._send_error(404, "ジョブが見つかりません")
+                return
+            self._send_json(200, job.to_dict())
+
+    def do_POST(self) -> None:
+        if not self._authorize():
+            return
+        if self.path.split('?', 1)[0].rstrip('/') != '/jobs':
+            self._send_error(404, "見つかりません")
+            return
+        if self.headers.get_content_type() != 'application/json':
+            self._send_error(415, "ジョブの指定は Content-Type: application/json で送信してください")
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if not 0 < length <= MAX_REQUEST_BODY:
+            self._send_error(400, "ジョブの指定（JSON）が必要です")
+            return
+        try:
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            job = self.translation_daemon.submit(request)
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send_error(400, str(e))
+            return
+        except JobQueueFullError as e:
+            self._send_error(503, str(e))
+            return
+        self._send_json(202, job.to_dict(), {'Location': f"/jobs/{job.id}"})
+
+    def do_DELETE(self) -> None:
+        if not self._authorize():
+            return
+        job_id = self._job_id()
+        try:
+            if job_id is None:
+                raise KeyError(job_id)
+            job = self.translation_daemon.cancel(job_id)
+        except KeyError:
+            self._send_error(404, "ジョブが見つかりません")
+            return
+        except ValueError as e:
+            self._send_error(409, str(e))
+            return
+        self._send_json(200, job.to_dict())
+
+
+def create_server(params: TranslationParams) -> ThreadingHTTPServer:
+    """
+    待ち受けを開始し、翻訳サービスを作成（ジョブを実行するスレッドは開始しない）
+
+    使用中のポートなどで待ち受けできない場合に翻訳キャッシュ・翻訳履歴を開かないよう、
+    翻訳サービスより先に待ち受けを開始する。
+
+    Args:
+        params (TranslationParams): サービス共通の実行パラメータ
+
+    Returns:
+        ThreadingHTTPServer: translation_daemon に翻訳サービス、token に認証トークン、
+            allowed_hosts に許可するHostヘッダーのホスト名を設定したHTTPサーバー
+
+    Raises:
+        Exception: 待ち受けできない場合
+    """
+    host, port = params['serve']
+    try:
+        server = ThreadingHTTPServer((host, port), _JobRequestHandler)
+    except OSError as e:
+        raise Exception(f"{host}:{port} で待ち受けできません: {str(e)}") from e
+    try:
+        server.translation_daemon = TranslationDaemon(params)
+    except BaseException:
+        server.server_close()
+        raise
+    server.token = os.environ.get(TOKEN_ENV) or secrets.token_urlsafe(32)
+    server.allowed_hosts = {*LOCAL_HOSTS, host.lower()}
+    return server
+
+
+def serve(params: TranslationParams, metrics: Metrics) -> None:
+    """
+    常駐モードで翻訳サービスを起動し、終了（Ctrl+C・SIGTERM）まで待ち受ける
+
+    Args:
+        params (TranslationParams): サービス共通の実行パラメータ
+        metrics (Metrics): 終了時に計測値を合算する集計先
+    """
+    server = create_server(params)
+    daemon = server.translation_daemon
+    host, port = server.server_address[:2]
+    daemon.start()
+    if not os.environ.get(TOKEN_ENV):
+        print(f"認証トークン: {server.token}（リクエストの Authorization: Bearer ヘッダーに指定してください）",
+              flush=True)
+    # SIGTERMでもCtrl+Cと同様に実行中のジョブを待ってから終了する
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"翻訳サービスを起動しました: http://{host}:{port}/jobs "
+          f"（同時実行 {params['max_jobs']}件、実行待ち上限 {params['max_queued_jobs']}件。Ctrl+Cで終了）",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\n翻訳サービスを終了しています（実行中のジョブの完了を待っています）...", flush=True)
+        daemon.shutdown()
+        metrics.merge(daemon.metrics.snapshot())
@@ -3,38 +3,92 @@
 """
 import json
 import os
+import threading
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from history_index import HistoryIndex
+from metrics import Metrics
+
+# 日本のタイムゾーン（UTC+9）
+JST = timezone(timedelta(hours=+9))
+
+DEFAULT_HISTORY_FILE = "translation_history.jsonl"
+
 
 class TranslationHistory:
-    def __init__(self, history_file: str = "translation_history.json"):
+    def __init__(self,
+                 history_file: str = DEFAULT_HISTORY_FILE,
+                 sync_every: int = 1000,
+                 sync_interval: float = 5.0,
+                 metrics: Optional[Metrics] = None,
+                 endpoint: str = ""):
         """
         翻訳履歴管理クラスの初期化
 
+        履歴はJSON Lines形式で1エントリーずつ追記され、一定件数または
+        一定時間ごとにディスクへ同期される。書き出しは行単位でまとめて
+        1回のwriteで追記するため、複数プロセスから同じファイルへ追記しても
+        行が混ざらない。
+
+        旧形式（JSON配列）の .json ファイルが指定された場合は、JSON配列の後ろに
+        追記してファイルを壊さないよう、同じ名前の .jsonl ファイルへ移行して使用する。
+
         Args:
-            history_file (str): 履歴を保存するJSONファイルのパス
+            history_file (str): 履歴を保存するJSON Linesファイルのパス
+            sync_every (int): ディスクへ同期するまでのエントリー数
+            sync_interval (float): ディスクへ同期するまでの最大秒数
+            metrics (Optional[Metrics]): 書き込みの計測値の集計先
+            endpoint (str): 翻訳元の名前（DeepL API以外の場合はエントリーに記録し、
+                翻訳キャッシュへの取り込み時に区別する）
         """
+        root, ext = os.path.splitext(history_file)
+        if ext.lower() == '.json':
+            history_file = root + ".jsonl"
+            print(f"旧形式の履歴ファイル名が指定されたため、{history_file} を使用します。")
         self.history_file = history_file
-        self.history: List[Dict] = self._load_history()
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.metrics = metrics or Metrics()
+        self.endpoint = endpoint
 
-    def _load_history(self) -> List[Dict]:
-        """既存の履歴を読み込む"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"警告: 履歴ファイルの読み込みに失敗しました。新しい履歴を作成します。")
-                return []
-        return []
-
-    def add_entry(self, 
-                  source_text: str, 
-                  translated_text: str, 
+        self._fd: Optional[int] = None
+        self._buffer: List[str] = []
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._index: Optional[HistoryIndex] = None
+        self._migrate_legacy_history()
+
+    def _migrate_legacy_history(self) -> None:
+        """旧形式（JSON配列）の履歴をJSON Lines形式へ一度だけ移行"""
+        legacy_file = os.path.splitext(self.history_file)[0] + ".json"
+        if os.path.exists(self.history_file) or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print("警告: 旧形式の履歴ファイルの読み込みに失敗しました。移行をスキップします。")
+            return
+
+        tmp_file = f"{self.history_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.history_file)
+        print(f"{legacy_file} の履歴 {len(entries)}件を {self.history_file} に移行しました。")
+
+    def add_entry(self,
+                  source_text: str,
+                  translated_text: str,
                   excel_file: str,
                   sheet_name: str,
                   source_cell: str,
-                  target_cell: str) -> None:
+                  target_cell: str,
+                  target_lang: str = "JA") -> None:
         """
         翻訳エントリーを追加
 
@@ -45,29 +99,83 @@ class TranslationHistory:
             sheet_name (str): シート名
             source_cell (str): 翻訳元セル
             target_cell (str): 翻訳先セル
+            target_lang (str): 翻訳先言語
         """
-        # 日本のタイムゾーン（UTC+9）を設定
-        JST = timezone(timedelta(hours=+9))
-
         entry = {
             'timestamp': datetime.now(JST).isoformat(),
             'excel_file': excel_file,
             'sheet_name': sheet_name,
             'source_cell': source_cell,
             'target_cell': target_cell,
+            'target_lang': target_lang,
             'source_text': source_text,
             'translated_text': translated_text
         }
-        self.history.append(entry)
-        self._save_history()
+        if self.endpoint:
+            entry['endpoint'] = self.endpoint
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            if (len(self._buffer) >= self.sync_every
+                    or time.monotonic() - self._last_sync >= self.sync_interval):
+                try:
+                    self._sync()
+                except Exception as e:
+                    print(f"警告: 履歴の保存に失敗しました: {str(e)}")
 
-    def _save_history(self) -> None:
-        """履歴をファイルに保存"""
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"警告: 履歴の保存に失敗しました: {str(e)}")
+    def _sync(self) -> None:
+        """バッファを追記してディスクへ同期"""
+        self._last_sync = time.monotonic()
+        if not self._buffer:
+            return
+        if self._fd is None:
+            self._fd = os.open(self.history_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        data = "".join(self._buffer).encode('utf-8')
+        self._buffer = []
+        with self.metrics.span('history_sync_seconds'):
+            self.metrics.increment('history_bytes_written_total', len(data))
+            while data:
+                written = os.write(self._fd, data)
+                data = data[written:]
+            os.fsync(self._fd)
+
+    def flush(self) -> None:
+        """未同期のエントリーをディスクへ書き出す"""
+        with self._lock:
+            try:
+                self._sync()
+            except Exception as e:
+                print(f"警告: 履歴の保存に失敗しました: {str(e)}")
+
+    def close(self) -> None:
+        """履歴ファイルを閉じる"""
+        with self._lock:
+            try:
+                self._sync()
+            except Exception as e:
+                print(f"警告: 履歴の保存に失敗しました: {str(e)}")
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """
+        履歴を古い順に1件ずつ読み込む
+
+        Yields:
+            Dict: 翻訳履歴のエントリー
+        """
+        self.flush()
+        if not os.path.exists(self.history_file):
+            return
+        with open(self.history_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = self._parse_line(line)
+                if entry is not None:
+                    yield entry
 
     def get_recent_entries(self, limit: Optional[int] = None) -> List[Dict]:
         """
@@ -80,14 +188,119 @@ class TranslationHistory:
             List[Dict]: 翻訳履歴のリスト
         """
         if limit is None:
-            return self.history
-        return self.history[-limit:]
+            return list(self.iter_entries())
+        if limit <= 0:
+            return []
+
+        self.flush()
+        if not os.path.exists(self.history_file):
+            return []
+        # ファイル末尾から必要な件数だけ読み込む
+        entries: List[Dict] = []
+        for line in self._iter_lines_reversed():
+            entry = self._parse_line(line)
+            if entry is not None:
+                entries.append(entry)
+                if len(entries) >= limit:
+                    break
+        entries.reverse()
+        return entries
+
+    def _get_index(self) -> HistoryIndex:
+        if self._index is None:
+            self._index = HistoryIndex(self.history_file)
+        return self._index
+
+    def query(self,
+              excel_file: Optional[str] = None,
+              sheet_name: Optional[str] = None,
+              cell: Optional[str] = None,
+              source_text: Optional[str] = None,
+              target_lang: Optional[str] = None,
+              since: Optional[datetime] = None,
+              until: Optional[datetime] = None,
+              limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        索引を使って条件に一致するエントリーを日時の古い順に取得
+
+        Args:
+            excel_file (Optional[str]): Excelファイル名
+            sheet_name (Optional[str]): シート名
+            cell (Optional[str]): 翻訳元または翻訳先のセル（例: B12）
+            source_text (Optional[str]): 原文（完全一致）
+            target_lang (Optional[str]): 翻訳先言語
+            since (Optional[datetime]): この日時以降
+            until (Optional[datetime]): この日時より前
+            limit (Optional[int]): 新しい方から数えた件数の上限
+
+        Yields:
+            Dict: 翻訳履歴のエントリー
+        """
+        self.flush()
+        yield from self._get_index().query(
+            excel_file=excel_file, sheet_name=sheet_name, cell=cell, source_text=source_text,
+            target_lang=target_lang,
+            since=since.timestamp() if since is not None else None,
+            until=until.timestamp() if until is not None else None,
+            limit=limit
+        )
+
+    def index_stats(self) -> Dict:
+        """索引の件数・期間・ファイル数を取得"""
+        self.flush()
+        return self._get_index().stats()
+
+    def compact(self, before: Optional[datetime] = None, latest_only: bool = False) -> Tuple[int, int]:
+        """
+        保持期間を過ぎたエントリーを削除して履歴ファイルを書き直す
+
+        Args:
+            before (Optional[datetime]): この日時より前のエントリーを削除
+            latest_only (bool): 同じ翻訳先のセルは最新のエントリーのみ残す
+
+        Returns:
+            Tuple[int, int]: (残したエントリー数, 削除したエントリー数)
+        """
+        # 書き直した後は新しいファイルに追記する
+        self.close()
+        return self._get_index().compact(before.timestamp() if before is not None else None, latest_only)
+
+    def _iter_lines_reversed(self, block_size: int = 64 * 1024) -> Iterator[str]:
+        """履歴ファイルの行を末尾から順に返す"""
+        with open(self.history_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b""
+            while position > 0:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                lines = (f.read(read_size) + remainder).split(b"\n")
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line.decode('utf-8')
+            if remainder:
+                yield remainder.decode('utf-8')
+
+    def _parse_line(self, line: str) -> Optional[Dict]:
+        """1行分のエントリーを解析"""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            print("警告: 履歴ファイルの不正な行をスキップしました。")
+            return None
 
     def clear_history(self) -> None:
         """履歴を全て削除"""
-        self.history = []
+        with self._lock:
+            self._buffer = []
+        self.close()
         if os.path.exists(self.history_file):
             try:
                 os.remove(self.history_file)
             except Exception as e:
-                print(f"警告: 履歴ファイルの削除に失敗しました: {str(e)}")
\ No newline at end of file
+                print(f"警告: 履歴ファイルの削除に失敗しました: {str(e)}")
@@ -0,0 +1,151 @@
+"""
+翻訳リクエストの並行実行とレート制限を担当するモジュール
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from translation_backend import TranslationBackend
+
+# 429受信時の待機時間の上限（秒）
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class RateLimiter:
+    """全ワーカーで共有するトークンバケット方式のレート制限"""
+
+    def __init__(self, max_rps: Optional[float] = None, burst: Optional[int] = None):
+        """
+        レート制限の初期化
+
+        Args:
+            max_rps (Optional[float]): 1秒あたりの最大リクエスト数（Noneの場合は無制限）
+            burst (Optional[int]): 一度に送信できる最大リクエスト数
+        """
+        self.max_rps = max_rps
+        self.capacity = float(burst or (max(1, int(max_rps)) if max_rps else 1))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_limits = 0
+        # 429による待機を開始するたびに進める番号（同じ連続429の検出に使う）
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> int:
+        """
+        リクエスト送信の許可が得られるまで待機
+
+        Returns:
+            int: 送信時点の待機の世代（429を受信した場合にreport_rate_limitedへ渡す）
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait_time = self._blocked_until - now
+                if wait_time <= 0:
+                    if self.max_rps is None:
+                        return self._generation
+                    self._tokens = min(self.capacity,
+                                       self._tokens + (now - self._last_refill) * self.max_rps)
+                    self._last_refill = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return self._generation
+                    wait_time = (1 - self._tokens) / self.max_rps
+            time.sleep(wait_time)
+
+    def report_rate_limited(self, generation: Optional[int] = None) -> float:
+        """
+        429を受信したことを通知し、全ワーカー共通の待機時間を返す
+
+        送信後に他のワーカーが既に待機を開始していた場合は、同じ連続429として
+        待機時間を延ばさず、残りの待機時間を返す。
+
+        Args:
+            generation (Optional[int]): acquireが返した送信時点の待機の世代
+
+        Returns:
+            float: 待機時間（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            if generation is not None and generation != self._generation:
+                return max(0.0, self._blocked_until - now)
+            wait_time = min(MAX_BACKOFF_SECONDS, 2.0 ** self._consecutive_limits)
+            self._consecutive_limits += 1
+            self._generation += 1
+            self._blocked_until = max(self._blocked_until, now + wait_time)
+            self._tokens = 0
+            return wait_time
+
+    def report_success(self) -> None:
+        """リクエストの成功を通知"""
+        with self._lock:
+            self._consecutive_limits = 0
+
+
+class TranslationScheduler:
+    """ワーカー数を上限として翻訳リクエストを並行に実行するスケジューラ"""
+
+    def __init__(self, translator: TranslationBackend, workers: int = 1):
+        """
+        スケジューラの初期化
+
+        Args:
+            translator (TranslationBackend): 翻訳バックエンド
+            workers (int): 同時に実行するリクエスト数
+        """
+        if workers < 1:
+            raise ValueError("ワーカー数は1以上である必要があります")
+        self.translator = translator
+        self.workers = workers
+
+    def run(self, jobs: Iterable[Tuple],
+            target_lang: str = "JA") -> Iterator[Tuple[Any, List[Optional[str]]]]:
+        """
+        ジョブを並行に翻訳し、完了した順に結果を返す
+
+        結果は呼び出し元のスレッドで返されるため、セルへの書き込みは
+        呼び出し元で安全に行える。ワーカーは呼び出し元のcontextvarsを引き継ぐため、
+        使用量（usage_counter）は呼び出し元の翻訳に集計される。
+
+        Args:
+            jobs (Iterable[Tuple]): (キー, テキストのリスト) または
+                (キー, テキストのリスト, 翻訳先言語) の列（言語の異なるジョブを混在できる）
+            target_lang (str): 翻訳先言語を指定しないジョブの翻訳先言語
+
+        Yields:
+            Tuple[Any, List[Optional[str]]]: (キー, 翻訳結果のリスト)
+        """
+        job_iter = iter(jobs)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+
+            def submit_next() -> bool:
+                try:
+                    key, texts, *job_lang = next(job_iter)
+                except StopIteration:
+                    return False
+                future = executor.submit(contextvars.copy_context().run, self.translator.translate_batch,
+                                         texts, job_lang[0] if job_lang else target_lang)
+                in_flight[future] = key
+                return True
+
+            # ワーカー数分のリクエストを常に送信中に保つ
+            for _ in range(self.workers):
+                if not submit_next():
+                    break
+
+            try:
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = in_flight.pop(future)
+                        yield key, future.result()
+                        submit_next()
+            finally:
+                for future in in_flight:
+                    future.cancel()
@@ -0,0 +1,45 @@
+"""
+翻訳（ファイル・ジョブ）ごとの文字数とキャッシュの使用量を集計するモジュール
+
+翻訳クライアント・翻訳キャッシュは常駐モードの複数のジョブで共有されるため、
+共有のカウンターの差分ではなく、実行中の翻訳に紐付けた集計先に加算する。
+紐付けはcontextvarsで行い、スケジューラのワーカースレッドにも引き継がれる。
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_current: ContextVar[Optional["UsageCounter"]] = ContextVar('usage_counter', default=None)
+
+
+class UsageCounter:
+    def __init__(self):
+        """使用量の集計クラスの初期化"""
+        self.characters_billed = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def add(self, characters_billed: int = 0, cache_hits: int = 0, cache_misses: int = 0) -> None:
+        """使用量を加算"""
+        with self._lock:
+            self.characters_billed += characters_billed
+            self.cache_hits += cache_hits
+            self.cache_misses += cache_misses
+
+    @contextmanager
+    def activate(self) -> Iterator["UsageCounter"]:
+        """このブロック内（とそこから投入したワーカーの処理）の使用量をこの集計先に加算する"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def record_usage(characters_billed: int = 0, cache_hits: int = 0, cache_misses: int = 0) -> None:
+    """実行中の翻訳の集計先に使用量を加算（集計先がない場合は何もしない）"""
+    counter = _current.get()
+    if counter is not None:
+        counter.add(characters_billed, cache_hits, cache_misses)
@@ -2,6 +2,7 @@
 ユーティリティ関数モジュール
 """
 import time
+import unicodedata
 from typing import Optional, Tuple
 
 def validate_column_range(columns, max_col):
@@ -10,12 +11,27 @@ def validate_column_range(columns, max_col):
         if col < 1 or col > max_col:
             raise ValueError(f"無効な列番号です: {col}")
 
+def normalize_text(text: str) -> str:
+    """
+    重複判定用にテキストを正規化
+
+    Unicode正規化（NFC）を行い、前後の空白を除去する。
+
+    Args:
+        text (str): 正規化するテキスト
+
+    Returns:
+        str: 正規化されたテキスト
+    """
+    return unicodedata.normalize('NFC', text).strip()
+
 def format_progress_bar(progress: float, 
                        width: int = 50, 
                        current_cell: Optional[str] = None,
                        start_time: Optional[float] = None,
                        total_cells: Optional[int] = None,
-                       processed_cells: Optional[int] = None) -> str:
+                       processed_cells: Optional[int] = None,
+                       cells_per_sec: Optional[float] = None) -> str:
     """
     詳細なプログレスバーの生成
 
@@ -26,6 +42,7 @@ def format_progress_bar(progress: float,
         start_time (Optional[float]): 処理開始時刻
         total_cells (Optional[int]): 総処理セル数
         processed_cells (Optional[int]): 処理済みセル数
+        cells_per_sec (Optional[float]): 処理速度（指定しない場合は開始時刻からの平均）
 
     Returns:
         str: フォーマットされたプログレスバー文字列
@@ -37,9 +54,11 @@ def format_progress_bar(progress: float,
     if current_cell:
         status += f" | 現在の位置: {current_cell}"
 
-    if all(x is not None for x in [start_time, total_cells, processed_cells]):
+    if cells_per_sec is None and all(x is not None for x in [start_time, total_cells, processed_cells]):
         elapsed = time.time() - start_time
         cells_per_sec = processed_cells / elapsed if elapsed > 0 else 0
+
+    if cells_per_sec is not None and total_cells is not None and processed_cells is not None:
         remaining_cells = total_cells - processed_cells
         eta = remaining_cells / cells_per_sec if cells_per_sec > 0 else 0
 
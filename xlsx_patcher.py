@@ -0,0 +1,570 @@
+"""
+openpyxlでワークブック全体を書き直さずに、.xlsxのシートXMLの対象セルだけを書き換えるモジュール
+"""
+import codecs
+import copy
+import math
+import os
+import posixpath
+import re
+import shutil
+import struct
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, IO, Iterator, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape, unescape
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, to_excel
+
+from utils import excel_column_to_number, number_to_excel_column
+
+# 読み込み・書き込みの単位
+CHUNK_SIZE = 1024 * 1024
+
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_OFFICE_DOCUMENT_TYPE = _REL_NS + "/officeDocument"
+_SHARED_STRINGS_TYPE = _REL_NS + "/sharedStrings"
+_CALC_CHAIN_TYPE = _REL_NS + "/calcChain"
+_STYLES_TYPE = _REL_NS + "/styles"
+
+_SHEET_DATA_START = re.compile(r'<sheetData\b[^>]*?(/?)>')
+_ROW_START = re.compile(r'\s*<row\b[^>]*?(/?)>')
+_SHEET_DATA_END = re.compile(r'\s*</sheetData>')
+_CELL = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_ATTRIBUTE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+_DIMENSION = re.compile(r'<dimension\s+ref="([^"]*)"\s*/>')
+_SST_START = re.compile(r'<sst\b[^>]*?(/?)>')
+_CELL_XFS = re.compile(r'<cellXfs\b[^>]*>(.*?)</cellXfs>', re.S)
+_NUM_FMT = re.compile(r'<numFmt\b[^>]*>')
+_XF = re.compile(r'<xf\b[^>]*>')
+# ZIP64の拡張フィールドのID
+_ZIP64_EXTRA_ID = 1
+# XMLに含められない制御文字
+_ILLEGAL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _SharedStrings:
+    """追加する共有文字列（既存の文字列の後ろに追加する）"""
+
+    def __init__(self, unique_count: int):
+        self.unique_count = unique_count
+        self.references = 0
+        self.added: Dict[str, int] = {}
+
+    def index(self, text: str) -> int:
+        self.references += 1
+        if text not in self.added:
+            self.added[text] = self.unique_count + len(self.added)
+        return self.added[text]
+
+
+class _DateStyles:
+    """日付・時刻のセルに使う書式（既存の書式の後ろに追加する）"""
+
+    # 値の型ごとの組み込みの表示形式の番号
+    NUMBER_FORMATS = ((datetime, 22), (date, 14), (time, 21), (timedelta, 46))
+
+    def __init__(self, format_count: int, date_formats: Optional[Set[int]] = None):
+        self.format_count = format_count
+        # 既存の書式のうち、表示形式が日付・時刻のものの番号
+        self.date_formats = date_formats or set()
+        self.added: Dict[int, int] = {}
+
+    def index(self, value: Any, style: Optional[str] = None) -> int:
+        """書き込むセルの書式の番号（元のセルの書式が日付・時刻の場合はそのまま使用する）"""
+        if style is not None and style.isdigit() and int(style) in self.date_formats:
+            return int(style)
+        number_format = next(number_format for value_type, number_format in self.NUMBER_FORMATS
+                             if isinstance(value, value_type))
+        if number_format not in self.added:
+            self.added[number_format] = self.format_count + len(self.added)
+        return self.added[number_format]
+
+
+def _attributes(tag: str) -> Dict[str, str]:
+    return {name: double if double is not None else single
+            for name, double, single in _ATTRIBUTE.findall(tag)}
+
+
+def _text_xml(text: str) -> str:
+    return f'<t xml:space="preserve">{escape(_ILLEGAL_CHARS.sub("", text))}</t>'
+
+
+def _cell_xml(row: int, col: int, value: Any, style: Optional[str],
+              strings: Optional[_SharedStrings], dates: Optional[_DateStyles] = None,
+              epoch: datetime = CALENDAR_WINDOWS_1900) -> str:
+    """
+    書き込む値のセルのXML（書式の番号は元のセルから引き継ぐ）
+
+    数値・真偽値はその型のまま、日付・時刻はシリアル値と日付の書式で書き込む
+    （元のセルの書式が日付・時刻の場合は、その書式を引き継ぐ）。
+    文字列は "=" で始まる場合も数式ではなく文字列として書き込む。
+    """
+    ref = f"{number_to_excel_column(col)}{row}"
+    is_date = isinstance(value, (date, time, timedelta))
+    if is_date and dates is not None:
+        style = str(dates.index(value, style))
+    style_attr = f' s="{style}"' if style is not None else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+    if is_date:
+        return f'<c r="{ref}"{style_attr}><v>{to_excel(value, epoch)!r}</v></c>'
+    value = str(value)
+    if strings is not None:
+        return f'<c r="{ref}"{style_attr} t="s"><v>{strings.index(value)}</v></c>'
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is>{_text_xml(value)}</is></c>'
+
+
+def _read_text(source: IO[bytes]) -> Iterator[str]:
+    """ZIPのメンバーをUTF-8の文字列として少しずつ読み込む"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = source.read(CHUNK_SIZE)
+        if not data:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(data)
+
+
+class _SheetPatcher:
+    def __init__(self, patches: Dict[Tuple[int, int], Any], strings: Optional[_SharedStrings],
+                 dates: Optional[_DateStyles] = None, epoch: datetime = CALENDAR_WINDOWS_1900):
+        """
+        1シート分のXMLの書き換え
+
+        Args:
+            patches (Dict[Tuple[int, int], Any]): (行, 列) ごとの書き込む値
+            strings (Optional[_SharedStrings]): 共有文字列（Noneの場合はインライン文字列で書き込む）
+            dates (Optional[_DateStyles]): 日付・時刻のセルの書式
+            epoch (datetime): ワークブックの日付の基準日（1900年または1904年）
+        """
+        self.strings = strings
+        self.dates = dates
+        self.epoch = epoch
+        self.rows: Dict[int, Dict[int, Any]] = {}
+        for (row, col), value in patches.items():
+            self.rows.setdefault(row, {})[col] = value
+        # 書き込む行（昇順）と、次に書き出す行の位置
+        self.pending_rows = sorted(self.rows)
+        self.next_row = 0
+        self.replaced_formulas = 0
+
+    def patch(self, source: IO[bytes], target: IO[bytes]) -> None:
+        """シートXMLを読み込みながら、対象の行だけを書き換えて書き出す"""
+        chunks = _read_text(source)
+        buffer = ''
+        # buffer[copied:position] は変更のない範囲で、まとめて書き出す
+        copied = 0
+        position = 0
+
+        def write(text: str) -> None:
+            target.write(text.encode('utf-8'))
+
+        def flush() -> None:
+            nonlocal copied
+            if copied < position:
+                write(buffer[copied:position])
+            copied = position
+
+        def fill() -> bool:
+            nonlocal buffer, copied, position
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            flush()
+            buffer = buffer[position:] + chunk
+            copied = position = 0
+            return True
+
+        # <sheetData> の開始タグまで（列幅や寸法の定義）を書き出す
+        while True:
+            match = _SHEET_DATA_START.search(buffer)
+            if match:
+                break
+            if not fill():
+                raise Exception("シートのXMLにsheetDataがありません")
+        write(self._patch_dimension(buffer[:match.start()]))
+        if match.group(1):
+            # 空のシート
+            write('<sheetData>' + self._new_rows() + '</sheetData>')
+        else:
+            write(match.group())
+        copied = position = match.end()
+
+        current_row = 0
+        while not match.group(1) and self.next_row < len(self.pending_rows):
+            if _SHEET_DATA_END.match(buffer, position):
+                flush()
+                write(self._new_rows())
+                break
+            start = _ROW_START.match(buffer, position)
+            row_end = -1
+            if start is not None:
+                row_end = start.end() if start.group(1) else buffer.find('</row>', start.end())
+            if row_end < 0:
+                if not fill():
+                    raise Exception("シートのXMLが途中で終わっています")
+                continue
+            attrs = _attributes(start.group())
+            current_row = int(attrs['r']) if 'r' in attrs else current_row + 1
+            row_stop = row_end if start.group(1) else row_end + len('</row>')
+            if current_row >= self.pending_rows[self.next_row]:
+                flush()
+                write(self._new_rows(before=current_row))
+                if current_row in self.rows:
+                    self.next_row += 1
+                    content = '' if start.group(1) else buffer[start.end():row_end]
+                    write(self._patch_row(current_row, start.group(), content, bool(start.group(1))))
+                    copied = row_stop
+            # 変更のない行は後でまとめて書き出す
+            position = row_stop
+
+        # 残りは変更せずに書き出す
+        write(buffer[copied:])
+        for chunk in chunks:
+            write(chunk)
+
+    def _new_rows(self, before: Optional[int] = None) -> str:
+        """元のシートにない行を作成（beforeより前の行のみ）"""
+        parts = []
+        while self.next_row < len(self.pending_rows) and (
+                before is None or self.pending_rows[self.next_row] < before):
+            row = self.pending_rows[self.next_row]
+            self.next_row += 1
+            cells = ''.join(self._cell(row, col, value, None)
+                            for col, value in sorted(self.rows[row].items()))
+            parts.append(f'<row r="{row}">{cells}</row>')
+        return ''.join(parts)
+
+    def _patch_row(self, row: int, start_tag: str, content: str, self_closing: bool) -> str:
+        """既存の行の対象セルを置き換え、ない場合は列の順に挿入する"""
+        # 列の範囲のヒント（spans）は書き込み後に合わなくなるため削除する
+        start_tag = re.sub(r'\s+spans="[^"]*"', '', start_tag.strip())
+        if self_closing:
+            start_tag = start_tag[:-2].rstrip() + '>'
+        patches = dict(self.rows[row])
+        cells = []
+        current_col = 0
+        for match in _CELL.finditer(content):
+            cell_xml = match.group()
+            attrs = _attributes(cell_xml[:cell_xml.index('>') + 1])
+            ref = _CELL_REF.fullmatch(attrs.get('r', ''))
+            current_col = excel_column_to_number(ref.group(1)) if ref else current_col + 1
+            for col in sorted(c for c in patches if c < current_col):
+                cells.append(self._cell(row, col, patches.pop(col), None))
+            if current_col in patches:
+                if '<f' in cell_xml:
+                    self.replaced_formulas += 1
+                cells.append(self._cell(row, current_col, patches.pop(current_col), attrs.get('s')))
+            else:
+                cells.append(cell_xml)
+        for col in sorted(patches):
+            cells.append(self._cell(row, col, patches[col], None))
+        return start_tag + ''.join(cells) + '</row>'
+
+    def _cell(self, row: int, col: int, value: Any, style: Optional[str]) -> str:
+        return _cell_xml(row, col, value, style, self.strings, self.dates, self.epoch)
+
+    def _patch_dimension(self, header: str) -> str:
+        """シートの使用範囲（dimension）を書き込むセルを含むように広げる"""
+        match = _DIMENSION.search(header)
+        if not match or not self.rows:
+            return header
+        refs = [_CELL_REF.fullmatch(ref) for ref in match.group(1).split(':')]
+        if not all(refs):
+            return header
+        rows = [int(ref.group(2)) for ref in refs] + list(self.rows)
+        cols = [excel_column_to_number(ref.group(1)) for ref in refs] + \
+            [col for cols in self.rows.values() for col in cols]
+        dimension = (f'<dimension ref="{number_to_excel_column(min(cols))}{min(rows)}:'
+                     f'{number_to_excel_column(max(cols))}{max(rows)}"/>')
+        return header[:match.start()] + dimension + header[match.end():]
+
+
+def _read_relationships(archive: zipfile.ZipFile, part: str) -> List[Tuple[str, str, str]]:
+    """パーツの関係（ID, 種類, 対象のパーツ名）の一覧"""
+    directory, name = posixpath.split(part)
+    rels_path = posixpath.join(directory, '_rels', f'{name}.rels')
+    if rels_path not in archive.namelist():
+        return []
+    root = ET.fromstring(archive.read(rels_path))
+    relationships = []
+    for rel in root.findall(f'{{{_PKG_REL_NS}}}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target', '')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+        relationships.append((rel.get('Id'), rel.get('Type'), target))
+    return relationships
+
+
+def _remove_part_references(xml: str, part: str) -> str:
+    """[Content_Types].xml・関係のXMLから指定したパーツの参照を削除"""
+    name = posixpath.basename(part)
+    return re.sub(r'<(?:Override|Relationship)\b[^>]*?(?:PartName|Target)="[^"]*' + re.escape(name) + r'"[^>]*/>',
+                  '', xml)
+
+
+def _patch_shared_strings(source: IO[bytes], target: IO[bytes], strings: _SharedStrings) -> None:
+    """共有文字列の末尾に追加した文字列を書き足し、件数を更新"""
+    added = ''.join(f'<si>{_text_xml(text)}</si>' for text in strings.added)
+    tail = ''
+    started = False
+    for chunk in _read_text(source):
+        text = tail + chunk
+        if not started:
+            match = _SST_START.search(text)
+            if match is None:
+                tail = text
+                continue
+            start_tag = match.group()
+            for name, increment in (('count', strings.references), ('uniqueCount', len(strings.added))):
+                start_tag = re.sub(rf'\b{name}="(\d+)"',
+                                   lambda m, inc=increment: f'{name}="{int(m.group(1)) + inc}"', start_tag)
+            if match.group(1):
+                start_tag = start_tag[:-2].rstrip() + '></sst>'
+            text = text[:match.start()] + start_tag + text[match.end():]
+            started = True
+        # 終了タグを分割して読み込まないよう、末尾は次の読み込みまで保持する
+        target.write(text[:-16].encode('utf-8'))
+        tail = text[-16:]
+    end = tail.rfind('</sst>')
+    if end < 0:
+        raise Exception("共有文字列のXMLが不正です")
+    target.write((tail[:end] + added + tail[end:]).encode('utf-8'))
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """拡張フィールドからZIP64のフィールドを削除（サイズに応じてzipfileが付け直す）"""
+    fields = []
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, length = struct.unpack('<HH', extra[position:position + 4])
+        if field_id != _ZIP64_EXTRA_ID:
+            fields.append(extra[position:position + 4 + length])
+        position += 4 + length
+    return b''.join(fields) + extra[position:]
+
+
+def _supports_raw_copy(output: zipfile.ZipFile) -> bool:
+    """圧縮されたデータのままのコピーに使用するzipfileの内部の属性があるかどうか"""
+    return (all(hasattr(zipfile, name) for name in ('sizeFileHeader', 'stringFileHeader'))
+            and hasattr(zipfile.ZipInfo, 'FileHeader')
+            and all(hasattr(output, name) for name in ('fp', 'filelist', 'NameToInfo', 'start_dir', '_didModify')))
+
+
+def _copy_member(archive: zipfile.ZipFile, output: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """
+    ZIPのメンバーをコピー
+
+    zipfileの内部の属性が使用できる場合は圧縮されたデータのままコピーし、
+    使用できない場合は展開して再圧縮する。
+    """
+    if _supports_raw_copy(output):
+        _copy_member_raw(archive, output, info)
+        return
+    copied = copy.copy(info)
+    copied.extra = _strip_zip64_extra(info.extra)
+    with archive.open(info) as source, output.open(copied, 'w') as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+
+def _copy_member_raw(archive: zipfile.ZipFile, output: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """
+    ZIPのメンバーを展開・再圧縮せずに、圧縮されたデータのままコピー
+
+    zipfileには圧縮データをそのまま書き込む公開APIがないため、ローカルヘッダーを
+    書き出して圧縮データをコピーし、ZipFile.open(..., 'w') の終了時と同じように
+    セントラルディレクトリの一覧に登録する。
+    """
+    source = archive.fp
+    source.seek(info.header_offset)
+    header = source.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise Exception(f"ZIPのメンバーのヘッダーが不正です: {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    source.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    # サイズとCRCはローカルヘッダーに書き込むため、データディスクリプターは使用しない
+    copied = copy.copy(info)
+    copied.flag_bits &= ~0x08
+    # セントラルディレクトリから読み込んだZIP64のフィールドは、ローカルヘッダーの
+    # 形式と異なるため削除する（サイズが大きい場合はFileHeaderとcloseが付け直す）
+    copied.extra = _strip_zip64_extra(info.extra)
+    copied.header_offset = output.fp.tell()
+    output.fp.write(copied.FileHeader())
+    remaining = info.compress_size
+    while remaining > 0:
+        data = source.read(min(CHUNK_SIZE, remaining))
+        if not data:
+            raise Exception(f"ZIPのメンバーが途中で終わっています: {info.filename}")
+        output.fp.write(data)
+        remaining -= len(data)
+    output.filelist.append(copied)
+    output.NameToInfo[copied.filename] = copied
+    output.start_dir = output.fp.tell()
+    output._didModify = True
+
+
+def _count_cell_formats(styles_xml: str) -> Optional[int]:
+    """書式の一覧（cellXfs）の件数（一覧がない場合はNone）"""
+    match = _CELL_XFS.search(styles_xml)
+    if match is None:
+        return None
+    return len(re.findall(r'<xf\b', match.group(1)))
+
+
+def _date_cell_formats(styles_xml: str) -> Set[int]:
+    """書式の一覧（cellXfs）のうち、表示形式が日付・時刻の書式の番号"""
+    match = _CELL_XFS.search(styles_xml)
+    if match is None:
+        return set()
+    number_formats = dict(BUILTIN_FORMATS)
+    for tag in _NUM_FMT.findall(styles_xml):
+        attrs = _attributes(tag)
+        if attrs.get('numFmtId', '').isdigit():
+            number_formats[int(attrs['numFmtId'])] = unescape(attrs.get('formatCode', ''),
+                                                              {'&quot;': '"', '&apos;': "'"})
+    date_formats = set()
+    for index, tag in enumerate(_XF.findall(match.group(1))):
+        number_format = _attributes(tag).get('numFmtId', '0')
+        if number_format.isdigit() and is_date_format(number_formats.get(int(number_format), '')):
+            date_formats.add(index)
+    return date_formats
+
+
+def _patch_styles(styles_xml: str, dates: _DateStyles) -> str:
+    """書式の一覧の末尾に日付・時刻の書式を追加し、件数を更新"""
+    match = _CELL_XFS.search(styles_xml)
+    added = ''.join(f'<xf numFmtId="{number_format}" fontId="0" fillId="0" borderId="0" xfId="0" '
+                    f'applyNumberFormat="1"/>' for number_format in dates.added)
+    start_tag = styles_xml[match.start():match.start(1)]
+    start_tag = re.sub(r'\bcount="\d+"', f'count="{dates.format_count + len(dates.added)}"', start_tag)
+    return (styles_xml[:match.start()] + start_tag + match.group(1) + added + '</cellXfs>'
+            + styles_xml[match.end():])
+
+
+def patch_workbook(input_path: str, output_path: str, patches: Dict[str, Dict[Tuple[int, int], Any]]) -> None:
+    """
+    .xlsxの対象シートのセルだけを書き換えて保存
+
+    シートのXMLは先頭から順に読み込み、書き込むセルを含む行だけを書き換える。
+    文字列は共有文字列の末尾に追加し（共有文字列がない場合はインライン文字列）、
+    数値・日付は型を保って書き込む（日付の書式は書式の一覧の末尾に追加する）。
+    書き換えるのは対象のシート・共有文字列（・書式）のみで、それ以外のZIPの
+    メンバーは展開・再圧縮せずに圧縮されたデータのままコピーする（zipfileの
+    内部の属性が使用できない場合は展開して再圧縮する）。
+
+    Args:
+        input_path (str): 入力ファイルのパス
+        output_path (str): 出力ファイルのパス
+        patches (Dict[str, Dict[Tuple[int, int], Any]]): シート名ごとの (行, 列) をキーとする書き込む値
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with zipfile.ZipFile(input_path) as archive:
+        workbook_part = next((target for _, rel_type, target in _read_relationships(archive, '')
+                              if rel_type == _OFFICE_DOCUMENT_TYPE), 'xl/workbook.xml')
+        relationships = _read_relationships(archive, workbook_part)
+        targets = {rel_id: target for rel_id, _, target in relationships}
+        shared_strings_part = next((target for _, rel_type, target in relationships
+                                    if rel_type == _SHARED_STRINGS_TYPE), None)
+        calc_chain_part = next((target for _, rel_type, target in relationships
+                                if rel_type == _CALC_CHAIN_TYPE), None)
+        styles_part = next((target for _, rel_type, target in relationships
+                            if rel_type == _STYLES_TYPE), None)
+
+        sheet_parts: Dict[str, str] = {}
+        workbook = ET.fromstring(archive.read(workbook_part))
+        for sheet in workbook.iter(f'{{{_MAIN_NS}}}sheet'):
+            sheet_parts[sheet.get('name')] = targets[sheet.get(f'{{{_REL_NS}}}id')]
+        properties = workbook.find(f'{{{_MAIN_NS}}}workbookPr')
+        epoch = CALENDAR_WINDOWS_1900
+        if properties is not None and properties.get('date1904') in ('1', 'true'):
+            epoch = CALENDAR_MAC_1904
+        for sheet_name in patches:
+            if sheet_name not in sheet_parts:
+                raise Exception(f"シートが見つかりません: {sheet_name}")
+
+        strings = None
+        if shared_strings_part is not None:
+            with archive.open(shared_strings_part) as source:
+                header = source.read(4096).decode('utf-8', errors='ignore')
+            match = re.search(r'\buniqueCount="(\d+)"', header)
+            if match:
+                unique_count = int(match.group(1))
+            else:
+                with archive.open(shared_strings_part) as source:
+                    unique_count = sum(len(re.findall(r'<si\b', chunk)) for chunk in _read_text(source))
+            strings = _SharedStrings(unique_count)
+
+        # 日付・時刻を書き込む場合は、書式の一覧の末尾に日付の書式を追加する
+        dates = None
+        if styles_part is not None:
+            styles_xml = archive.read(styles_part).decode('utf-8')
+            format_count = _count_cell_formats(styles_xml)
+            if format_count is not None:
+                dates = _DateStyles(format_count, _date_cell_formats(styles_xml))
+
+        # 書き換えたシートのXMLは一時ファイルに保持し、元のメンバーの順に書き出す
+        patched: Dict[str, IO[bytes]] = {}
+        replaced_formulas = 0
+        try:
+            for sheet_name, sheet_patches in patches.items():
+                if not sheet_patches:
+                    continue
+                part = sheet_parts[sheet_name]
+                patcher = _SheetPatcher(sheet_patches, strings, dates, epoch)
+                buffer = tempfile.SpooledTemporaryFile(max_size=16 * CHUNK_SIZE, dir=output_dir)
+                with archive.open(part) as source:
+                    patcher.patch(source, buffer)
+                buffer.seek(0)
+                patched[part] = buffer
+                replaced_formulas += patcher.replaced_formulas
+
+            # 数式を上書きした場合、計算チェーンは参照が合わなくなるため削除する（Excelが再作成する）
+            dropped = calc_chain_part if replaced_formulas and calc_chain_part else None
+            rels_part = posixpath.join(posixpath.dirname(workbook_part), '_rels',
+                                       f'{posixpath.basename(workbook_part)}.rels')
+
+            fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=output_dir)
+            os.close(fd)
+            try:
+                with zipfile.ZipFile(tmp_path, 'w') as output:
+                    for info in archive.infolist():
+                        if info.filename == dropped:
+                            continue
+                        if info.filename in patched:
+                            # 書き込み時にZipInfoの位置情報が更新されるため、コピーを使用する
+                            with output.open(copy.copy(info), 'w') as target:
+                                shutil.copyfileobj(patched[info.filename], target, CHUNK_SIZE)
+                        elif info.filename == shared_strings_part and strings is not None and strings.added:
+                            with archive.open(info) as source, output.open(copy.copy(info), 'w') as target:
+                                _patch_shared_strings(source, target, strings)
+                        elif info.filename == styles_part and dates is not None and dates.added:
+                            with output.open(copy.copy(info), 'w') as target:
+                                target.write(_patch_styles(archive.read(info).decode('utf-8'),
+                                                           dates).encode('utf-8'))
+                        elif dropped and info.filename in ('[Content_Types].xml', rels_part):
+                            with output.open(copy.copy(info), 'w') as target:
+                                target.write(_remove_part_references(
+                                    archive.read(info).decode('utf-8'), dropped).encode('utf-8'))
+                        else:
+                            _copy_member(archive, output, info)
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        finally:
+            for buffer in patched.values():
+                buffer.close()